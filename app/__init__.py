@@ -1,23 +1,102 @@
 import os
 from flask import Flask
 from app.config import get_config
-from app.extensions import db, migrate, login_manager
-from app.models import User
+from app.extensions import db, login_manager, page_cache
 
-def create_app():
-    if os.getenv("FLASK_ENV") != "production":
-        try:
-            from dotenv import load_dotenv
-            load_dotenv()
-        except Exception:
-            pass
+# nombre -> (módulo, blueprint, url_prefix). Se importan solo los habilitados.
+BLUEPRINTS = {
+    "public": ("app.blueprints.public.routes", "public_bp", None),
+    "admin": ("app.blueprints.admin.routes", "admin_bp", "/admin"),
+    "checkout": ("app.blueprints.checkout.routes", "checkout_bp", "/checkout"),
+    "payments": ("app.blueprints.payments.routes", "payments_bp", None),
+}
+
+# las vistas/templates de uno enlazan a los otros (url_for): se habilitan juntos
+BLUEPRINT_REQUIRES = {
+    "public": ("checkout",),
+    "checkout": ("payments",),
+    "payments": ("checkout",),
+}
+
+_dotenv_loaded = False
+
+
+def _load_dotenv_once() -> None:
+    # una vez por proceso (bench/tests crean varias apps); nunca en producción
+    global _dotenv_loaded
+    if _dotenv_loaded or os.getenv("FLASK_ENV") == "production" or os.getenv("FLASK_SKIP_DOTENV") == "1":
+        return
+    _dotenv_loaded = True
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except Exception:
+        pass
+
+
+def enabled_blueprints(names) -> list[str]:
+    """Los pedidos en ENABLED_BLUEPRINTS más los que estos necesitan, en orden de BLUEPRINTS."""
+    pending = [name for name in names if name in BLUEPRINTS]
+    enabled = set()
+    while pending:
+        name = pending.pop()
+        if name not in enabled:
+            enabled.add(name)
+            pending.extend(BLUEPRINT_REQUIRES.get(name, ()))
+    return [name for name in BLUEPRINTS if name in enabled]
+
+
+def _wants_migrations(app) -> bool:
+    # Flask-Migrate importa alembic (~150 ms): solo hace falta para `flask db ...`
+    setting = app.config["MIGRATIONS"]
+    if setting == "auto":
+        import click
+
+        return click.get_current_context(silent=True) is not None
+    return setting == "1"
+
+
+def create_app(config_overrides: dict | None = None):
+    _load_dotenv_once()
 
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config.from_object(get_config())
+    if config_overrides:
+        # p.ej. benchmarks: otra base y gateway fake, sin tocar variables de entorno
+        app.config.update(config_overrides)
+
+    from app.services.webpay import check_gateway_config
+    check_gateway_config(app.config)
+
+    from app.database import engine_options, init_engine_tuning
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
+    if app.config.get("SQLALCHEMY_REPLICA_URI"):
+        app.config["SQLALCHEMY_BINDS"] = {
+            **(app.config.get("SQLALCHEMY_BINDS") or {}),
+            "replica": app.config["SQLALCHEMY_REPLICA_URI"],
+        }
 
     db.init_app(app)
-    migrate.init_app(app, db)
+    with app.app_context():
+        for engine in db.engines.values():
+            init_engine_tuning(app, engine)
+
+    if _wants_migrations(app):
+        from flask_migrate import Migrate
+        # batch: SQLite no soporta ALTER de columnas/constraints; los upgrades lo usan igual
+        Migrate(app, db, render_as_batch=True)
+
     login_manager.init_app(app)
+    page_cache.init_app(app)
+
+    from app.replica import init_replica
+    init_replica(app)
+
+    from app.query_budget import init_query_budget
+    init_query_budget(app)
+
+    from app.instrumentation import init_instrumentation
+    init_instrumentation(app)
 
     from app.models import User  # importa aquí para evitar imports tempranos
 
@@ -25,19 +104,27 @@ def create_app():
     def load_user(user_id):
         return db.session.get(User, int(user_id))  # SQLAlchemy 2.x style
 
-    from app.blueprints.public.routes import public_bp
-    from app.blueprints.admin.routes import admin_bp
-    from app.blueprints.checkout.routes import checkout_bp
-    from app.blueprints.payments.routes import payments_bp
+    # workers y CLI pueden arrancar sin blueprints (ENABLED_BLUEPRINTS="")
+    from importlib import import_module
 
-    app.register_blueprint(public_bp)
-    app.register_blueprint(admin_bp, url_prefix="/admin")
-    app.register_blueprint(checkout_bp, url_prefix="/checkout")
-    app.register_blueprint(payments_bp)
+    app.config["ENABLED_BLUEPRINTS"] = enabled_blueprints(app.config["ENABLED_BLUEPRINTS"])
+    for name in app.config["ENABLED_BLUEPRINTS"]:
+        module, attr, url_prefix = BLUEPRINTS[name]
+        app.register_blueprint(getattr(import_module(module), attr), url_prefix=url_prefix)
 
     from app.cli import register_cli
     register_cli(app)
 
-    return app
+    if app.config["EXPIRY_SWEEP_INTERVAL_SECONDS"] > 0:
+        from app.services.expiry import start_expiry_sweeper
+        start_expiry_sweeper(app)
 
+    if app.config["OUTBOX_WORKER_INTERVAL_SECONDS"] > 0:
+        from app.services.outbox import start_outbox_worker
+        start_outbox_worker(app)
 
+    if app.config["CANCELLATION_WORKER_INTERVAL_SECONDS"] > 0:
+        from app.services.cancellation import start_cancellation_worker
+        start_cancellation_worker(app)
+
+    return app
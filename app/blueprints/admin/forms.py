@@ -1,9 +1,22 @@
 # app/blueprints/admin/forms.py
 
+from datetime import date
+
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, IntegerField, SelectField
-from wtforms.fields import DateTimeLocalField
+from wtforms import (
+    StringField,
+    PasswordField,
+    SubmitField,
+    IntegerField,
+    SelectField,
+    SelectMultipleField,
+    TextAreaField,
+)
+from wtforms.fields import DateField, DateTimeLocalField, TimeField
 from wtforms.validators import DataRequired, Email, Length, Optional, NumberRange
+from wtforms.widgets import CheckboxInput, ListWidget
+
+from app.services.recurrence import MAX_OCCURRENCES, WEEKDAYS
 
 
 class LoginForm(FlaskForm):
@@ -81,4 +94,75 @@ class OccurrenceForm(FlaskForm):
             self.end_dt.errors.append("Fin debe ser posterior al inicio.")
             return False
 
-        return True
\ No newline at end of file
+        return True
+
+
+class RecurrenceForm(FlaskForm):
+    frequency = SelectField(
+        "Frecuencia",
+        choices=[("1", "Semanal"), ("2", "Cada dos semanas")],
+        default="1",
+        validators=[DataRequired()],
+    )
+
+    weekdays = SelectMultipleField(
+        "Días",
+        choices=[(str(n), label) for n, label in WEEKDAYS],
+        option_widget=CheckboxInput(),
+        widget=ListWidget(prefix_label=False),
+        validators=[DataRequired(message="Elige al menos un día.")],
+    )
+
+    start_date = DateField("Desde", validators=[DataRequired()])
+    start_time = TimeField("Hora inicio", validators=[DataRequired()])
+    end_time = TimeField("Hora fin", validators=[DataRequired()])
+
+    count = IntegerField(
+        "Cantidad de sesiones",
+        validators=[Optional(), NumberRange(min=1, max=MAX_OCCURRENCES)],
+    )
+    until = DateField("Hasta (inclusive)", validators=[Optional()])
+
+    excluded_dates = TextAreaField("Fechas excluidas (AAAA-MM-DD, una por línea)")
+
+    capacity_override = IntegerField(
+        "Cupo específico (opcional)",
+        validators=[Optional(), NumberRange(min=1, max=9999)],
+    )
+
+    price_override = IntegerField(
+        "Precio específico (opcional)",
+        validators=[Optional(), NumberRange(min=0)],
+    )
+
+    preview = SubmitField("Vista previa")
+    confirm = SubmitField("Crear sesiones")
+
+    def excluded(self) -> set[date]:
+        raw = (self.excluded_dates.data or "").replace(",", "\n")
+        return {date.fromisoformat(line.strip()) for line in raw.splitlines() if line.strip()}
+
+    def validate(self, extra_validators=None):
+        rv = super().validate(extra_validators=extra_validators)
+        if not rv:
+            return False
+
+        if not self.count.data and not self.until.data:
+            self.count.errors.append("Indica una cantidad de sesiones o una fecha límite.")
+            return False
+
+        if self.until.data and self.until.data < self.start_date.data:
+            self.until.errors.append("La fecha límite debe ser posterior al inicio.")
+            return False
+
+        if self.end_time.data <= self.start_time.data:
+            self.end_time.errors.append("Fin debe ser posterior al inicio.")
+            return False
+
+        try:
+            self.excluded()
+        except ValueError:
+            self.excluded_dates.errors.append("Formato de fecha inválido (usa AAAA-MM-DD).")
+            return False
+
+        return True
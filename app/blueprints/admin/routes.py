@@ -1,23 +1,69 @@
 # app/blueprints/admin/routes.py
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+import json
+from datetime import date, datetime, time, timedelta, timezone
+
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    current_app,
+    flash,
+    redirect,
+    render_template,
+    request,
+    stream_with_context,
+    url_for,
+)
 from flask_login import login_user, logout_user, login_required, current_user
-from sqlalchemy import func
-
-from app.extensions import db
-from app.models import User, Event, Occurrence, Purchase, PurchaseParticipant
-from .forms import LoginForm, EventForm, OccurrenceForm
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import raiseload, selectinload
+
+from app.extensions import db, page_cache
+from app.models import User, Event, Occurrence, Purchase, PurchaseParticipant, CancellationJob
+from app.query_budget import query_budget
+from app.replica import read_replica
+from app.services.cancellation import job_progress, launch_cancellation_job, start_cancellation
+from app.services.enrollment import enroll_new_occurrences
+from app.services.occupancy import event_occupancy
+from app.services.pagination import approximate_count, keyset_page
+from app.services.roster import (
+    ROSTER_STATUSES,
+    ROSTER_STATUSES_WITH_PENDING,
+    iter_roster,
+    roster_query,
+    stream_csv,
+    stream_xlsx,
+    xlsx_available,
+)
+from app.services.recurrence import bulk_create_occurrences, existing_starts, expand_recurrence
+from app.services.rollups import sales_dashboard
+from .forms import LoginForm, EventForm, OccurrenceForm, RecurrenceForm
 
 admin_bp = Blueprint("admin", __name__, template_folder="templates")
 
 
+DASHBOARD_WINDOWS = (7, 30, 90)
+
+
 @admin_bp.get("/")
+@query_budget(4)
+@read_replica
 @login_required
 def admin_home():
-    return render_template("admin/home.html")
+    days = request.args.get("days", type=int)
+    if days not in DASHBOARD_WINDOWS:
+        days = 30
+    since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+
+    # solo lee agregados (sales_daily + contadores de sesiones), nunca purchases
+    dashboard = sales_dashboard(since)
+    return render_template("admin/home.html", dashboard=dashboard, days=days, windows=DASHBOARD_WINDOWS)
 
 
 @admin_bp.route("/login", methods=["GET", "POST"])
+@query_budget(2)
 def login():
     if current_user.is_authenticated:
         return redirect(url_for("admin.admin_home"))
@@ -41,6 +87,7 @@ def login():
 
 
 @admin_bp.post("/logout")
+@query_budget(1)
 @login_required
 def logout():
     logout_user()
@@ -49,13 +96,124 @@ def logout():
 
 
 @admin_bp.get("/events")
+@query_budget(3)
+@read_replica
 @login_required
 def events_list():
-    events = Event.query.order_by(Event.created_at.desc()).all()
-    return render_template("admin/events_list.html", events=events)
+    # keyset sobre (created_at, id): costo constante por página (ix_events_created_id)
+    page = keyset_page(
+        select(Event).options(raiseload("*", sql_only=True)),
+        Event.created_at,
+        Event.id,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+        per_page=current_app.config["ADMIN_PAGE_SIZE"],
+        scalars=True,
+    )
+    total, exact = approximate_count(select(Event.id), "events")
+    return render_template("admin/events_list.html", events=page.items, page=page, total=total, exact=exact)
+
+
+PURCHASE_STATUSES = ("pending", "committing", "paid", "failed", "expired", "cancelled")
+
+
+def _parse_date(raw: str | None) -> date | None:
+    try:
+        return date.fromisoformat(raw) if raw else None
+    except ValueError:
+        return None
+
+
+def _purchase_filters(args) -> tuple[list, dict]:
+    """
+    Filtros del navegador de compras -> (condiciones SQL, valores normalizados para
+    repoblar el formulario y armar los links de paginación). Fechas en UTC.
+    """
+    conditions = []
+    values = {}
+
+    status = args.get("status")
+    if status in PURCHASE_STATUSES:
+        conditions.append(Purchase.status == status)
+        values["status"] = status
+
+    event_id = args.get("event_id", type=int)
+    if event_id:
+        conditions.append(Purchase.event_id == event_id)
+        values["event_id"] = event_id
+
+    date_from = _parse_date(args.get("date_from"))
+    if date_from:
+        conditions.append(Purchase.created_at >= datetime.combine(date_from, time.min, timezone.utc))
+        values["date_from"] = date_from.isoformat()
+
+    date_to = _parse_date(args.get("date_to"))
+    if date_to:
+        # inclusivo: hasta el final del día
+        conditions.append(Purchase.created_at < datetime.combine(date_to + timedelta(days=1), time.min, timezone.utc))
+        values["date_to"] = date_to.isoformat()
+
+    email = (args.get("email") or "").strip()
+    if email:
+        # igualdad (usa ix_purchases_buyer_email_created_id); el checkout guarda el email tal cual
+        conditions.append(Purchase.buyer_email.in_({email, email.lower()}))
+        values["email"] = email
+
+    return conditions, values
+
+
+@admin_bp.get("/purchases")
+@query_budget(3)
+@read_replica
+@login_required
+def purchases_list():
+    conditions, filters = _purchase_filters(request.args)
+
+    participants = (
+        select(func.count(PurchaseParticipant.id))
+        .where(PurchaseParticipant.purchase_id == Purchase.id)
+        .correlate(Purchase)
+        .scalar_subquery()
+    )
+    stmt = (
+        select(
+            Purchase.id,
+            Purchase.created_at,
+            Purchase.status,
+            Purchase.buyer_name,
+            Purchase.buyer_email,
+            Purchase.total_amount,
+            Purchase.event_id,
+            Event.title.label("event_title"),
+            participants.label("participants"),
+        )
+        .join(Event, Event.id == Purchase.event_id)
+        .where(*conditions)
+    )
+    page = keyset_page(
+        stmt,
+        Purchase.created_at,
+        Purchase.id,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+        per_page=current_app.config["ADMIN_PAGE_SIZE"],
+    )
+    total, exact = approximate_count(
+        select(Purchase.id).where(*conditions), "purchases:" + json.dumps(filters, sort_keys=True)
+    )
+
+    return render_template(
+        "admin/purchases_list.html",
+        page=page,
+        filters=filters,
+        statuses=PURCHASE_STATUSES,
+        total=total,
+        exact=exact,
+    )
 
 
 @admin_bp.route("/events/new", methods=["GET", "POST"])
+@query_budget(2)
 @login_required
 def events_new():
     form = EventForm()
@@ -77,6 +235,7 @@ def events_new():
 
 
 @admin_bp.route("/events/<int:event_id>/edit", methods=["GET", "POST"])
+@query_budget(3)
 @login_required
 def events_edit(event_id):
     ev = Event.query.get_or_404(event_id)
@@ -92,38 +251,24 @@ def events_edit(event_id):
 
         db.session.commit()
         flash("Evento actualizado.", "success")
-        return redirect(url_for("admin.event_detail", event_id=ev.id))
+        return redirect(url_for("admin.event_detail", event_id=event_id))
 
     return render_template("admin/event_form.html", form=form, mode="edit", event=ev)
 
 
-def _paid_participants_count_for_event(event_id: int) -> int:
-    # cupo por participante: suma de participants en compras pagadas del evento
-    return (
-        db.session.query(func.count(PurchaseParticipant.id))
-        .join(Purchase, PurchaseParticipant.purchase_id == Purchase.id)
-        .filter(Purchase.event_id == event_id, Purchase.status == "paid")
-        .scalar()
-    ) or 0
-
-
-def _paid_participants_count_for_occurrence(occurrence_id: int) -> int:
-    # cuenta participantes de compras pagadas que incluyen esa occurrence
-    return (
-        db.session.query(func.count(PurchaseParticipant.id))
-        .join(Purchase, PurchaseParticipant.purchase_id == Purchase.id)
-        .join(Purchase.occurrences)  # many-to-many
-        .filter(Purchase.status == "paid", Occurrence.id == occurrence_id)
-        .scalar()
-    ) or 0
-
-
 @admin_bp.get("/events/<int:event_id>")
+@query_budget(5)
 @login_required
 def event_detail(event_id):
-    ev = Event.query.get_or_404(event_id)
+    ev = (
+        Event.query
+        .options(selectinload(Event.occurrences), raiseload("*", sql_only=True))
+        .get_or_404(event_id)
+    )
 
-    paid_participants = _paid_participants_count_for_event(ev.id)
+    # Una sola query agrupada para el evento y todas sus sesiones.
+    occupancy = event_occupancy(ev.id)
+    paid_participants = occupancy.event.paid
 
     # En el modelo optimizado, el cupo efectivo es por occurrence (override o default del evento).
     # Aun así, por compatibilidad de UI, mostramos el "cupo base" del evento y su restante.
@@ -133,10 +278,23 @@ def event_detail(event_id):
 
     occ_stats = []
     for oc in ev.occurrences:
-        oc_paid = _paid_participants_count_for_occurrence(oc.id)
+        counts = occupancy.for_occurrence(oc.id)
         oc_capacity = oc.effective_capacity()
-        oc_remaining = None if oc_capacity is None else max(oc_capacity - oc_paid, 0)
-        occ_stats.append((oc, oc_capacity, oc_paid, oc_remaining))
+        oc_remaining = None if oc_capacity is None else max(oc_capacity - counts.paid, 0)
+        occ_stats.append((oc, oc_capacity, counts.paid, counts.pending, oc_remaining))
+
+    # destino posible de una reasignación al cancelar
+    scheduled = [oc for oc in ev.occurrences if oc.status == "scheduled"]
+    # solo una sesión cancelada crea jobs: sin ninguna, la vista no paga la query
+    jobs = []
+    if any(oc.status == "cancelled" for oc in ev.occurrences):
+        jobs = (
+            CancellationJob.query
+            .filter_by(event_id=ev.id)
+            .order_by(CancellationJob.id.desc())
+            .limit(10)
+            .all()
+        )
 
     return render_template(
         "admin/event_detail.html",
@@ -144,10 +302,15 @@ def event_detail(event_id):
         paid_participants=paid_participants,
         remaining_event=remaining_event,
         occ_stats=occ_stats,
+        scheduled=scheduled,
+        jobs=jobs,
+        xlsx_available=xlsx_available(),
     )
 
 
 @admin_bp.route("/events/<int:event_id>/occurrences/new", methods=["GET", "POST"])
+# PACKAGE con ventas: +3 para inscribir a los que ya pagaron
+@query_budget(6)
 @login_required
 def occurrence_new(event_id):
     ev = Event.query.get_or_404(event_id)
@@ -163,19 +326,195 @@ def occurrence_new(event_id):
             status="scheduled",
         )
         db.session.add(oc)
+        db.session.flush()
+
+        enrolled = 0
+        if ev.pricing_mode == "PACKAGE":
+            # quienes ya pagaron el pack quedan inscritos también en la sesión nueva
+            enrolled = enroll_new_occurrences(ev.id, [oc.id])
         db.session.commit()
 
-        flash("Sesión creada correctamente.", "success")
-        return redirect(url_for("admin.event_detail", event_id=ev.id))
+        msg = "Sesión creada correctamente."
+        if enrolled:
+            msg += f" {enrolled} compras pagadas inscritas."
+        flash(msg, "success")
+        # event_id y no ev.id: tras el commit ev está expirado y se recargaría
+        return redirect(url_for("admin.event_detail", event_id=event_id))
 
     return render_template("admin/occurrence_form.html", form=form, event=ev)
 
 
+@admin_bp.route("/events/<int:event_id>/occurrences/recurrence", methods=["GET", "POST"])
+# PACKAGE con ventas: +3 para inscribir a los que ya pagaron
+@query_budget(7)
+@login_required
+def occurrence_recurrence(event_id):
+    ev = Event.query.options(raiseload("*", sql_only=True)).get_or_404(event_id)
+    form = RecurrenceForm()
+
+    preview = None
+    if form.validate_on_submit():
+        slots = expand_recurrence(
+            start_date=form.start_date.data,
+            weekdays=[int(d) for d in form.weekdays.data],
+            start_time=form.start_time.data,
+            end_time=form.end_time.data,
+            interval_weeks=int(form.frequency.data),
+            count=form.count.data,
+            until=form.until.data,
+            excluded=form.excluded(),
+        )
+        # validación contra uq_event_start en la misma pasada (una query)
+        taken = existing_starts(ev.id, [start for start, _ in slots])
+
+        if form.confirm.data:
+            new_slots = [(start, end) for start, end in slots if start not in taken]
+            try:
+                created = bulk_create_occurrences(
+                    ev.id,
+                    new_slots,
+                    capacity_override=form.capacity_override.data,
+                    price_override=form.price_override.data,
+                )
+                enrolled = 0
+                if ev.pricing_mode == "PACKAGE":
+                    enrolled = enroll_new_occurrences(ev.id, created)
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                flash("Otra sesión se creó con la misma fecha mientras tanto. Revisa la vista previa.", "danger")
+            else:
+                # INSERT masivo: no pasa por los eventos ORM del cache público
+                page_cache.invalidate([event_id])
+                msg = f"{len(created)} sesiones creadas."
+                if taken:
+                    msg += f" {len(taken)} omitidas porque ya existían."
+                if enrolled:
+                    msg += f" {enrolled} compras pagadas inscritas."
+                flash(msg, "success")
+                return redirect(url_for("admin.event_detail", event_id=event_id))
+
+        preview = [(start, end, start in taken) for start, end in slots]
+
+    return render_template("admin/occurrence_recurrence.html", form=form, event=ev, preview=preview)
+
+
 @admin_bp.post("/occurrences/<int:occurrence_id>/cancel")
+@query_budget(7)
 @login_required
 def occurrence_cancel(occurrence_id):
     oc = Occurrence.query.get_or_404(occurrence_id)
-    oc.status = "cancelled"
+    event_id = oc.event_id
+    if oc.status == "cancelled":
+        flash("La sesión ya estaba cancelada.", "info")
+        return redirect(url_for("admin.event_detail", event_id=event_id))
+
+    # sin reemplazo: las compras afectadas se reembolsan
+    replacement_id = request.form.get("replacement_occurrence_id", type=int)
+    if replacement_id is not None:
+        if oc.event.pricing_mode == "PACKAGE":
+            # toda compra del pack ya está en las demás sesiones: reasignar no compensa a nadie
+            flash("En eventos por pack la sesión cancelada se reembolsa; no hay reasignación.", "danger")
+            return redirect(url_for("admin.event_detail", event_id=event_id))
+        replacement = db.session.get(Occurrence, replacement_id)
+        if (
+            replacement is None
+            or replacement.id == oc.id
+            or replacement.event_id != event_id
+            or replacement.status != "scheduled"
+        ):
+            flash("La sesión de reemplazo debe ser otra sesión programada del mismo evento.", "danger")
+            return redirect(url_for("admin.event_detail", event_id=event_id))
+
+    # las compras se procesan fuera del request; aquí solo se cancela y se crea el job
+    job = start_cancellation(event_id, occurrence_id, replacement_id)
+    if job is None:
+        db.session.rollback()
+        flash("La sesión ya estaba cancelada.", "info")
+        return redirect(url_for("admin.event_detail", event_id=event_id))
+    job_id, total, finished = job.id, job.total, job.status == "done"
     db.session.commit()
-    flash("Sesión cancelada.", "warning")
-    return redirect(url_for("admin.event_detail", event_id=oc.event_id))
+    # la sesión cambió con un UPDATE directo: el cupo del catálogo (PACKAGE: mínimo entre sesiones) se recalcula
+    page_cache.invalidate([event_id])
+
+    if finished:
+        flash("Sesión cancelada. No tenía compras afectadas.", "warning")
+        return redirect(url_for("admin.event_detail", event_id=event_id))
+
+    launch_cancellation_job(current_app._get_current_object(), job_id)
+    flash(f"Sesión cancelada. Procesando {total} compras afectadas.", "warning")
+    return redirect(url_for("admin.cancellation_job", job_id=job_id))
+
+
+@admin_bp.get("/cancellations/<int:job_id>")
+@query_budget(3)
+@login_required
+def cancellation_job(job_id):
+    job = CancellationJob.query.get_or_404(job_id)
+    occurrence = db.session.get(Occurrence, job.occurrence_id)
+    return render_template(
+        "admin/cancellation_job.html",
+        job=job,
+        occurrence=occurrence,
+        progress=job_progress(job),
+    )
+
+
+@admin_bp.get("/cancellations/<int:job_id>.json")
+@query_budget(2)
+@login_required
+def cancellation_job_status(job_id):
+    # la vista de progreso consulta esto cada pocos segundos
+    job = CancellationJob.query.get_or_404(job_id)
+    return job_progress(job)
+
+
+def _roster_response(event_id: int, occurrence_id: int | None, fmt: str, filename: str):
+    if fmt == "xlsx" and not xlsx_available():
+        abort(404)
+    if fmt not in ("csv", "xlsx"):
+        abort(404)
+
+    statuses = ROSTER_STATUSES_WITH_PENDING if request.args.get("include_pending") else ROSTER_STATUSES
+    rows = iter_roster(roster_query(event_id, occurrence_id, statuses))
+
+    # La query corre recién al iterar el body (stream_with_context mantiene el
+    # contexto abierto); por eso no cuenta en el @query_budget de la vista.
+    if fmt == "csv":
+        body, mimetype = stream_csv(rows), "text/csv; charset=utf-8"
+    else:
+        body = stream_xlsx(rows)
+        mimetype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{fmt}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@admin_bp.get("/events/<int:event_id>/participants.<fmt>")
+@query_budget(2)
+@read_replica
+@login_required
+def event_roster_export(event_id, fmt):
+    ev = db.session.get(Event, event_id)
+    if ev is None:
+        abort(404)
+    return _roster_response(ev.id, None, fmt, f"evento-{ev.id}-participantes")
+
+
+@admin_bp.get("/occurrences/<int:occurrence_id>/participants.<fmt>")
+@query_budget(2)
+@read_replica
+@login_required
+def occurrence_roster_export(occurrence_id, fmt):
+    oc = db.session.get(Occurrence, occurrence_id)
+    if oc is None:
+        abort(404)
+    return _roster_response(
+        oc.event_id, oc.id, fmt, f"sesion-{oc.id}-{oc.start_dt.strftime('%Y%m%d-%H%M')}"
+    )
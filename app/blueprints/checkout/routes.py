@@ -1,46 +1,32 @@
 import json
-from datetime import datetime, timedelta, timezone
 
-from flask import Blueprint, render_template, abort, request, redirect, url_for
+from flask import Blueprint, current_app, render_template, abort, request, redirect, url_for
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+
 from app.extensions import db
-from app.models import Event, Purchase, PurchaseParticipant
+from app.models import Event, Purchase, PurchaseParticipant, WaitlistEntry
+from app.models.purchase_occurrence import purchase_occurrences
+from app.query_budget import query_budget
+from app.services.expiry import (
+    released_occurrence_seats_expr,
+    released_seats,
+    released_seats_by_occurrence,
+    released_seats_expr,
+)
+from app.services.rollups import add_to_rollup, rollup_delta
+from app.services.seats import reserve_event_seats, reserve_occurrence_seats
+from app.services.waitlist import claim_offer, join_waitlist, offer_is_open
 
 
 checkout_bp = Blueprint("checkout", __name__)
 
 
-def expire_old_pending(event) -> None:
-    cutoff = datetime.now(timezone.utc) - timedelta(hours=2)
-    (
-        Purchase.query
-        .filter(
-            Purchase.event_id == event.id,
-            Purchase.status == "pending",
-            Purchase.created_at < cutoff,
-        )
-        .update({"status": "expired"}, synchronize_session=False)
-    )
-    db.session.commit()
-
-
-def _pending_or_paid_participants_for_event(event_id: int) -> int:
-    # Reserva cupos con pending (hasta que expiren) y cuenta paid.
-    return (
-        db.session.query(PurchaseParticipant.id)
-        .join(Purchase, PurchaseParticipant.purchase_id == Purchase.id)
-        .filter(
-            Purchase.event_id == event_id,
-            Purchase.status.in_(["pending", "paid"]),
-        )
-        .count()
-    )
-
-
-def remaining_capacity(event: Event) -> int | None:
+def package_capacity(event: Event) -> int | None:
     """
     Para PACKAGE: el cupo real es por sesión.
     En MVP, el cupo del pack es el mínimo cupo efectivo entre sesiones scheduled.
-    remaining = min_cap - used (used = participantes en pending/paid del evento)
 
     Si no hay sesiones scheduled, devolvemos None (no bloqueamos por cupo aquí).
     Si alguna sesión no tiene cupo (cap None), lo tratamos como ilimitado (None) y
@@ -59,31 +45,96 @@ def remaining_capacity(event: Event) -> int | None:
             return None
         caps.append(int(cap))
 
-    cap_pack = min(caps) if caps else None
+    return min(caps) if caps else None
+
+
+def remaining_capacity(event: Event) -> int | None:
+    # remaining = cupo del pack - used (used = participantes en pending/paid del evento)
+    cap_pack = package_capacity(event)
     if cap_pack is None:
         return None
 
-    used = _pending_or_paid_participants_for_event(event.id)
+    # contadores materializados: lectura O(1), sin escanear compras.
+    # Los pending y ofertas de lista de espera vencidos que el sweeper aún no expira
+    # no reservan (predicado al leer).
+    used = event.seats_reserved + event.seats_paid - released_seats(event.id)
     return max(cap_pack - used, 0)
 
 
 def compute_total_price(event: Event) -> int:
-    # En este blueprint solo estamos manejando PACKAGE.
+    # Precio del pack (PACKAGE); PER_OCCURRENCE suma effective_price() de cada sesión.
     return int(event.price or 0)
 
 
+def occurrence_capacity_left(occurrences) -> dict[int, int | None]:
+    """
+    PER_OCCURRENCE: cupos restantes de cada sesión (None = ilimitado).
+    Contadores materializados + una sola query agrupada para los pending y ofertas vencidos.
+    """
+    stale = released_seats_by_occurrence([oc.id for oc in occurrences])
+    left = {}
+    for oc in occurrences:
+        cap = oc.effective_capacity()
+        if cap is None:
+            left[oc.id] = None
+            continue
+        used = oc.seats_reserved + oc.seats_paid - stale.get(oc.id, 0)
+        left[oc.id] = max(int(cap) - used, 0)
+    return left
+
+
+def _read_buyer_form():
+    buyer_name = (request.form.get("buyer_name") or "").strip()
+    buyer_email = (request.form.get("buyer_email") or "").strip()
+    buyer_phone = (request.form.get("buyer_phone") or "").strip()
+
+    # Cantidad participantes
+    try:
+        participant_count = int(request.form.get("participant_count") or "1")
+    except ValueError:
+        participant_count = 1
+    participant_count = max(participant_count, 1)
+
+    # Lee participantes dinámicos (None si alguno viene incompleto)
+    participants = []
+    for i in range(participant_count):
+        pname = (request.form.get(f"participant_name_{i}") or "").strip()
+        page_raw = request.form.get(f"participant_age_{i}")
+
+        try:
+            page = int(page_raw)
+        except (TypeError, ValueError):
+            page = None
+
+        if (not pname) or (page is None) or (page <= 0):
+            participants = None
+            break
+
+        participants.append({"name": pname, "age": page})
+
+    return buyer_name, buyer_email, buyer_phone, participant_count, participants
+
+
+def _load_event(event_id: int) -> Event | None:
+    # occurrences se usan para cupo y listado; Occurrence.event sale del identity map
+    return db.session.get(
+        Event, event_id, options=[selectinload(Event.occurrences), raiseload("*", sql_only=True)]
+    )
+
+
 @checkout_bp.get("/event/<int:event_id>")
+@query_budget(3)
 def checkout_event(event_id: int):
-    event = Event.query.get(event_id)
+    event = _load_event(event_id)
     if event is None or event.status != "published":
         abort(404)
 
-    # Este checkout es solo para PACKAGE (como lo tenías).
+    if event.pricing_mode == "PER_OCCURRENCE":
+        return _occurrence_checkout(event)
+
     if event.pricing_mode != "PACKAGE":
         abort(400)
 
-    expire_old_pending(event)
-
     occurrences = sorted(
         [oc for oc in (event.occurrences or []) if oc.status == "scheduled"],
         key=lambda o: o.start_dt,
@@ -93,7 +144,8 @@ def checkout_event(event_id: int):
 
     capacity_left = remaining_capacity(event)
     if capacity_left is not None and capacity_left <= 0:
-        abort(409)
+        # sin cupos: en vez de un 409 pelado, se ofrece la lista de espera
+        return _render_waitlist_join(event, []), 409
 
     return render_template(
         "checkout/event_checkout.html",
@@ -107,16 +159,19 @@ def checkout_event(event_id: int):
 
 
 @checkout_bp.post("/event/<int:event_id>")
+@query_budget(10)
 def checkout_event_post(event_id: int):
-    event = Event.query.get(event_id)
+    event = _load_event(event_id)
     if event is None or event.status != "published":
         abort(404)
 
+    if event.pricing_mode == "PER_OCCURRENCE":
+        return _occurrence_checkout_post(event)
+
     if event.pricing_mode != "PACKAGE":
         abort(400)
 
-    # 1) Expira pending antiguos y recalcula cupos reales
-    expire_old_pending(event)
+    # 1) Cupos reales (los pending vencidos no cuentan; los expira el sweeper)
     capacity_left = remaining_capacity(event)
 
     occurrences = sorted(
@@ -135,36 +190,10 @@ def checkout_event_post(event_id: int):
             form=None,
         ), 409
 
-    # 2) Buyer
-    buyer_name = (request.form.get("buyer_name") or "").strip()
-    buyer_email = (request.form.get("buyer_email") or "").strip()
-    buyer_phone = (request.form.get("buyer_phone") or "").strip()
-
-    # 3) Cantidad participantes
-    try:
-        participant_count = int(request.form.get("participant_count") or "1")
-    except ValueError:
-        participant_count = 1
-    participant_count = max(participant_count, 1)
-
-    # 4) Lee participantes dinámicos
-    participants = []
-    for i in range(participant_count):
-        pname = (request.form.get(f"participant_name_{i}") or "").strip()
-        page_raw = request.form.get(f"participant_age_{i}")
-
-        try:
-            page = int(page_raw)
-        except (TypeError, ValueError):
-            page = None
-
-        if (not pname) or (page is None) or (page <= 0):
-            participants = None
-            break
-
-        participants.append({"name": pname, "age": page})
+    # 2) Buyer + participantes
+    buyer_name, buyer_email, buyer_phone, participant_count, participants = _read_buyer_form()
 
-    # 5) Validaciones
+    # 3) Validaciones
     if not buyer_name or not buyer_email or not buyer_phone or not participants:
         return render_template(
             "checkout/event_checkout.html",
@@ -199,11 +228,43 @@ def checkout_event_post(event_id: int):
             },
         ), 409
 
-    # 6) Precio: pack POR PARTICIPANTE
+    # 4) Reserva atómica: el UPDATE condicional decide, el chequeo de arriba es solo UX
+    try:
+        reserved = reserve_event_seats(
+            event.id,
+            participant_count,
+            package_capacity(event),
+            lock_timeout_ms=current_app.config["CHECKOUT_LOCK_TIMEOUT_MS"],
+            released=released_seats_expr(event.id),
+        )
+    except OperationalError:
+        # lock ocupado por otras compras simultáneas: falla rápido en vez de encolar
+        reserved = False
+
+    if not reserved:
+        db.session.rollback()
+        capacity_left = remaining_capacity(event)
+        return render_template(
+            "checkout/event_checkout.html",
+            event=event,
+            occurrences=occurrences,
+            total_price=compute_total_price(event) * participant_count,
+            capacity_left=capacity_left,
+            error="No fue posible reservar los cupos. Intenta nuevamente.",
+            form={
+                "buyer_name": buyer_name,
+                "buyer_email": buyer_email,
+                "buyer_phone": buyer_phone,
+                "participant_count": str(participant_count),
+                "participants_json": json.dumps(participants),
+            },
+        ), 409
+
+    # 5) Precio: pack POR PARTICIPANTE
     unit_price = compute_total_price(event)
     total_price = unit_price * participant_count
 
-    # 7) Crear Purchase + participants
+    # 6) Crear Purchase + participants
     purchase = Purchase(
         event_id=event.id,
         buyer_name=buyer_name,
@@ -215,24 +276,339 @@ def checkout_event_post(event_id: int):
 
     db.session.add(purchase)
     db.session.flush()
+    purchase_id = purchase.id
+    add_to_rollup([rollup_delta(event.id, purchase.created_at, "pending")])
 
-    for p in participants:
-        db.session.add(
-            PurchaseParticipant(
-                purchase_id=purchase.id,
-                name=p["name"],
-                age=p["age"],
-            )
+    # un solo INSERT (executemany) para todos los participantes
+    db.session.execute(
+        insert(PurchaseParticipant),
+        [{"purchase_id": purchase_id, "name": p["name"], "age": p["age"]} for p in participants],
+    )
+
+    db.session.commit()
+
+    return redirect(url_for("payments.webpay_start", purchase_id=purchase_id))
+
+
+def _render_occurrence_checkout(event, occurrences, capacity_left, selected=(), error=None, form=None):
+    return render_template(
+        "checkout/occurrence_checkout.html",
+        event=event,
+        occurrences=occurrences,
+        capacity_left=capacity_left,
+        selected=set(selected),
+        error=error,
+        form=form,
+    )
+
+
+def _occurrence_checkout(event: Event):
+    occurrences = sorted(
+        [oc for oc in (event.occurrences or []) if oc.status == "scheduled"],
+        key=lambda o: o.start_dt,
+    )
+    capacity_left = occurrence_capacity_left(occurrences)
+    if not occurrences:
+        abort(409)
+    if all(left is not None and left <= 0 for left in capacity_left.values()):
+        return _render_waitlist_join(event, occurrences), 409
+
+    return _render_occurrence_checkout(event, occurrences, capacity_left)
+
+
+def _occurrence_checkout_post(event: Event):
+    occurrences = sorted(
+        [oc for oc in (event.occurrences or []) if oc.status == "scheduled"],
+        key=lambda o: o.start_dt,
+    )
+    by_id = {oc.id: oc for oc in occurrences}
+
+    # 1) Sesiones elegidas: solo se aceptan sesiones scheduled de este evento
+    selected_ids = []
+    for raw in request.form.getlist("occurrence_ids"):
+        try:
+            occurrence_id = int(raw)
+        except ValueError:
+            continue
+        if occurrence_id in by_id and occurrence_id not in selected_ids:
+            selected_ids.append(occurrence_id)
+
+    # 2) Buyer + participantes
+    buyer_name, buyer_email, buyer_phone, participant_count, participants = _read_buyer_form()
+    form = {
+        "buyer_name": buyer_name,
+        "buyer_email": buyer_email,
+        "buyer_phone": buyer_phone,
+        "participant_count": str(participant_count),
+        "participants_json": json.dumps(participants if participants else []),
+    }
+
+    # 3) Validaciones
+    capacity_left = occurrence_capacity_left(occurrences)
+    if not buyer_name or not buyer_email or not buyer_phone or not participants or not selected_ids:
+        error = (
+            "Selecciona al menos una sesión."
+            if not selected_ids
+            else "Revisa los datos del comprador y de los participantes."
+        )
+        return _render_occurrence_checkout(
+            event, occurrences, capacity_left, selected_ids, error=error, form=form
+        ), 400
+
+    full = [
+        by_id[oid] for oid in selected_ids
+        if capacity_left[oid] is not None and participant_count > capacity_left[oid]
+    ]
+    if full:
+        dates = ", ".join(oc.start_dt.strftime("%d-%m-%Y %H:%M") for oc in full)
+        return _render_occurrence_checkout(
+            event, occurrences, capacity_left, selected_ids,
+            error=f"No hay cupos suficientes en: {dates}.", form=form,
+        ), 409
+
+    # 4) Reserva atómica: un UPDATE condicional para todas las sesiones elegidas
+    try:
+        reserved = reserve_occurrence_seats(
+            event.id,
+            selected_ids,
+            participant_count,
+            event.capacity_default,
+            lock_timeout_ms=current_app.config["CHECKOUT_LOCK_TIMEOUT_MS"],
+            released=released_occurrence_seats_expr(),
         )
+    except OperationalError:
+        reserved = False
+
+    if not reserved:
+        db.session.rollback()
+        return _render_occurrence_checkout(
+            event, occurrences, occurrence_capacity_left(occurrences), selected_ids,
+            error="No fue posible reservar los cupos. Intenta nuevamente.", form=form,
+        ), 409
+
+    # 5) Precio: suma de cada sesión, POR PARTICIPANTE
+    # (cada enlace guarda el de su sesión: el reembolso al cancelarla sale de ahí)
+    unit_prices = {oid: int(by_id[oid].effective_price() or 0) for oid in selected_ids}
+    total_price = sum(unit_prices.values()) * participant_count
+
+    # 6) Crear Purchase + participants + sesiones (inserts en bloque)
+    purchase = Purchase(
+        event_id=event.id,
+        buyer_name=buyer_name,
+        buyer_email=buyer_email,
+        buyer_phone=buyer_phone,
+        total_amount=total_price,
+        status="pending",
+    )
+
+    db.session.add(purchase)
+    db.session.flush()
+    purchase_id = purchase.id
+    add_to_rollup([rollup_delta(event.id, purchase.created_at, "pending")])
+
+    db.session.execute(
+        insert(PurchaseParticipant),
+        [{"purchase_id": purchase_id, "name": p["name"], "age": p["age"]} for p in participants],
+    )
+    db.session.execute(
+        insert(purchase_occurrences),
+        [
+            {"purchase_id": purchase_id, "occurrence_id": oid, "unit_price": unit_prices[oid]}
+            for oid in selected_ids
+        ],
+    )
 
     db.session.commit()
 
-    return redirect(url_for("payments.webpay_start", purchase_id=purchase.id))
+    return redirect(url_for("payments.webpay_start", purchase_id=purchase_id))
+
+
+def _render_waitlist_join(event, occurrences, selected=None, error=None, form=None):
+    # occurrences: sesiones entre las que elegir (PER_OCCURRENCE); vacío = cola del evento
+    return render_template(
+        "checkout/waitlist_join.html",
+        event=event,
+        occurrences=occurrences,
+        selected=selected,
+        error=error,
+        form=form,
+    )
+
+
+@checkout_bp.route("/event/<int:event_id>/waitlist", methods=["GET", "POST"])
+@query_budget(9)
+def waitlist_join(event_id: int):
+    event = _load_event(event_id)
+    if event is None or event.status != "published":
+        abort(404)
+    if event.pricing_mode not in ("PACKAGE", "PER_OCCURRENCE"):
+        abort(400)
+
+    occurrences = []
+    if event.pricing_mode == "PER_OCCURRENCE":
+        occurrences = sorted(
+            [oc for oc in (event.occurrences or []) if oc.status == "scheduled"],
+            key=lambda o: o.start_dt,
+        )
+        if not occurrences:
+            abort(409)
+
+    try:
+        selected = int(request.values.get("occurrence_id") or 0) or None
+    except ValueError:
+        selected = None
+    if selected is not None and selected not in {oc.id for oc in occurrences}:
+        selected = None
+
+    if request.method == "GET":
+        return _render_waitlist_join(event, occurrences, selected)
+
+    buyer_name, buyer_email, buyer_phone, participant_count, _ = _read_buyer_form()
+    form = {
+        "buyer_name": buyer_name,
+        "buyer_email": buyer_email,
+        "buyer_phone": buyer_phone,
+        "participant_count": str(participant_count),
+    }
+
+    if not buyer_name or not buyer_email or not buyer_phone or participant_count > 10:
+        return _render_waitlist_join(
+            event, occurrences, selected,
+            error="Revisa los datos de contacto.", form=form,
+        ), 400
+    if occurrences and selected is None:
+        return _render_waitlist_join(
+            event, occurrences, selected,
+            error="Selecciona la sesión que te interesa.", form=form,
+        ), 400
+
+    entry = join_waitlist(event.id, selected, buyer_name, buyer_email, buyer_phone, participant_count)
+    token = entry.token
+    db.session.commit()
+
+    return redirect(url_for("checkout.waitlist_offer", token=token))
+
+
+def _load_waitlist_entry(token: str) -> WaitlistEntry | None:
+    return db.session.execute(
+        select(WaitlistEntry)
+        .where(WaitlistEntry.token == token)
+        .options(
+            joinedload(WaitlistEntry.event).raiseload("*", sql_only=True),
+            joinedload(WaitlistEntry.occurrence).raiseload("*", sql_only=True),
+            raiseload("*", sql_only=True),
+        )
+    ).scalar_one_or_none()
+
+
+def _waitlist_position(entry: WaitlistEntry) -> int:
+    # entradas waiting antes que esta en la misma cola (por ix_waitlist_queue)
+    stmt = select(func.count(WaitlistEntry.id)).where(
+        WaitlistEntry.event_id == entry.event_id,
+        WaitlistEntry.status == "waiting",
+        WaitlistEntry.id < entry.id,
+    )
+    if entry.occurrence_id is None:
+        stmt = stmt.where(WaitlistEntry.occurrence_id.is_(None))
+    else:
+        stmt = stmt.where(WaitlistEntry.occurrence_id == entry.occurrence_id)
+    return (db.session.scalar(stmt) or 0) + 1
+
+
+def _waitlist_unit_price(entry: WaitlistEntry) -> int:
+    if entry.occurrence is not None:
+        return int(entry.occurrence.price_override or entry.event.price or 0)
+    return compute_total_price(entry.event)
+
+
+def _render_waitlist_offer(entry, error=None, form=None):
+    return render_template(
+        "checkout/waitlist_offer.html",
+        entry=entry,
+        position=_waitlist_position(entry) if entry.status == "waiting" else None,
+        offer_open=offer_is_open(entry),
+        total_price=_waitlist_unit_price(entry) * entry.participant_count,
+        error=error,
+        form=form,
+    )
+
+
+@checkout_bp.route("/waitlist/<token>", methods=["GET", "POST"])
+@query_budget(8)
+def waitlist_offer(token: str):
+    """Estado de la entrada en la lista de espera y, si tiene oferta vigente, el formulario para tomarla."""
+    entry = _load_waitlist_entry(token)
+    if entry is None:
+        abort(404)
+
+    if request.method == "GET":
+        return _render_waitlist_offer(entry)
+
+    if not offer_is_open(entry):
+        return _render_waitlist_offer(entry, error="La oferta ya no está vigente."), 409
+
+    # los cupos retenidos son exactamente los de la entrada
+    _, _, _, participant_count, participants = _read_buyer_form()
+    if participant_count != entry.participant_count or not participants:
+        return _render_waitlist_offer(
+            entry,
+            error="Revisa los datos de los participantes.",
+            form={"participants_json": json.dumps(participants if participants else [])},
+        ), 400
+
+    purchase = Purchase(
+        event_id=entry.event_id,
+        buyer_name=entry.buyer_name,
+        buyer_email=entry.buyer_email,
+        buyer_phone=entry.buyer_phone,
+        total_amount=_waitlist_unit_price(entry) * participant_count,
+        status="pending",
+    )
+    db.session.add(purchase)
+    db.session.flush()
+    purchase_id = purchase.id
+
+    # condicional: si la oferta venció entre la lectura y aquí, no se crea nada
+    if not claim_offer(entry.id, purchase_id):
+        db.session.rollback()
+        entry = _load_waitlist_entry(token)
+        return _render_waitlist_offer(entry, error="La oferta ya no está vigente."), 409
+
+    add_to_rollup([rollup_delta(entry.event_id, purchase.created_at, "pending")])
+    db.session.execute(
+        insert(PurchaseParticipant),
+        [{"purchase_id": purchase_id, "name": p["name"], "age": p["age"]} for p in participants],
+    )
+    if entry.occurrence_id is not None:
+        db.session.execute(
+            insert(purchase_occurrences),
+            [
+                {
+                    "purchase_id": purchase_id,
+                    "occurrence_id": entry.occurrence_id,
+                    "unit_price": _waitlist_unit_price(entry),
+                }
+            ],
+        )
+
+    db.session.commit()
+
+    return redirect(url_for("payments.webpay_start", purchase_id=purchase_id))
 
 
 @checkout_bp.get("/success/<int:purchase_id>")
+@query_budget(3)
 def checkout_success(purchase_id: int):
-    purchase = Purchase.query.get(purchase_id)
+    purchase = db.session.get(
+        Purchase,
+        purchase_id,
+        options=[
+            joinedload(Purchase.event).raiseload("*", sql_only=True),
+            selectinload(Purchase.participants),
+            selectinload(Purchase.occurrences).raiseload("*", sql_only=True),
+            raiseload("*", sql_only=True),
+        ],
+    )
     if purchase is None:
         abort(404)
     return render_template("checkout/success.html", purchase=purchase)
\ No newline at end of file
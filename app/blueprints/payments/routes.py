@@ -1,65 +1,56 @@
+import json
 from datetime import datetime, timezone
 
 from flask import Blueprint, current_app, render_template, request, abort, redirect, url_for
-
-from transbank.common.integration_type import IntegrationType
-from transbank.common.options import WebpayOptions
-from transbank.webpay.webpay_plus.transaction import Transaction
+from sqlalchemy import select, update
+from sqlalchemy.orm import raiseload, selectinload
 
 from app.extensions import db
+from app.instrumentation import timed
 from app.models import Purchase
+from app.query_budget import query_budget
+from app.services.enrollment import enroll_package_purchases
+from app.services.expiry import expire_purchases, is_stale_pending, pending_cutoff
+from app.services.outbox import enqueue_purchase_confirmation
+from app.services.rollups import add_to_rollup, rollup_delta
+from app.services.seats import shift_seats
+from app.services.waitlist import promote_waitlists
+from app.services.webpay import GatewayError, get_gateway
 
 
 payments_bp = Blueprint("payments", __name__, url_prefix="/pay")
 
 
-def _webpay_tx() -> Transaction:
-    commerce_code = current_app.config["WEBPAY_COMMERCE_CODE"]
-    api_key = current_app.config["WEBPAY_API_KEY"]
-    return Transaction(WebpayOptions(commerce_code, api_key, IntegrationType.TEST))
-
-
-def _attach_package_occurrences_if_needed(purchase: Purchase) -> None:
-    """
-    Regla de negocio:
-    - Si el evento es PACKAGE, al pagar se inscribe a TODAS las sesiones scheduled.
-    - Si ya están asignadas, no hace nada (idempotente).
-    """
-    # Asegura relaciones cargadas
-    event = purchase.event
-    if event is None:
-        return
-
-    if event.pricing_mode != "PACKAGE":
-        return
-
-    # Si ya tiene occurrences asociadas, no duplicar trabajo
-    if purchase.occurrences and len(purchase.occurrences) > 0:
-        return
-
-    scheduled = [oc for oc in (event.occurrences or []) if oc.status == "scheduled"]
-    if not scheduled:
-        return
-
-    purchase.occurrences = scheduled
-
-
 @payments_bp.get("/webpay/start/<int:purchase_id>")
+# pending vencido: +~11 por expirarlo aquí (cupos, rollup, lista de espera y su correo)
+@query_budget(13)
 def webpay_start(purchase_id: int):
-    purchase = Purchase.query.get(purchase_id)
+    purchase = db.session.get(Purchase, purchase_id, options=[raiseload("*", sql_only=True)])
     if purchase is None:
         abort(404)
 
     if purchase.status != "pending":
         return redirect(url_for("checkout.checkout_success", purchase_id=purchase.id))
 
+    # Sus cupos ya no cuentan como reservados (predicado al leer) y pueden estar
+    # vendidos: no se paga. Se expira aquí mismo, sin esperar al sweeper.
+    cutoff = pending_cutoff()
+    if is_stale_pending(purchase, cutoff):
+        expire_purchases([purchase_id], cutoff)
+        db.session.commit()
+        return redirect(url_for("checkout.checkout_success", purchase_id=purchase_id))
+
     return_url = url_for("payments.webpay_return", _external=True)
     buy_order = f"AR-{purchase.id}"
     session_id = str(purchase.id)
     amount = int(purchase.total_amount)
 
-    tx = _webpay_tx()
-    resp = tx.create(buy_order, session_id, amount, return_url)
+    try:
+        with timed("gateway"):
+            resp = get_gateway().create(buy_order, session_id, amount, return_url)
+    except GatewayError:
+        current_app.logger.exception("webpay create falló (purchase %s)", purchase.id)
+        abort(502)
 
     purchase.tbk_token = resp["token"]
     purchase.buy_order = buy_order
@@ -69,33 +60,98 @@ def webpay_start(purchase_id: int):
 
 
 @payments_bp.route("/webpay/return", methods=["GET", "POST"])
+# rechazo con lista de espera: +1 por buscar colas y ~5 por cada cola promovida
+@query_budget(20)
 def webpay_return():
     token = request.values.get("token_ws")
     if not token:
         abort(400)
 
-    purchase = Purchase.query.filter_by(tbk_token=token).first()
-    if purchase is None:
+    row = db.session.execute(
+        select(Purchase.id, Purchase.status).where(Purchase.tbk_token == token)
+    ).first()
+    if row is None:
         abort(404)
+    purchase_id, current_status = row
+
+    # Si ya está resuelto (o en curso en otro request), no vuelvas a commitear
+    if current_status != "pending":
+        return redirect(url_for("checkout.checkout_success", purchase_id=purchase_id))
+
+    # Idempotencia: transición condicional pending -> committing. Solo un request la
+    # gana y hace tx.commit; los duplicados/concurrentes ven rowcount 0 y devuelven
+    # el resultado guardado sin ir al gateway. Un pending vencido no se confirma:
+    # sus cupos ya se pudieron vender (sin tx.commit, Transbank no cobra).
+    cutoff = pending_cutoff()
+    claimed = db.session.execute(
+        update(Purchase)
+        .where(Purchase.id == purchase_id, Purchase.status == "pending", Purchase.created_at >= cutoff)
+        .values(status="committing"),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+
+    if not claimed:
+        # vencido: se expira ahora (no-op si otro request lo tomó o resolvió)
+        expire_purchases([purchase_id], cutoff)
+        db.session.commit()
+        return redirect(url_for("checkout.checkout_success", purchase_id=purchase_id))
+    db.session.commit()
 
-    # Si ya está resuelto, no vuelvas a commitear (idempotencia básica)
-    if purchase.status in ("paid", "failed", "expired", "cancelled"):
-        return redirect(url_for("checkout.checkout_success", purchase_id=purchase.id))
-
-    tx = _webpay_tx()
-    commit_resp = tx.commit(token)
+    try:
+        with timed("gateway"):
+            commit_resp = get_gateway().commit(token)
+    except GatewayError:
+        # Resultado desconocido: devolvemos la compra a pending para que se pueda reintentar
+        current_app.logger.exception("webpay commit falló (purchase %s)", purchase_id)
+        db.session.execute(
+            update(Purchase)
+            .where(Purchase.id == purchase_id, Purchase.status == "committing")
+            .values(status="pending"),
+            execution_options={"synchronize_session": False},
+        )
+        db.session.commit()
+        return redirect(url_for("checkout.checkout_success", purchase_id=purchase_id))
+
+    # participantes (cupos, rollup) y sesiones (lista de espera si se rechaza)
+    purchase = db.session.get(
+        Purchase,
+        purchase_id,
+        options=[
+            selectinload(Purchase.occurrences),
+            selectinload(Purchase.participants),
+            raiseload("*", sql_only=True),
+        ],
+    )
+    purchase.commit_response = json.dumps(commit_resp)
 
     status = (commit_resp.get("status") or "").upper()
 
     if status == "AUTHORIZED":
         purchase.status = "paid"
         purchase.paid_at = datetime.now(timezone.utc)
+        shift_seats([purchase.id], "committing", "paid")
+
+        # PACKAGE: inscribe en todas las sesiones scheduled (INSERT ... SELECT)
+        enroll_package_purchases([purchase.id], {purchase.id: len(purchase.participants)})
 
-        # ✅ Enlaza occurrences si es paquete
-        _attach_package_occurrences_if_needed(purchase)
+        # confirmación por correo: se encola en esta misma transacción y la envía el worker
+        enqueue_purchase_confirmation(purchase)
 
     else:
         purchase.status = "failed"
+        shift_seats([purchase.id], "committing", "failed")
+        # los cupos liberados pasan a la lista de espera (si hay) en la misma transacción
+        promote_waitlists([purchase.event_id], [oc.id for oc in purchase.occurrences])
+
+    add_to_rollup([
+        rollup_delta(
+            purchase.event_id,
+            purchase.created_at,
+            purchase.status,
+            amount=purchase.total_amount,
+            seats=len(purchase.participants),
+        )
+    ])
 
     db.session.commit()
-    return redirect(url_for("checkout.checkout_success", purchase_id=purchase.id))
\ No newline at end of file
+    return redirect(url_for("checkout.checkout_success", purchase_id=purchase_id))
\ No newline at end of file
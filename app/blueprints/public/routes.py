@@ -1,14 +1,24 @@
 from flask import Blueprint, render_template, abort
+from sqlalchemy.orm import raiseload, selectinload
+
+from app.cache import event_key, home_key
+from app.extensions import db, page_cache
 from app.models import Event
+from app.query_budget import query_budget
+from app.replica import read_replica
 
 public_bp = Blueprint("public", __name__)
 
 
 @public_bp.get("/")
+@query_budget(2)
+@read_replica
+@page_cache.cached(home_key)
 def home():
     events = (
         Event.query
-        .filter_by(status="published", pricing_mode="PACKAGE")
+        .options(selectinload(Event.occurrences), raiseload("*", sql_only=True))
+        .filter_by(status="published")
         .order_by(Event.created_at.desc())
         .all()
     )
@@ -16,8 +26,13 @@ def home():
 
 
 @public_bp.get("/events/<int:event_id>")
+@query_budget(2)
+@read_replica
+@page_cache.cached(event_key)
 def event_detail(event_id: int):
-    event = Event.query.get(event_id)
+    event = db.session.get(
+        Event, event_id, options=[selectinload(Event.occurrences), raiseload("*", sql_only=True)]
+    )
     if event is None:
         abort(404)
 
@@ -0,0 +1,198 @@
+# app/cache.py
+#
+# Cache de páginas públicas (home / detalle de evento).
+# El catálogo solo cambia cuando el admin edita Event/Occurrence, así que guardamos
+# el HTML renderizado y lo invalidamos desde los eventos de sesión de SQLAlchemy.
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, make_response, request
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session
+
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+
+class MemoryCache:
+    """
+    LRU en proceso con TTL. Cada worker tiene su propia copia: la invalidación solo
+    llega al proceso que hizo el commit (los demás dependen del TTL). Con varios
+    workers conviene el backend redis.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class RedisCache:
+    # Acepta cualquier cliente con get/setex/delete (redis.Redis o un fake en tests).
+    def __init__(self, client, ttl: float = 300, prefix: str = "ar:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.setex(self.prefix + key, int(ttl or self.ttl), json.dumps(value))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + k for k in keys])
+
+
+def home_key() -> str:
+    return "public:home"
+
+
+def event_key(event_id: int) -> str:
+    return f"public:event:{event_id}"
+
+
+class PageCache:
+    def __init__(self):
+        self.backend = NullCache()
+        self.max_age = 0
+        self.replica_ttl = None
+
+    def init_app(self, app):
+        backend = app.config["PUBLIC_CACHE_BACKEND"]
+        ttl = app.config["PUBLIC_CACHE_TTL"]
+
+        if backend == "memory":
+            self.backend = MemoryCache(app.config["PUBLIC_CACHE_MAX_ENTRIES"], ttl)
+        elif backend == "redis":
+            import redis  # dependencia opcional
+
+            self.backend = RedisCache(redis.Redis.from_url(app.config["REDIS_URL"]), ttl)
+        else:
+            self.backend = NullCache()
+
+        self.max_age = app.config["PUBLIC_CACHE_MAX_AGE"]
+        self.replica_ttl = app.config["REPLICA_CACHE_TTL"]
+        app.extensions["page_cache"] = self
+
+    def invalidate(self, event_ids=()) -> None:
+        self.backend.delete(home_key(), *[event_key(eid) for eid in event_ids])
+
+    def cached(self, key_func):
+        """
+        Decorador para vistas públicas que devuelven HTML (str).
+        Sirve desde cache y responde 304 si el navegador/CDN trae ETag o fecha vigente.
+        """
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = key_func(**kwargs)
+                entry = self.backend.get(key)
+
+                if entry is None:
+                    rv = view(*args, **kwargs)
+                    if not isinstance(rv, str):
+                        return rv
+                    entry = {
+                        "body": rv,
+                        "etag": hashlib.sha1(rv.encode("utf-8")).hexdigest(),
+                        "last_modified": int(time.time()),
+                    }
+                    # renderizada desde la réplica: puede venir atrasada, se guarda poco tiempo
+                    self.backend.set(key, entry, self.replica_ttl if g.get("db_replica_used") else None)
+
+                resp = make_response(entry["body"])
+                resp.set_etag(entry["etag"])
+                resp.last_modified = entry["last_modified"]
+                resp.cache_control.public = True
+                resp.cache_control.max_age = self.max_age
+                if not self.max_age:
+                    resp.cache_control.must_revalidate = True
+                return resp.make_conditional(request)
+
+            return wrapper
+
+        return decorator
+
+
+# ---------------------------------------------------------------------
+# Invalidación: cualquier escritura ORM sobre Event/Occurrence
+# ---------------------------------------------------------------------
+
+def _touched_event_ids(session) -> set[int]:
+    from app.models import Event, Occurrence
+
+    ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Event):
+            ids.add(obj.id)
+        elif isinstance(obj, Occurrence):
+            ids.add(obj.event_id)
+    return ids
+
+
+@sa_event.listens_for(Session, "after_flush")
+def _collect_catalog_changes(session, flush_context):
+    # en after_flush new/dirty/deleted siguen disponibles y los ids nuevos ya existen
+    touched = _touched_event_ids(session)
+    touched.discard(None)
+    if touched:
+        session.info.setdefault("catalog_changes", set()).update(touched)
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _invalidate_catalog(session):
+    changed = session.info.pop("catalog_changes", None)
+    if changed is None:
+        return
+
+    from app.extensions import page_cache
+
+    page_cache.invalidate(changed)
+
+
+@sa_event.listens_for(Session, "after_soft_rollback")
+def _discard_catalog_changes(session, previous_transaction):
+    session.info.pop("catalog_changes", None)
@@ -1,6 +1,11 @@
 import getpass
+import time
+import click
+from sqlalchemy import create_engine
 from app.extensions import db
 from app.models import User
+from app.services.expiry import expire_stale_pending, run_expiry_sweeper
+from app.services.seats import rebuild_seat_ledger
 
 
 def register_cli(app):
@@ -35,3 +40,354 @@ def register_cli(app):
         db.session.commit()
 
         print("Admin creado OK.")
+
+    @app.cli.command("seats-reconcile")
+    @click.option("--dry-run", is_flag=True, help="Solo reporta diferencias, no corrige.")
+    def seats_reconcile(dry_run):
+        """Rebuild seat counters from purchases and report drift."""
+
+        drift = rebuild_seat_ledger(apply=not dry_run)
+
+        for table, row_id, column, stored, actual in drift:
+            print(f"{table}#{row_id} {column}: {stored} -> {actual}")
+
+        if dry_run:
+            db.session.rollback()
+            print(f"Diferencias encontradas: {len(drift)} (sin cambios).")
+            return
+
+        db.session.commit()
+        print(f"Contadores reconstruidos. Diferencias corregidas: {len(drift)}.")
+
+    @app.cli.command("rollups-rebuild")
+    def rollups_rebuild():
+        """Recompute the sales_daily rollup table from purchases."""
+        from app.services.rollups import rebuild_rollups
+
+        started = time.perf_counter()
+        rows = rebuild_rollups()
+        db.session.commit()
+        print(f"Rollups reconstruidos: {rows} filas (evento, día) en {time.perf_counter() - started:.1f}s.")
+
+    @app.cli.command("expire-pending")
+    @click.option("--batch-size", type=int, default=None, help="Compras por lote/commit.")
+    @click.option("--loop", is_flag=True, help="Queda corriendo como worker.")
+    @click.option("--interval", type=float, default=60.0, show_default=True, help="Segundos entre pasadas (--loop).")
+    def expire_pending(batch_size, loop, interval):
+        """Expire stale pending purchases and waitlist offers across all events."""
+
+        if loop:
+            print(f"Sweeper activo cada {interval}s (Ctrl+C para salir).")
+            run_expiry_sweeper(app, interval)
+            return
+
+        from app.services.waitlist import expire_waitlist_offers
+
+        n = expire_stale_pending(batch_size)
+        offers = expire_waitlist_offers()
+        print(f"Compras expiradas: {n}. Ofertas de lista de espera vencidas: {offers}.")
+
+    @app.cli.command("outbox-send")
+    @click.option("--batch-size", type=int, default=None, help="Correos por lote (default: OUTBOX_BATCH_SIZE).")
+    @click.option("--loop", is_flag=True, help="Queda corriendo como worker.")
+    @click.option("--interval", type=float, default=10.0, show_default=True, help="Segundos entre pasadas (--loop).")
+    def outbox_send(batch_size, loop, interval):
+        """Deliver queued emails (purchase confirmations) in batches."""
+        from app.services.outbox import deliver_outbox, run_outbox_worker
+
+        if loop:
+            print(f"Worker de correos activo cada {interval}s (Ctrl+C para salir).")
+            run_outbox_worker(app, interval)
+            return
+
+        totals = deliver_outbox(batch_size=batch_size)
+        print(
+            f"Correos enviados: {totals['sent']}. Reprogramados: {totals['retried']}. "
+            f"Fallidos: {totals['failed']}."
+        )
+
+    @app.cli.command("cancellation-jobs")
+    @click.option("--loop", is_flag=True, help="Queda corriendo como worker.")
+    @click.option("--interval", type=float, default=30.0, show_default=True, help="Segundos entre pasadas (--loop).")
+    def cancellation_jobs(loop, interval):
+        """Run due occurrence cancellation jobs (refunds / reassignment), resuming stalled ones."""
+        from app.services.cancellation import run_cancellation_worker, run_due_cancellation_jobs
+
+        if loop:
+            print(f"Worker de cancelaciones activo cada {interval}s (Ctrl+C para salir).")
+            run_cancellation_worker(app, interval)
+            return
+
+        print(f"Jobs de cancelación procesados: {run_due_cancellation_jobs()}.")
+
+    @app.cli.command("payments-reconcile")
+    @click.option("--batch-size", type=int, default=None, help="Compras por lote/commit (default: RECONCILE_BATCH_SIZE).")
+    @click.option("--concurrency", type=int, default=None, help="Consultas simultáneas al gateway (default: RECONCILE_CONCURRENCY).")
+    @click.option("--min-age-minutes", type=int, default=None, help="Solo compras más antiguas (default: RECONCILE_MIN_AGE_MINUTES).")
+    @click.option("--dry-run", is_flag=True, help="Consulta y clasifica sin escribir.")
+    def payments_reconcile(batch_size, concurrency, min_age_minutes, dry_run):
+        """Reconcile pending/committing/expired purchases with the gateway transaction status."""
+        from app.services.reconcile import reconcile_payments
+
+        r = reconcile_payments(
+            batch_size=batch_size, concurrency=concurrency, min_age_minutes=min_age_minutes, dry_run=dry_run
+        )
+        prefix = "(dry-run) " if dry_run else ""
+        print(
+            f"{prefix}Revisadas: {r['scanned']}. Pagadas: {r['paid']} (de ellas expiradas: {r['recovered_expired']}). "
+            f"Fallidas: {r['failed']}. Devueltas a pending: {r['reverted']}. Sin cambio: {r['unchanged']}. "
+            f"Errores del gateway: {r['errors']}. Monto distinto: {r['mismatched']}."
+        )
+        print(f"{r['elapsed_s']}s ({r['gateway_s']}s esperando al gateway) · {r['purchases_per_s']} compras/s")
+        if r["recovered_expired"]:
+            print("Revisa el cupo de los eventos: compras expiradas volvieron a ocupar lugar.")
+
+    @app.cli.command("db-explain")
+    @click.option("--url", default=None, help="Otra base (p.ej. postgresql://...) en vez de la configurada.")
+    @click.option("--event-id", type=int, default=1, show_default=True)
+    @click.option("--verbose", is_flag=True, help="Muestra el plan completo de cada query.")
+    def db_explain(url, event_id, verbose):
+        """EXPLAIN the app's hot queries and flag full table scans."""
+        from app.perf.explain import explain_hot_queries
+
+        engine = create_engine(url) if url else db.engine
+        with engine.connect() as conn:
+            report = explain_hot_queries(conn, event_id)
+
+        flagged = 0
+        for item in report:
+            mark = "FULL SCAN" if item["full_scans"] else "ok"
+            print(f"[{mark}] {item['name']}")
+            for line in item["full_scans"]:
+                print(f"    {line}")
+            if verbose:
+                for line in item["plan"]:
+                    print(f"      | {line}")
+            flagged += bool(item["full_scans"])
+
+        print(f"{flagged} de {len(report)} queries con full scan ({engine.dialect.name}).")
+
+    @app.cli.command("bench-capacity")
+    @click.option("--sizes", default="10000,100000,1000000", show_default=True, help="Cantidad de compras, separadas por coma.")
+    @click.option("--repeat", type=int, default=20, show_default=True)
+    @click.option("--no-indexes", is_flag=True, help="Mide sin los índices de compras (comparación).")
+    def bench_capacity(sizes, repeat, no_indexes):
+        """Benchmark capacity-check latency on seeded SQLite datasets."""
+        from app.perf.bench import capacity_benchmark
+
+        sizes = [int(s) for s in sizes.split(",") if s.strip()]
+        print(f"{'compras':>10} {'índices':>8} {'COUNT legacy (ms)':>18} {'ledger (ms)':>12}")
+        for row in capacity_benchmark(sizes, repeat=repeat, with_indexes=not no_indexes):
+            print(
+                f"{row['purchases']:>10} {str(row['indexes']):>8} "
+                f"{row['legacy_count_ms']:>18} {row['ledger_ms']:>12}"
+            )
+
+    @app.cli.command("seed")
+    @click.option("--url", default=None, help="Otra base en vez de la configurada (p.ej. postgresql://...).")
+    @click.option("--create-tables", is_flag=True, help="Crea las tablas si no existen (bases desechables).")
+    @click.option("--events", type=int, default=200, show_default=True)
+    @click.option("--occurrences-per-event", type=int, default=4, show_default=True)
+    @click.option("--purchases", type=int, default=100_000, show_default=True)
+    @click.option("--status-mix", default="paid=0.6,pending=0.1,expired=0.25,failed=0.05", show_default=True)
+    @click.option("--participants", "participant_mix", default="1=0.5,2=0.3,3=0.2", show_default=True, help="Participantes por compra.")
+    @click.option("--per-occurrence-share", type=float, default=0.3, show_default=True, help="Fracción de eventos PER_OCCURRENCE.")
+    @click.option("--days", type=int, default=90, show_default=True, help="Antigüedad máxima de las compras.")
+    @click.option("--chunk-size", type=int, default=50_000, show_default=True, help="Compras por transacción.")
+    @click.option("--seed", type=int, default=0, show_default=True)
+    def seed(url, create_tables, events, occurrences_per_event, purchases, status_mix, participant_mix,
+             per_occurrence_share, days, chunk_size, seed):
+        """Bulk-generate synthetic events, sessions, purchases and participants."""
+        from app.perf.seed import parse_mix, seed_dataset
+
+        try:
+            statuses = parse_mix(status_mix)
+            sizes = parse_mix(participant_mix, cast=int)
+        except ValueError as exc:
+            raise click.BadParameter(str(exc))
+
+        engine = create_engine(url) if url else db.engine
+        if create_tables:
+            db.metadata.create_all(engine)
+
+        started = time.perf_counter()
+        with engine.connect() as conn:
+            counts = seed_dataset(
+                conn,
+                events=events,
+                occurrences_per_event=occurrences_per_event,
+                purchases=purchases,
+                seed=seed,
+                chunk_size=chunk_size,
+                status_mix=statuses,
+                participant_mix=sizes,
+                per_occurrence_share=per_occurrence_share,
+                days=days,
+                defer_indexes=True,
+            )
+            conn.commit()
+
+        elapsed = time.perf_counter() - started
+        print(", ".join(f"{name}: {n}" for name, n in counts.items()))
+        print(f"Listo en {elapsed:.1f}s ({purchases / elapsed:,.0f} compras/s).")
+        print("Los rollups del dashboard no se tocan: corre `flask rollups-rebuild` si los necesitas.")
+
+    @app.cli.command("bench")
+    @click.option("--url", default=None, help="Base vacía a usar (p.ej. postgresql://...); por defecto SQLite temporal.")
+    @click.option("--events", type=int, default=20, show_default=True)
+    @click.option("--purchases", type=int, default=20_000, show_default=True)
+    @click.option("--requests", "n_requests", type=int, default=200, show_default=True, help="Requests medidos por escenario.")
+    @click.option("--warmup", type=int, default=20, show_default=True)
+    @click.option("--concurrency", type=int, default=1, show_default=True)
+    @click.option("--gateway-latency", type=float, default=0.0, show_default=True, help="Latencia (s) del gateway fake.")
+    @click.option("--baseline", default=None, help="Baseline JSON a comparar (default: app/perf/baseline.json).")
+    @click.option("--save-baseline", is_flag=True, help="Guarda el resultado como nuevo baseline.")
+    @click.option("--tolerance", type=float, default=0.25, show_default=True, help="Holgura relativa del p95.")
+    def bench(url, events, purchases, n_requests, warmup, concurrency, gateway_latency, baseline, save_baseline, tolerance):
+        """Benchmark hot request paths and compare against a baseline."""
+        from app.perf.bench import (
+            DEFAULT_BASELINE,
+            compare_to_baseline,
+            load_baseline,
+            request_benchmark,
+            save_baseline as write_baseline,
+        )
+
+        results = request_benchmark(
+            url=url,
+            events=events,
+            purchases=purchases,
+            requests=n_requests,
+            warmup=warmup,
+            concurrency=concurrency,
+            gateway_latency=gateway_latency,
+        )
+
+        meta = results["meta"]
+        print(
+            f"{meta['dialect']} · {meta['purchases']} compras · {meta['events']} eventos · "
+            f"concurrencia {meta['concurrency']} · gateway {meta['gateway_latency']}s"
+        )
+        print(f"{'escenario':<30} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6} {'req/s':>8} {'err':>4}")
+        for name, row in results["scenarios"].items():
+            print(
+                f"{name:<30} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} "
+                f"{row['queries_per_request']:>6} {row['throughput_rps']:>8} {row['errors']:>4}"
+            )
+
+        path = baseline or DEFAULT_BASELINE
+        if save_baseline:
+            write_baseline(path, results)
+            print(f"Baseline guardado en {path}.")
+            return
+
+        stored = load_baseline(path)
+        if stored is None:
+            print(f"Sin baseline en {path} (usa --save-baseline).")
+            return
+
+        problems = compare_to_baseline(results, stored, tolerance=tolerance)
+        for line in problems:
+            print(f"REGRESIÓN {line}")
+        if problems:
+            raise SystemExit(1)
+        print("Sin regresiones respecto al baseline.")
+
+    @app.cli.command("bench-checkout")
+    @click.option("--requests", "n_requests", type=int, default=400, show_default=True)
+    @click.option("--concurrency", type=int, default=8, show_default=True)
+    @click.option("--profile", "profiles", multiple=True, help="default | production (por defecto ambos).")
+    def bench_checkout(n_requests, concurrency, profiles):
+        """Load-test concurrent checkouts under each engine profile."""
+        from app.perf.bench import ENGINE_PROFILES, checkout_load_benchmark
+
+        results = checkout_load_benchmark(
+            profiles=profiles or tuple(ENGINE_PROFILES),
+            requests=n_requests,
+            concurrency=concurrency,
+        )
+
+        print(f"SQLite · {n_requests} checkouts · concurrencia {concurrency} · mismo evento")
+        print(f"{'perfil':<12} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5} {'compras':>8} {'drift':>6}")
+        for name, row in results["profiles"].items():
+            print(
+                f"{name:<12} {row['throughput_rps']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+                f"{row['p99_ms']:>8} {row['errors']:>5} {row['purchases_created']:>8} {row['ledger_drift']:>6}"
+            )
+
+    @app.cli.command("replica-sync")
+    @click.option("--loop", is_flag=True, help="Queda copiando cada --interval segundos.")
+    @click.option("--interval", type=float, default=2.0, show_default=True, help="Segundos entre copias (simula el lag).")
+    def replica_sync(loop, interval):
+        """Copy the SQLite primary over the SQLite replica (fake replicator for local testing)."""
+        from app.replica import REPLICA_BIND, sync_sqlite_replica
+
+        if REPLICA_BIND not in db.engines:
+            print("Configura DATABASE_REPLICA_URL (sqlite:///...).")
+            return
+        # URLs de los engines: Flask-SQLAlchemy ya resolvió rutas relativas a instance/
+        primary, replica = db.engine.url, db.engines[REPLICA_BIND].url
+        if primary.get_backend_name() != "sqlite" or replica.get_backend_name() != "sqlite":
+            print("El replicador fake solo copia bases SQLite (en PostgreSQL usa replicación real).")
+            return
+
+        while True:
+            sync_sqlite_replica(primary.database, replica.database)
+            if not loop:
+                print(f"Réplica actualizada: {replica.database}.")
+                return
+            time.sleep(interval)
+
+    @app.cli.command("bench-startup")
+    @click.option("--runs", type=int, default=5, show_default=True)
+    @click.option("--blueprints", default=None, help="ENABLED_BLUEPRINTS del proceso medido (\"\" = ninguno).")
+    @click.option("--path", default="/", show_default=True, help="Primer request (\"\" = sin request).")
+    @click.option("--budget-ms", type=float, default=None, help="Falla si el arranque total lo supera (default: STARTUP_BUDGET_MS).")
+    def bench_startup(runs, blueprints, path, budget_ms):
+        """Measure process startup (imports, create_app, first request) against a budget."""
+        from app.perf.startup import startup_benchmark
+
+        result = startup_benchmark(runs=runs, blueprints=blueprints, path=path or None)
+        budget_ms = budget_ms or app.config["STARTUP_BUDGET_MS"]
+
+        print(f"blueprints: {', '.join(result['blueprints']) or '(ninguno)'} · {result['modules']} módulos · mediana de {runs}")
+        print(f"import app       {result['import_ms']:>8} ms")
+        print(f"create_app()     {result['create_app_ms']:>8} ms")
+        if result["first_request_ms"] is not None:
+            print(f"primer request   {result['first_request_ms']:>8} ms")
+        print(f"total (proceso)  {result['total_ms']:>8} ms  (presupuesto {budget_ms:.0f} ms)")
+        print("imports de primer nivel más caros (-X importtime, acumulado):")
+        for name, ms in result["top_imports"]:
+            print(f"  {name:<40} {ms:>8.1f} ms")
+
+        if result["total_ms"] > budget_ms:
+            print("ARRANQUE SOBRE EL PRESUPUESTO")
+            raise SystemExit(1)
+
+    @app.cli.command("bench-reconcile")
+    @click.option("--purchases", type=int, default=2000, show_default=True)
+    @click.option("--concurrency", "concurrencies", type=int, multiple=True, help="Repetible (default: 1 y 8).")
+    @click.option("--latency", type=float, default=0.02, show_default=True, help="Segundos por consulta al gateway fake.")
+    @click.option("--batch-size", type=int, default=200, show_default=True)
+    def bench_reconcile(purchases, concurrencies, latency, batch_size):
+        """Benchmark payment reconciliation against the fake gateway."""
+        from app.perf.bench import reconcile_benchmark
+
+        results = reconcile_benchmark(
+            purchases=purchases,
+            concurrencies=concurrencies or (1, 8),
+            gateway_latency=latency,
+            batch_size=batch_size,
+        )
+
+        print(f"SQLite · {purchases} compras con token · gateway fake {latency * 1000:.0f} ms · lotes de {batch_size}")
+        print(
+            f"{'hilos':>5} {'compras/s':>10} {'total s':>8} {'gateway s':>10} {'pagadas':>8} "
+            f"{'fallidas':>9} {'a pending':>9} {'sin camb.':>9} {'drift':>6} {'rollups':>8}"
+        )
+        for concurrency, row in results["concurrency"].items():
+            print(
+                f"{concurrency:>5} {row['purchases_per_s']:>10} {row['elapsed_s']:>8} {row['gateway_s']:>10} "
+                f"{row['paid']:>8} {row['failed']:>9} {row['reverted']:>9} {row['unchanged']:>9} "
+                f"{row['ledger_drift']:>6} {row['rollup_drift']:>8}"
+            )
@@ -1,21 +1,176 @@
 import os
 
+
+def _optional_int(name: str, default: str | None = None) -> int | None:
+    value = os.getenv(name, default)
+    return int(value) if value not in (None, "") else None
+
+
 class BaseConfig:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///ajedrezrecreativo.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     TEMPLATES_AUTO_RELOAD = True
 
+    # Blueprints a registrar (separados por coma; vacío = ninguno, p.ej. workers).
+    # public, checkout y payments se enlazan entre sí y se cargan juntos.
+    ENABLED_BLUEPRINTS = tuple(
+        name.strip()
+        for name in os.getenv("ENABLED_BLUEPRINTS", "public,admin,checkout,payments").split(",")
+        if name.strip()
+    )
+    # Flask-Migrate: auto = solo bajo el CLI de flask (`flask db ...`); 1 / 0 fuerza
+    MIGRATIONS = os.getenv("MIGRATIONS", "auto")
+    # Presupuesto de arranque (import + create_app + primer request) para `flask bench-startup`
+    STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+    # Engine / pool (ver app/database.py). None = default de SQLAlchemy.
+    # En producción el pool por worker debería cubrir sus hilos: pool_size >= threads.
+    DB_POOL_SIZE = _optional_int("DB_POOL_SIZE")
+    DB_MAX_OVERFLOW = _optional_int("DB_MAX_OVERFLOW")
+    DB_POOL_TIMEOUT = _optional_int("DB_POOL_TIMEOUT")
+    DB_POOL_RECYCLE = _optional_int("DB_POOL_RECYCLE")
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING") == "1"
+    # PostgreSQL: corta queries más largas que esto (ms); 0 = sin límite (p.ej. seed / rollups-rebuild)
+    DB_STATEMENT_TIMEOUT_MS = _optional_int("DB_STATEMENT_TIMEOUT_MS")
+    # SQLite: PRAGMAs por conexión (WAL permite leer mientras otro escribe)
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS")
+    SQLITE_BUSY_TIMEOUT_MS = _optional_int("SQLITE_BUSY_TIMEOUT_MS")
+
+    # Réplica de lectura opcional (ver app/replica.py): catálogo público y reportes del admin
+    SQLALCHEMY_REPLICA_URI = os.getenv("DATABASE_REPLICA_URL")
+    # tras escribir, ese cliente sigue leyendo del primario estos segundos (read-your-writes)
+    REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+    # páginas públicas renderizadas desde la réplica se cachean menos (podría venir atrasada)
+    REPLICA_CACHE_TTL = int(os.getenv("REPLICA_CACHE_TTL", "30"))
+
+    # Checkout: máximo a esperar por el lock de cupos antes de responder 409 (PostgreSQL;
+    # en SQLite la espera la fija SQLITE_BUSY_TIMEOUT_MS por conexión)
+    CHECKOUT_LOCK_TIMEOUT_MS = int(os.getenv("CHECKOUT_LOCK_TIMEOUT_MS", "2000"))
+
+    # Compras pending: dejan de reservar cupo pasado el TTL; el sweeper las marca expired
+    PENDING_PURCHASE_TTL_MINUTES = int(os.getenv("PENDING_PURCHASE_TTL_MINUTES", "120"))
+    EXPIRY_SWEEP_BATCH_SIZE = int(os.getenv("EXPIRY_SWEEP_BATCH_SIZE", "500"))
+    # 0 = sin hilo en proceso (usar `flask expire-pending --loop` o cron)
+    EXPIRY_SWEEP_INTERVAL_SECONDS = float(os.getenv("EXPIRY_SWEEP_INTERVAL_SECONDS", "0"))
+
+    # Lista de espera: minutos que se retienen los cupos ofrecidos. Al vencer dejan de
+    # retener aunque no corra el sweeper; el sweeper las marca expired y ofrece al siguiente
+    WAITLIST_OFFER_MINUTES = int(os.getenv("WAITLIST_OFFER_MINUTES", "30"))
+    # URL pública del sitio para los enlaces de los correos (el worker no tiene request)
+    PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:5000")
+
+    # Correos: smtp | log (solo loguea). Se encolan en outbox_messages y los entrega
+    # `flask outbox-send --loop` (o el hilo en proceso, ver OUTBOX_WORKER_INTERVAL_SECONDS)
+    MAIL_BACKEND = os.getenv("MAIL_BACKEND", "smtp")
+    MAIL_FROM = os.getenv("MAIL_FROM", "Ajedrez Recreativo <no-reply@localhost>")
+    MAIL_SMTP_HOST = os.getenv("MAIL_SMTP_HOST", "localhost")
+    MAIL_SMTP_PORT = int(os.getenv("MAIL_SMTP_PORT", "587"))
+    MAIL_SMTP_USER = os.getenv("MAIL_SMTP_USER")
+    MAIL_SMTP_PASSWORD = os.getenv("MAIL_SMTP_PASSWORD")
+    MAIL_SMTP_STARTTLS = os.getenv("MAIL_SMTP_STARTTLS", "1") == "1"
+    MAIL_SMTP_TIMEOUT = float(os.getenv("MAIL_SMTP_TIMEOUT", "10"))
+    # conexiones SMTP abiertas (y envíos en paralelo) por worker
+    MAIL_SMTP_POOL_SIZE = int(os.getenv("MAIL_SMTP_POOL_SIZE", "4"))
+    # límite del proveedor; 0 = sin límite
+    MAIL_RATE_PER_SECOND = float(os.getenv("MAIL_RATE_PER_SECOND", "5"))
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+    # reintentos: 30s, 1m, 2m, ... hasta OUTBOX_RETRY_MAX_SECONDS; luego failed
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+    OUTBOX_RETRY_BACKOFF_SECONDS = float(os.getenv("OUTBOX_RETRY_BACKOFF_SECONDS", "30"))
+    OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "3600"))
+    # un lote tomado por un worker que murió vuelve a estar disponible pasado este tiempo
+    OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+    # 0 = sin hilo en proceso
+    OUTBOX_WORKER_INTERVAL_SECONDS = float(os.getenv("OUTBOX_WORKER_INTERVAL_SECONDS", "0"))
+
+    # Cache de páginas públicas: memory | redis | null
+    PUBLIC_CACHE_BACKEND = os.getenv("PUBLIC_CACHE_BACKEND", "memory")
+    PUBLIC_CACHE_TTL = int(os.getenv("PUBLIC_CACHE_TTL", "300"))
+    PUBLIC_CACHE_MAX_ENTRIES = int(os.getenv("PUBLIC_CACHE_MAX_ENTRIES", "256"))
+    # max-age para navegadores/CDN; 0 = revalidar siempre (ETag/304)
+    PUBLIC_CACHE_MAX_AGE = int(os.getenv("PUBLIC_CACHE_MAX_AGE", "0"))
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
     # Webpay (se cargan desde .env)
     WEBPAY_COMMERCE_CODE = os.getenv("WEBPAY_COMMERCE_CODE")
     WEBPAY_API_KEY = os.getenv("WEBPAY_API_KEY")
+    # integration | production (WEBPAY_BASE_URL lo sobreescribe, p.ej. servidor fake)
+    WEBPAY_ENVIRONMENT = os.getenv("WEBPAY_ENVIRONMENT", "integration")
+    WEBPAY_BASE_URL = os.getenv("WEBPAY_BASE_URL")
+    WEBPAY_CONNECT_TIMEOUT = float(os.getenv("WEBPAY_CONNECT_TIMEOUT", "3"))
+    WEBPAY_READ_TIMEOUT = float(os.getenv("WEBPAY_READ_TIMEOUT", "10"))
+    WEBPAY_RETRIES = int(os.getenv("WEBPAY_RETRIES", "2"))
+    WEBPAY_RETRY_BACKOFF = float(os.getenv("WEBPAY_RETRY_BACKOFF", "0.3"))
+    WEBPAY_POOL_SIZE = int(os.getenv("WEBPAY_POOL_SIZE", "10"))
+
+    # Conciliación (`flask payments-reconcile`): compras con token sin resultado final.
+    # La concurrencia no debería superar WEBPAY_POOL_SIZE (conexiones al gateway).
+    RECONCILE_BATCH_SIZE = int(os.getenv("RECONCILE_BATCH_SIZE", "200"))
+    RECONCILE_CONCURRENCY = int(os.getenv("RECONCILE_CONCURRENCY", "8"))
+    # más nuevas pueden seguir en el formulario de Webpay
+    RECONCILE_MIN_AGE_MINUTES = int(os.getenv("RECONCILE_MIN_AGE_MINUTES", "15"))
+    # Transbank responde el estado de transacciones de hasta 7 días
+    RECONCILE_LOOKBACK_HOURS = int(os.getenv("RECONCILE_LOOKBACK_HOURS", "168"))
+
+    # Cancelación de sesiones: compras afectadas por lote/commit y reembolsos simultáneos
+    CANCELLATION_BATCH_SIZE = int(os.getenv("CANCELLATION_BATCH_SIZE", "200"))
+    CANCELLATION_REFUND_CONCURRENCY = int(os.getenv("CANCELLATION_REFUND_CONCURRENCY", "4"))
+    # un job tomado por un worker que murió vuelve a estar disponible pasado este tiempo
+    CANCELLATION_LEASE_SECONDS = int(os.getenv("CANCELLATION_LEASE_SECONDS", "300"))
+    # con compras pending en la sesión, el job se retoma cada tanto hasta que se resuelvan
+    CANCELLATION_RECHECK_SECONDS = int(os.getenv("CANCELLATION_RECHECK_SECONDS", "300"))
+    # 0 = sin hilo en proceso (usar `flask cancellation-jobs --loop` o cron)
+    CANCELLATION_WORKER_INTERVAL_SECONDS = float(os.getenv("CANCELLATION_WORKER_INTERVAL_SECONDS", "0"))
+
+    # webpay | fake (gateway en memoria para tests/benchmarks)
+    PAYMENT_GATEWAY = os.getenv("PAYMENT_GATEWAY", "webpay")
+    FAKE_GATEWAY_LATENCY = float(os.getenv("FAKE_GATEWAY_LATENCY", "0"))
+
+    # Listados del admin: filas por página y segundos que se cachea el total aproximado
+    ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "50"))
+    ADMIN_COUNT_CACHE_TTL = int(os.getenv("ADMIN_COUNT_CACHE_TTL", "60"))
+
+    # Falla el request si una vista emite más SQL que su @query_budget
+    QUERY_BUDGET_ENFORCE = os.getenv("QUERY_BUDGET_ENFORCE") == "1"
+
+    # Server-Timing, log JSON por request y /metrics (Prometheus)
+    INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED") == "1"
+    # loguea en "app.sql.slow" las sentencias que tardan más; vacío = desactivado
+    SLOW_QUERY_THRESHOLD_MS = (
+        float(os.getenv("SLOW_QUERY_THRESHOLD_MS")) if os.getenv("SLOW_QUERY_THRESHOLD_MS") else None
+    )
 
 class DevelopmentConfig(BaseConfig):
     DEBUG = True
+    MAIL_BACKEND = os.getenv("MAIL_BACKEND", "log")
+
+class TestingConfig(BaseConfig):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    MAIL_BACKEND = os.getenv("MAIL_BACKEND", "log")
+    QUERY_BUDGET_ENFORCE = True
 
 class ProductionConfig(BaseConfig):
     DEBUG = False
+    TEMPLATES_AUTO_RELOAD = False
+    # en producción se cobra de verdad: sin WEBPAY_COMMERCE_CODE/WEBPAY_API_KEY no arranca
+    WEBPAY_ENVIRONMENT = os.getenv("WEBPAY_ENVIRONMENT", "production")
+
+    # Perfil de producción: pool dimensionado y conexiones verificadas/recicladas
+    DB_POOL_SIZE = _optional_int("DB_POOL_SIZE", "10")
+    DB_MAX_OVERFLOW = _optional_int("DB_MAX_OVERFLOW", "5")
+    DB_POOL_TIMEOUT = _optional_int("DB_POOL_TIMEOUT", "10")
+    DB_POOL_RECYCLE = _optional_int("DB_POOL_RECYCLE", "1800")
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    DB_STATEMENT_TIMEOUT_MS = _optional_int("DB_STATEMENT_TIMEOUT_MS", "15000")
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = _optional_int("SQLITE_BUSY_TIMEOUT_MS", "5000")
 
 def get_config():
     env = os.getenv("FLASK_ENV", "development").lower()
+    if env == "testing":
+        return TestingConfig
     return DevelopmentConfig if env == "development" else ProductionConfig
@@ -0,0 +1,81 @@
+# app/database.py
+#
+# Ajustes del engine según el perfil (ver DB_* / SQLITE_* en app/config.py):
+# - pool (tamaño, overflow, timeout, recycle, pre-ping) para servidores reales
+# - PostgreSQL: statement_timeout por conexión (una query colgada no retiene un worker)
+# - SQLite: WAL + synchronous=NORMAL + busy_timeout en cada conexión nueva, para que
+#   escrituras concurrentes esperen el lock en vez de fallar con "database is locked"
+
+from sqlalchemy import event as sa_event
+from sqlalchemy.engine import make_url
+
+# opción de config -> argumento de create_engine (solo si la opción no es None)
+POOL_OPTIONS = {
+    "DB_POOL_SIZE": "pool_size",
+    "DB_MAX_OVERFLOW": "max_overflow",
+    "DB_POOL_TIMEOUT": "pool_timeout",
+    "DB_POOL_RECYCLE": "pool_recycle",
+}
+
+# todas las opciones que cambian el engine (p.ej. para comparar perfiles en el bench)
+ENGINE_CONFIG_KEYS = (
+    *POOL_OPTIONS,
+    "DB_POOL_PRE_PING",
+    "DB_STATEMENT_TIMEOUT_MS",
+    "SQLITE_JOURNAL_MODE",
+    "SQLITE_SYNCHRONOUS",
+    "SQLITE_BUSY_TIMEOUT_MS",
+)
+
+
+def engine_options(config) -> dict:
+    """
+    SQLALCHEMY_ENGINE_OPTIONS a partir de las opciones DB_* de la config.
+    Lo que ya venga en SQLALCHEMY_ENGINE_OPTIONS tiene prioridad.
+    """
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    options = {}
+
+    # SQLite: el pool por defecto ya es el adecuado (y :memory: no acepta pool_size)
+    if url.get_backend_name() != "sqlite":
+        for key, argument in POOL_OPTIONS.items():
+            if config.get(key) is not None:
+                options[argument] = config[key]
+        if config.get("DB_POOL_PRE_PING"):
+            options["pool_pre_ping"] = True
+
+    if url.get_backend_name() == "postgresql" and config.get("DB_STATEMENT_TIMEOUT_MS"):
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={int(config['DB_STATEMENT_TIMEOUT_MS'])}"
+        }
+
+    return options | dict(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+
+
+def _sqlite_pragmas(config) -> list[str]:
+    pragmas = []
+    if config.get("SQLITE_JOURNAL_MODE"):
+        pragmas.append(f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+    if config.get("SQLITE_SYNCHRONOUS"):
+        pragmas.append(f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}")
+    if config.get("SQLITE_BUSY_TIMEOUT_MS") is not None:
+        pragmas.append(f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+    return pragmas
+
+
+def init_engine_tuning(app, engine) -> None:
+    """Registra los PRAGMA de SQLite para cada conexión nueva del engine."""
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = _sqlite_pragmas(app.config)
+    if not pragmas:
+        return
+
+    @sa_event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
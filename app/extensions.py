@@ -1,9 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
+from app.cache import PageCache
+from app.replica import RoutingSession
 
-db = SQLAlchemy()
-migrate = Migrate()
+# RoutingSession: lecturas de vistas @read_replica a la réplica (si está configurada)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+page_cache = PageCache()
 
 login_manager = LoginManager()
 login_manager.login_view = "admin.login"
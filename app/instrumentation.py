@@ -0,0 +1,256 @@
+# app/instrumentation.py
+#
+# Instrumentación por request (INSTRUMENTATION_ENABLED): tiempo total, sentencias
+# SQL (el contador de query_budget) y tiempo SQL, render de Jinja y llamadas al
+# gateway. Se expone como:
+# - header Server-Timing (visible en las devtools del navegador)
+# - una línea JSON por request en el logger "app.requests"
+# - slow-query log en "app.sql.slow" (SLOW_QUERY_THRESHOLD_MS)
+# - /metrics en formato texto de Prometheus (histogramas por endpoint)
+#
+# Las métricas viven en memoria del proceso: con varios workers cada uno expone
+# las suyas (Prometheus las suma por instancia).
+
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event as sa_event
+
+from app.extensions import db
+
+request_log = logging.getLogger("app.requests")
+slow_query_log = logging.getLogger("app.sql.slow")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...], buckets):
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [conteo por bucket..., +Inf, sum]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+            items = [(labels, list(series)) for labels, series in items]
+
+        for label_values, series in items:
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            sep = "," if base else ""
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[len(self.buckets)]}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {series[len(self.buckets)]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...]):
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self._values: dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUESTS = Counter("http_requests_total", "Requests atendidos", ("endpoint", "method", "status"))
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Tiempo total del request", ("endpoint",), DURATION_BUCKETS
+)
+SQL_DURATION = Histogram(
+    "db_query_duration_seconds", "Tiempo SQL acumulado por request", ("endpoint",), DURATION_BUCKETS
+)
+SQL_STATEMENTS = Histogram(
+    "db_statements_per_request", "Sentencias SQL por request", ("endpoint",), STATEMENT_BUCKETS
+)
+SPAN_DURATION = Histogram(
+    "app_span_duration_seconds", "Render de templates y llamadas al gateway", ("endpoint", "span"),
+    DURATION_BUCKETS,
+)
+METRICS = (REQUESTS, REQUEST_DURATION, SQL_DURATION, SQL_STATEMENTS, SPAN_DURATION)
+
+
+def _add_span(name: str, seconds: float) -> None:
+    spans = g.setdefault("spans", {})
+    spans[name] = spans.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed(name: str):
+    """Acumula el tiempo del bloque en el span `name` del request (p.ej. "gateway")."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and g.get("instrument_start") is not None:
+            _add_span(name, time.perf_counter() - start)
+
+
+# --- SQL ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("instrument_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("instrument_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+
+    in_request = has_request_context() and g.get("instrument_start") is not None
+    if in_request:
+        g.sql_time = g.get("sql_time", 0.0) + elapsed
+
+    threshold_ms = _slow_threshold_ms()
+    if threshold_ms is not None and elapsed * 1000 >= threshold_ms:
+        slow_query_log.warning(
+            json.dumps(
+                {
+                    "duration_ms": round(elapsed * 1000, 2),
+                    "endpoint": request.endpoint if in_request else None,
+                    "statement": " ".join(statement.split()),
+                    "executemany": executemany,
+                }
+            )
+        )
+
+
+def _slow_threshold_ms():
+    # fuera de un app context (hilos del sweeper sin push) no hay config que leer
+    try:
+        return current_app.config.get("SLOW_QUERY_THRESHOLD_MS")
+    except RuntimeError:
+        return None
+
+
+# --- Jinja ---
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context() and g.get("instrument_start") is not None:
+        g.render_stack = g.get("render_stack", []) + [time.perf_counter()]
+
+
+def _after_render(sender, template, context, **extra):
+    if has_request_context() and g.get("render_stack"):
+        start = g.render_stack.pop()
+        # un render_template dentro de otro (p.ej. desde un macro) no se cuenta dos veces
+        if not g.render_stack:
+            _add_span("render", time.perf_counter() - start)
+
+
+# --- Request ---
+
+def _start_request():
+    g.instrument_start = time.perf_counter()
+    g.sql_time = 0.0
+    g.spans = {}
+
+
+def _finish_request(response):
+    start = g.get("instrument_start")
+    if start is None or request.endpoint == "metrics":
+        return response
+
+    total = time.perf_counter() - start
+    endpoint = request.endpoint or "unmatched"
+    sql_count = g.get("sql_statements", 0)
+    sql_time = g.get("sql_time", 0.0)
+    spans = g.get("spans", {})
+
+    timings = [f"app;dur={total * 1000:.1f}", f'db;dur={sql_time * 1000:.1f};desc="{sql_count} queries"']
+    timings += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in spans.items()]
+    response.headers.add("Server-Timing", ", ".join(timings))
+
+    REQUESTS.inc(endpoint, request.method, response.status_code)
+    REQUEST_DURATION.observe(total, endpoint)
+    SQL_DURATION.observe(sql_time, endpoint)
+    SQL_STATEMENTS.observe(sql_count, endpoint)
+    for name, seconds in spans.items():
+        SPAN_DURATION.observe(seconds, endpoint, name)
+
+    request_log.info(
+        json.dumps(
+            {
+                "method": request.method,
+                "path": request.path,
+                "endpoint": endpoint,
+                "status": response.status_code,
+                "duration_ms": round(total * 1000, 2),
+                "sql_count": sql_count,
+                "sql_ms": round(sql_time * 1000, 2),
+                **{f"{name}_ms": round(seconds * 1000, 2) for name, seconds in spans.items()},
+            }
+        )
+    )
+    return response
+
+
+def metrics():
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+def init_instrumentation(app) -> None:
+    enabled = app.config.get("INSTRUMENTATION_ENABLED")
+    # el slow-query log funciona aunque la instrumentación por request esté apagada
+    if not enabled and app.config.get("SLOW_QUERY_THRESHOLD_MS") is None:
+        return
+
+    # como query_budget: solo los engines de esta app
+    with app.app_context():
+        for engine in db.engines.values():
+            if not sa_event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+                sa_event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+                sa_event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    if not enabled:
+        return
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.add_url_rule("/metrics", "metrics", metrics)
@@ -3,3 +3,8 @@ from .occurrence import Occurrence
 from .purchase import Purchase
 from .purchase_participant import PurchaseParticipant
 from .user import User
+from .sales_rollup import SalesRollup
+from .waitlist_entry import WaitlistEntry
+from .outbox_message import OutboxMessage
+from .cancellation_job import CancellationJob
+from .refund import Refund
@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class CancellationJob(db.Model):
+    """
+    Cancelación de una sesión con compras afectadas. El POST del admin cancela la
+    sesión y crea el job; el trabajo (reembolsos / reasignación) lo hace
+    app/services/cancellation.py por lotes, fuera del request. La vista de progreso
+    lee estos contadores.
+    """
+
+    __tablename__ = "cancellation_jobs"
+    __table_args__ = (
+        # jobs a retomar: status + next_attempt_at (también los leases vencidos)
+        db.Index("ix_cancellation_jobs_status_next_attempt", "status", "next_attempt_at"),
+        # últimos jobs del evento (detalle del admin)
+        db.Index("ix_cancellation_jobs_event_id", "event_id", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    event_id = db.Column(
+        db.Integer,
+        db.ForeignKey("events.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    occurrence_id = db.Column(
+        db.Integer,
+        db.ForeignKey("occurrences.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+    # refund | reassign (lo que no cabe en la sesión de reemplazo se reembolsa)
+    action = db.Column(db.String(20), nullable=False)
+    replacement_occurrence_id = db.Column(
+        db.Integer,
+        db.ForeignKey("occurrences.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+
+    # queued | running | done
+    # running: tomado por un worker hasta next_attempt_at (lease); queued con
+    # next_attempt_at futuro: espera que se resuelvan compras pending de la sesión
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    next_attempt_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+
+    # compras afectadas al cancelar (pending/committing/paid enlazadas a la sesión)
+    total = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    processed = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    reassigned = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    refunded = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    refund_errors = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # compras pending/committing que el job espera que se paguen o venzan
+    waiting = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    last_error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<CancellationJob {self.id} occurrence={self.occurrence_id} status={self.status}>"
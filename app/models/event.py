@@ -4,6 +4,12 @@ from app.extensions import db
 
 class Event(db.Model):
     __tablename__ = "events"
+    __table_args__ = (
+        # catálogo público: publicados ordenados por fecha de creación
+        db.Index("ix_events_status_created", "status", "created_at"),
+        # admin: listado paginado por keyset (created_at, id)
+        db.Index("ix_events_created_id", "created_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -21,6 +27,10 @@ class Event(db.Model):
 
     location_name = db.Column(db.String(120), nullable=False, default="Casa de Sanger")
 
+    # contadores materializados de cupos (participantes); ver app/services/seats.py
+    seats_reserved = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    seats_paid = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     # draft | published | closed
     status = db.Column(db.String(20), nullable=False, default="draft")
 
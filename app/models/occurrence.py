@@ -23,6 +23,10 @@ class Occurrence(db.Model):
     capacity_override = db.Column(db.Integer, nullable=True)
     price_override = db.Column(db.Integer, nullable=True)
 
+    # contadores materializados de cupos (participantes); ver app/services/seats.py
+    seats_reserved = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    seats_paid = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     # scheduled | cancelled
     status = db.Column(db.String(20), nullable=False, default="scheduled")
 
@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class OutboxMessage(db.Model):
+    """
+    Correo pendiente de envío (outbox). Se inserta en la misma transacción que el
+    cambio de estado que lo origina (compra paid, oferta de lista de espera) y lo
+    entrega por lotes el
+    worker de app/services/outbox.py: si la transacción hace rollback, no hay correo.
+    """
+
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        # próximos a entregar: status + next_attempt_at (también los leases vencidos)
+        db.Index("ix_outbox_status_next_attempt", "status", "next_attempt_at"),
+        # un correo por compra y tipo (reintentos de webpay_return no duplican)
+        db.UniqueConstraint("kind", "purchase_id", name="uq_outbox_kind_purchase"),
+        # una oferta por entrada de la lista de espera
+        db.UniqueConstraint("kind", "waitlist_entry_id", name="uq_outbox_kind_waitlist_entry"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # purchase_confirmation | waitlist_offer (el cuerpo se arma al enviar, desde la
+    # compra o la entrada de la lista de espera)
+    kind = db.Column(db.String(40), nullable=False)
+
+    purchase_id = db.Column(
+        db.Integer,
+        db.ForeignKey("purchases.id", ondelete="CASCADE"),
+        nullable=True,
+    )
+    waitlist_entry_id = db.Column(
+        db.Integer,
+        db.ForeignKey("waitlist_entries.id", ondelete="CASCADE"),
+        nullable=True,
+    )
+
+    recipient = db.Column(db.String(120), nullable=False)
+
+    # pending | sending | sent | failed
+    # sending: tomado por un worker hasta next_attempt_at (lease); si el worker muere,
+    # otro lo retoma al vencer
+    status = db.Column(db.String(20), nullable=False, default="pending")
+
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+    last_error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+    sent_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<OutboxMessage {self.id} {self.kind} status={self.status}>"
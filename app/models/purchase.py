@@ -5,6 +5,16 @@ from app.models.purchase_occurrence import purchase_occurrences
 
 class Purchase(db.Model):
     __tablename__ = "purchases"
+    __table_args__ = (
+        # capacidad / pending vencidos por evento (el prefijo cubre event_id y event_id+status)
+        db.Index("ix_purchases_event_status_created", "event_id", "status", "created_at"),
+        # sweeper de expiración sobre todos los eventos
+        db.Index("ix_purchases_status_created", "status", "created_at"),
+        # navegador de compras del admin: cada filtro con su índice terminado en el keyset
+        db.Index("ix_purchases_created_id", "created_at", "id"),
+        db.Index("ix_purchases_event_created_id", "event_id", "created_at", "id"),
+        db.Index("ix_purchases_buyer_email_created_id", "buyer_email", "created_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -24,9 +34,13 @@ class Purchase(db.Model):
     tbk_token = db.Column(db.String(120), unique=True, nullable=True)
     buy_order = db.Column(db.String(120), unique=True, nullable=True)
 
-    # pending | paid | failed | expired | cancelled
+    # pending | committing | paid | failed | expired | cancelled
+    # committing: un webpay_return ganó la transición y está confirmando con Transbank
     status = db.Column(db.String(20), nullable=False, default="pending")
 
+    # respuesta de tx.commit (JSON), para responder duplicados sin ir al gateway
+    commit_response = db.Column(db.Text, nullable=True)
+
     paid_at = db.Column(db.DateTime(timezone=True), nullable=True)
 
     created_at = db.Column(
@@ -41,7 +55,6 @@ class Purchase(db.Model):
         "Occurrence",
         secondary=purchase_occurrences,
         back_populates="purchases",
-        lazy="subquery",
     )
 
     participants = db.relationship(
@@ -14,4 +14,9 @@ purchase_occurrences = db.Table(
         db.ForeignKey("occurrences.id", ondelete="CASCADE"),
         primary_key=True,
     ),
+    # PER_OCCURRENCE: precio por participante pagado por esta sesión (el reembolso al
+    # cancelarla sale de aquí, no del precio actual). NULL en PACKAGE.
+    db.Column("unit_price", db.Integer, nullable=True),
+    # la PK (purchase_id, occurrence_id) no sirve para buscar por occurrence
+    db.Index("ix_purchase_occurrences_occurrence_id", "occurrence_id"),
 )
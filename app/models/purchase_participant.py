@@ -10,6 +10,7 @@ class PurchaseParticipant(db.Model):
         db.Integer,
         db.ForeignKey("purchases.id", ondelete="CASCADE"),
         nullable=False,
+        index=True,
     )
 
     name = db.Column(db.String(120), nullable=False)
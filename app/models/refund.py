@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class Refund(db.Model):
+    """
+    Reembolso de una compra por una sesión cancelada. Se inserta en la misma
+    transacción que saca la compra de la sesión; la llamada al gateway ocurre
+    después. Una fila en processing que no terminó no se reintenta sola: el
+    reembolso pudo haberse hecho (revisión manual).
+    """
+
+    __tablename__ = "refunds"
+    __table_args__ = (
+        # un reembolso por compra y sesión (reintentos del job no duplican)
+        db.UniqueConstraint("purchase_id", "occurrence_id", name="uq_refunds_purchase_occurrence"),
+        db.Index("ix_refunds_job_status", "job_id", "status"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    job_id = db.Column(
+        db.Integer,
+        db.ForeignKey("cancellation_jobs.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    purchase_id = db.Column(
+        db.Integer,
+        db.ForeignKey("purchases.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    occurrence_id = db.Column(
+        db.Integer,
+        db.ForeignKey("occurrences.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+    amount = db.Column(db.Integer, nullable=False)
+
+    # pending | processing | refunded | failed
+    status = db.Column(db.String(20), nullable=False, default="pending")
+    # respuesta de tx.refund (JSON) o el error
+    response = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+    processed_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<Refund {self.id} purchase={self.purchase_id} status={self.status}>"
@@ -0,0 +1,35 @@
+from app.extensions import db
+
+
+class SalesRollup(db.Model):
+    """
+    Agregados de ventas por evento y día, mantenidos incrementalmente (ver
+    app/services/rollups.py). El día es el de creación de la compra (cohorte):
+    así la conversión pending -> paid de un día es exacta y `flask rollups-rebuild`
+    reproduce los mismos números desde purchases.
+    """
+
+    __tablename__ = "sales_daily"
+    __table_args__ = (
+        # dashboard: ventana de días sobre todos los eventos
+        db.Index("ix_sales_daily_day", "day"),
+    )
+
+    event_id = db.Column(
+        db.Integer,
+        db.ForeignKey("events.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    day = db.Column(db.Date, primary_key=True)
+
+    purchases_created = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    purchases_paid = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    purchases_failed = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    purchases_expired = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    # CLP y participantes de las compras pagadas
+    revenue = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    seats_sold = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self) -> str:
+        return f"<SalesRollup event={self.event_id} {self.day}>"
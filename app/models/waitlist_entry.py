@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class WaitlistEntry(db.Model):
+    """
+    Lista de espera por evento (PACKAGE) o por sesión (PER_OCCURRENCE).
+    Cuando se liberan cupos, las entradas waiting se ofrecen en orden de llegada:
+    la oferta retiene los cupos en seats_reserved (como un pending) hasta
+    offer_expires_at; ver app/services/waitlist.py.
+    """
+
+    __tablename__ = "waitlist_entries"
+    __table_args__ = (
+        # cola FIFO: las próximas N waiting de un evento/sesión salen del índice, sin scan
+        db.Index("ix_waitlist_queue", "event_id", "occurrence_id", "status", "id"),
+        # ofertas vencidas, sobre todos los eventos (sweeper)
+        db.Index("ix_waitlist_status_offer_expires", "status", "offer_expires_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    event_id = db.Column(
+        db.Integer,
+        db.ForeignKey("events.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    # None = cola del evento completo (PACKAGE)
+    occurrence_id = db.Column(
+        db.Integer,
+        db.ForeignKey("occurrences.id", ondelete="CASCADE"),
+        nullable=True,
+    )
+
+    buyer_name = db.Column(db.String(120), nullable=False)
+    buyer_email = db.Column(db.String(120), nullable=False)
+    buyer_phone = db.Column(db.String(30), nullable=False)
+
+    participant_count = db.Column(db.Integer, nullable=False, default=1)
+
+    # waiting | offered | claimed | expired
+    # offered: sus participantes están retenidos en seats_reserved hasta offer_expires_at
+    status = db.Column(db.String(20), nullable=False, default="waiting")
+
+    # enlace privado para ver el estado y tomar la oferta
+    token = db.Column(db.String(64), unique=True, nullable=False)
+
+    offered_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    offer_expires_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    # compra creada al tomar la oferta
+    purchase_id = db.Column(
+        db.Integer,
+        db.ForeignKey("purchases.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+
+    event = db.relationship("Event")
+    occurrence = db.relationship("Occurrence")
+
+    def __repr__(self) -> str:
+        return f"<WaitlistEntry {self.id} event={self.event_id} status={self.status}>"
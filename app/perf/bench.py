@@ -0,0 +1,539 @@
+# app/perf/bench.py
+#
+# Benchmarks reproducibles sobre una base SQLite temporal sembrada con app.perf.seed:
+# - capacity_benchmark: latencia del chequeo de cupo (COUNT legacy vs ledger)
+# - request_benchmark: rutas calientes vía test client con gateway fake, comparadas
+#   contra un baseline JSON (flask bench)
+# - checkout_load_benchmark: checkouts concurrentes sobre el mismo evento con cada
+#   perfil de engine (flask bench-checkout)
+# - reconcile_benchmark: conciliación de compras sembradas contra el gateway fake
+#   con latencia, a distintas concurrencias (flask bench-reconcile)
+
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, event as sa_event, func, select, update
+
+from app.config import BaseConfig, ProductionConfig
+from app.database import ENGINE_CONFIG_KEYS
+from app.extensions import db
+from app.models import Event, Purchase, PurchaseParticipant
+from app.perf.seed import seed_dataset
+from app.services.rollups import COUNTERS as ROLLUP_COUNTERS
+from app.services.expiry import stale_pending_seats_query
+
+# índices agregados para las queries calientes de compras
+HOT_INDEXES = (
+    "ix_purchases_event_status_created",
+    "ix_purchases_status_created",
+    "ix_purchase_participants_purchase_id",
+    "ix_purchase_occurrences_occurrence_id",
+)
+
+
+def _timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def capacity_benchmark(sizes, events: int = 20, repeat: int = 20, with_indexes: bool = True, seed: int = 0):
+    """
+    Para cada tamaño (compras) siembra una base nueva y mide la latencia mediana (ms) de:
+    - legacy_count: COUNT de participantes pending/paid del evento (lo que hacía el checkout)
+    - ledger: lectura de contadores del evento + pending vencidos (el checkout actual)
+    """
+    results = []
+    for size in sizes:
+        fd, path = tempfile.mkstemp(suffix=".db", prefix="ar-bench-")
+        os.close(fd)
+        engine = create_engine(f"sqlite:///{path}")
+        try:
+            db.metadata.create_all(engine)
+            with engine.connect() as conn:
+                if not with_indexes:
+                    for name in HOT_INDEXES:
+                        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+                    conn.commit()
+
+                seed_dataset(conn, events=events, purchases=size, seed=seed)
+                conn.exec_driver_sql("ANALYZE")
+                conn.commit()
+
+                event_id = 1
+                cutoff = datetime.now(timezone.utc) - timedelta(hours=2)
+
+                legacy = (
+                    select(func.count(PurchaseParticipant.id))
+                    .join(Purchase, PurchaseParticipant.purchase_id == Purchase.id)
+                    .where(Purchase.event_id == event_id, Purchase.status.in_(("pending", "paid")))
+                )
+                ledger = select(Event.seats_reserved, Event.seats_paid).where(Event.id == event_id)
+                stale = stale_pending_seats_query(event_id, cutoff)
+
+                def run_ledger():
+                    conn.execute(ledger).first()
+                    conn.execute(stale).scalar()
+
+                results.append(
+                    {
+                        "purchases": size,
+                        "indexes": with_indexes,
+                        "legacy_count_ms": round(_timed(lambda: conn.execute(legacy).scalar(), repeat), 3),
+                        "ledger_ms": round(_timed(run_ledger, repeat), 3),
+                    }
+                )
+        finally:
+            engine.dispose()
+            os.remove(path)
+
+    return results
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+# si alguno difiere del baseline, solo se comparan queries por request
+COMPARABLE_META = ("dialect", "events", "purchases", "concurrency", "gateway_latency")
+
+# (nombre, endpoint) en el orden en que se corren: el checkout POST deja compras
+# pending que luego usa webpay_return.
+SCENARIOS = (
+    "public.home",
+    "checkout.checkout_event",
+    "checkout.checkout_event_post",
+    "admin.event_detail",
+    "payments.webpay_return",
+)
+
+CHECKOUT_FORM = {
+    "buyer_name": "Bench",
+    "buyer_email": "bench@example.com",
+    "buyer_phone": "+56900000000",
+    "participant_count": "1",
+    "participant_name_0": "Participante",
+    "participant_age_0": "10",
+}
+
+
+class _StatementCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.n = 0
+        self._lock = threading.Lock()
+
+    def _count(self, *args):
+        with self._lock:
+            self.n += 1
+
+    def __enter__(self):
+        sa_event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        sa_event.remove(self.engine, "before_cursor_execute", self._count)
+
+
+def _percentile(samples, q: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+def _drive(app, engine, requests_, concurrency: int, make_client) -> dict:
+    """Corre los requests (callables(client) -> response) y devuelve las métricas."""
+    local = threading.local()
+    # un cliente por hilo, creados antes de medir (el login del admin no cuenta)
+    clients = [make_client() for _ in range(max(concurrency, 1))]
+    samples = []
+    errors = []
+
+    def one(call):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = clients.pop()
+        t0 = time.perf_counter()
+        response = call(client)
+        samples.append((time.perf_counter() - t0) * 1000)
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+
+    with _StatementCounter(engine) as counter:
+        t0 = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(one, requests_))
+        else:
+            for call in requests_:
+                one(call)
+        elapsed = time.perf_counter() - t0
+
+    n = len(samples)
+    return {
+        "requests": n,
+        "errors": len(errors),
+        "p50_ms": round(_percentile(samples, 50), 3),
+        "p95_ms": round(_percentile(samples, 95), 3),
+        "p99_ms": round(_percentile(samples, 99), 3),
+        "queries_per_request": round(counter.n / n, 2) if n else 0,
+        "throughput_rps": round(n / elapsed, 1) if elapsed else 0,
+    }
+
+
+def request_benchmark(
+    url: str | None = None,
+    events: int = 20,
+    purchases: int = 20_000,
+    requests: int = 200,
+    warmup: int = 20,
+    concurrency: int = 1,
+    gateway_latency: float = 0.0,
+    seed: int = 0,
+) -> dict:
+    """
+    Siembra una base (SQLite temporal, o `url` p.ej. un PostgreSQL local vacío),
+    crea una app apuntando a ella con el gateway fake y mide cada escenario de
+    SCENARIOS con el test client. Con gateway_latency > 0 y concurrency > 1 se ve
+    cuánto ocupa workers la espera a Webpay en webpay_return.
+    """
+    from app import create_app
+    from app.models import User
+
+    path = None
+    if url is None:
+        fd, path = tempfile.mkstemp(suffix=".db", prefix="ar-bench-")
+        os.close(fd)
+        url = f"sqlite:///{path}"
+
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": url,
+            "WTF_CSRF_ENABLED": False,
+            "PAYMENT_GATEWAY": "fake",
+            "FAKE_GATEWAY_LATENCY": gateway_latency,
+            # medimos el render, no el cache de páginas
+            "PUBLIC_CACHE_BACKEND": "null",
+            "EXPIRY_SWEEP_INTERVAL_SECONDS": 0,
+            "QUERY_BUDGET_ENFORCE": False,
+        }
+    )
+
+    try:
+        with app.app_context():
+            engine = db.engine
+            db.create_all()
+            with engine.connect() as conn:
+                seeded = seed_dataset(conn, events=events, purchases=purchases, seed=seed)
+                if engine.dialect.name == "sqlite":
+                    conn.exec_driver_sql("ANALYZE")
+                    conn.commit()
+
+            admin = User(email="bench-admin@example.com")
+            admin.set_password("bench-password")
+            db.session.add(admin)
+            db.session.commit()
+
+            event_id = db.session.scalar(select(func.min(Event.id)).where(Event.status == "published"))
+            db.session.remove()
+
+        with app.test_request_context():
+            urls = {
+                "public.home": app.url_for("public.home"),
+                "checkout.checkout_event": app.url_for("checkout.checkout_event", event_id=event_id),
+                "admin.event_detail": app.url_for("admin.event_detail", event_id=event_id),
+                "admin.login": app.url_for("admin.login"),
+                "payments.webpay_return": app.url_for("payments.webpay_return"),
+            }
+
+        def admin_client():
+            client = app.test_client()
+            client.post(
+                urls["admin.login"],
+                data={"email": "bench-admin@example.com", "password": "bench-password"},
+            )
+            return client
+
+        def pending_tokens(n: int) -> list[str]:
+            # compras pending con token del gateway fake (setup, fuera de la medición)
+            client = app.test_client()
+            purchase_ids = []
+            for _ in range(n):
+                r = client.post(urls["checkout.checkout_event"], data=CHECKOUT_FORM)
+                client.get(r.location)
+                purchase_ids.append(int(r.location.rsplit("/", 1)[-1]))
+            with app.app_context():
+                tokens = db.session.scalars(
+                    select(Purchase.tbk_token).where(Purchase.id.in_(purchase_ids))
+                ).all()
+                db.session.remove()
+            return tokens
+
+        builders = {
+            "public.home": lambda n: [lambda c: c.get(urls["public.home"])] * n,
+            "checkout.checkout_event": lambda n: [lambda c: c.get(urls["checkout.checkout_event"])] * n,
+            "checkout.checkout_event_post": lambda n: [
+                lambda c: c.post(urls["checkout.checkout_event"], data=CHECKOUT_FORM)
+            ] * n,
+            "admin.event_detail": lambda n: [lambda c: c.get(urls["admin.event_detail"])] * n,
+            "payments.webpay_return": lambda n: [
+                (lambda token: lambda c: c.post(urls["payments.webpay_return"], data={"token_ws": token}))(token)
+                for token in pending_tokens(n)
+            ],
+        }
+
+        results = {}
+        for name in SCENARIOS:
+            make_client = admin_client if name.startswith("admin.") else app.test_client
+            if warmup:
+                _drive(app, engine, builders[name](warmup), 1, make_client)
+            results[name] = _drive(app, engine, builders[name](requests), concurrency, make_client)
+
+        return {
+            "meta": {
+                "dialect": engine.dialect.name,
+                "concurrency": concurrency,
+                "gateway_latency": gateway_latency,
+                **seeded,
+            },
+            "scenarios": results,
+        }
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if path:
+            os.remove(path)
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float = 0.25, slack_ms: float = 1.0) -> list[str]:
+    """
+    Regresiones respecto al baseline:
+    - más queries por request que el baseline (determinista, sin tolerancia)
+    - p95 mayor que baseline * (1 + tolerance) + slack_ms (el slack evita falsos
+      positivos por ruido en rutas de pocos ms)
+    - requests con error (4xx/5xx)
+    Si el baseline se midió con otra configuración (dialecto, volumen, concurrencia,
+    latencia del gateway) las latencias no son comparables y solo se revisan queries.
+    """
+    same_setup = all(
+        results["meta"].get(key) == baseline.get("meta", {}).get(key) for key in COMPARABLE_META
+    )
+    problems = []
+    for name, current in results["scenarios"].items():
+        if current["errors"]:
+            problems.append(f"{name}: {current['errors']} requests con error")
+
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+
+        if current["queries_per_request"] > base["queries_per_request"]:
+            problems.append(
+                f"{name}: {current['queries_per_request']} queries/request "
+                f"(baseline {base['queries_per_request']})"
+            )
+
+        if not same_setup:
+            continue
+        limit = base["p95_ms"] * (1 + tolerance) + slack_ms
+        if current["p95_ms"] > limit:
+            problems.append(f"{name}: p95 {current['p95_ms']} ms (baseline {base['p95_ms']} ms, límite {limit:.2f})")
+
+    return problems
+
+
+def load_baseline(path: str) -> dict | None:
+    if not os.path.exists(path):
+        return None
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_baseline(path: str, results: dict) -> None:
+    with open(path, "w") as fh:
+        json.dump(results, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
+
+# perfiles de engine a comparar: sin ajustes (desarrollo) vs producción
+ENGINE_PROFILES = {
+    "default": {key: getattr(BaseConfig, key) for key in ENGINE_CONFIG_KEYS},
+    "production": {key: getattr(ProductionConfig, key) for key in ENGINE_CONFIG_KEYS},
+}
+
+
+def checkout_load_benchmark(
+    profiles=tuple(ENGINE_PROFILES),
+    requests: int = 400,
+    concurrency: int = 8,
+    seed: int = 0,
+) -> dict:
+    """
+    Por cada perfil: base SQLite temporal nueva, un evento sin tope de cupo y
+    `requests` checkouts POST en `concurrency` hilos contra ese mismo evento (todas
+    las escrituras compiten por el mismo lock). Reporta throughput, latencias,
+    errores (409 por lock / 500 "database is locked") y si el ledger quedó cuadrado.
+    """
+    from app import create_app
+    from app.services.seats import rebuild_seat_ledger
+
+    results = {}
+    for profile in profiles:
+        fd, path = tempfile.mkstemp(suffix=".db", prefix="ar-load-")
+        os.close(fd)
+        app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+                "WTF_CSRF_ENABLED": False,
+                "PAYMENT_GATEWAY": "fake",
+                "PUBLIC_CACHE_BACKEND": "null",
+                "EXPIRY_SWEEP_INTERVAL_SECONDS": 0,
+                "QUERY_BUDGET_ENFORCE": False,
+                **ENGINE_PROFILES[profile],
+            }
+        )
+        try:
+            with app.app_context():
+                engine = db.engine
+                db.create_all()
+                with engine.connect() as conn:
+                    seed_dataset(conn, events=1, purchases=0, seed=seed)
+                event_id = db.session.scalar(select(func.min(Event.id)))
+                # sin tope: medimos contención del lock, no rechazos por cupo
+                db.session.execute(update(Event).values(capacity_default=None))
+                db.session.commit()
+                db.session.remove()
+
+            with app.test_request_context():
+                url = app.url_for("checkout.checkout_event", event_id=event_id)
+
+            row = _drive(
+                app,
+                engine,
+                [lambda c: c.post(url, data=CHECKOUT_FORM)] * requests,
+                concurrency,
+                app.test_client,
+            )
+
+            with app.app_context():
+                row["purchases_created"] = db.session.scalar(select(func.count(Purchase.id)))
+                row["ledger_drift"] = len(rebuild_seat_ledger(apply=False))
+                db.session.rollback()
+                db.session.remove()
+            results[profile] = row
+        finally:
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    return {"meta": {"requests": requests, "concurrency": concurrency}, "profiles": results}
+
+
+# estados en que quedan las compras sembradas y lo que responde el gateway por ellas
+RECONCILE_STATUS_MIX = {"pending": 0.6, "committing": 0.1, "expired": 0.3}
+RECONCILE_GATEWAY_MIX = {"AUTHORIZED": 0.6, "FAILED": 0.2, "INITIALIZED": 0.2}
+
+
+def reconcile_benchmark(
+    purchases: int = 2_000,
+    concurrencies=(1, 8),
+    gateway_latency: float = 0.02,
+    batch_size: int = 200,
+    events: int = 10,
+    seed: int = 0,
+) -> dict:
+    """
+    Por cada concurrencia: base SQLite temporal con `purchases` compras con token
+    (pending / committing / expired), el gateway fake respondiendo AUTHORIZED /
+    FAILED / INITIALIZED con `gateway_latency` por consulta, y una pasada completa
+    de reconcile_payments. Reporta throughput, transiciones y si el ledger de cupos
+    y sales_daily quedaron iguales a recalcularlos desde cero.
+    """
+    import random
+
+    from app import create_app
+    from app.models import SalesRollup
+    from app.services.reconcile import reconcile_payments
+    from app.services.rollups import rebuild_rollups
+    from app.services.seats import rebuild_seat_ledger
+    from app.services.webpay_fake import FakeWebpayGateway
+
+    def rollup_snapshot():
+        return {
+            (row.event_id, row.day): tuple(getattr(row, name) for name in ROLLUP_COUNTERS)
+            for row in db.session.scalars(select(SalesRollup))
+        }
+
+    results = {}
+    for concurrency in concurrencies:
+        fd, path = tempfile.mkstemp(suffix=".db", prefix="ar-reconcile-")
+        os.close(fd)
+        app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+                "PAYMENT_GATEWAY": "fake",
+                "PUBLIC_CACHE_BACKEND": "null",
+                "EXPIRY_SWEEP_INTERVAL_SECONDS": 0,
+            }
+        )
+        try:
+            with app.app_context():
+                db.create_all()
+                with db.engine.connect() as conn:
+                    seed_dataset(
+                        conn, events=events, purchases=purchases, seed=seed,
+                        status_mix=RECONCILE_STATUS_MIX, days=2,
+                    )
+                db.session.execute(
+                    update(Purchase).values(
+                        tbk_token="bench-" + func.cast(Purchase.id, db.String),
+                        buy_order="AR-" + func.cast(Purchase.id, db.String),
+                    )
+                )
+                rebuild_rollups()
+                db.session.commit()
+
+                gateway = FakeWebpayGateway()
+                rng = random.Random(seed)
+                outcomes, weights = zip(*RECONCILE_GATEWAY_MIX.items())
+                for purchase_id, amount in db.session.execute(select(Purchase.id, Purchase.total_amount)):
+                    status = rng.choices(outcomes, weights)[0]
+                    gateway.seed(f"bench-{purchase_id}", amount, f"AR-{purchase_id}", status)
+                gateway.latency = gateway_latency
+                db.session.remove()
+
+                row = reconcile_payments(
+                    batch_size=batch_size, concurrency=concurrency, min_age_minutes=0, gateway=gateway
+                )
+                row["gateway_calls"] = gateway.calls["status"]
+                row["ledger_drift"] = len(rebuild_seat_ledger(apply=False))
+                stored = rollup_snapshot()
+                rebuild_rollups()
+                rebuilt = rollup_snapshot()
+                zeros = (0,) * len(ROLLUP_COUNTERS)
+                row["rollup_drift"] = sum(
+                    1 for key in stored.keys() | rebuilt.keys() if stored.get(key, zeros) != rebuilt.get(key, zeros)
+                )
+                db.session.rollback()
+                db.session.remove()
+            results[concurrency] = row
+        finally:
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+            os.remove(path)
+
+    return {
+        "meta": {"purchases": purchases, "gateway_latency": gateway_latency, "batch_size": batch_size},
+        "concurrency": results,
+    }
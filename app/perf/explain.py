@@ -0,0 +1,109 @@
+# app/perf/explain.py
+#
+# EXPLAIN de las queries calientes de la app (checkout, sweeper, admin, pagos)
+# para detectar full scans. Soporta SQLite (EXPLAIN QUERY PLAN) y PostgreSQL
+# (EXPLAIN FORMAT JSON).
+
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select, text
+
+from app.models import Event, Occurrence, Purchase, PurchaseParticipant
+from app.models.purchase_occurrence import purchase_occurrences
+from app.services.expiry import lapsed_offer_seats_query, stale_pending_seats_query
+
+
+def hot_queries(event_id: int = 1) -> dict:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=2)
+    return {
+        # checkout: pending vencidos que aún reservan (predicado al leer)
+        "checkout.stale_pending_seats": stale_pending_seats_query(event_id, cutoff),
+        # checkout: ofertas de lista de espera vencidas que aún retienen
+        "checkout.lapsed_offer_seats": lapsed_offer_seats_query(event_id, datetime.now(timezone.utc)),
+        # checkout: sesiones del evento (selectinload)
+        "checkout.event_occurrences": select(Occurrence).where(Occurrence.event_id == event_id),
+        # sweeper: lote de pending vencidos de todos los eventos
+        "expiry.stale_batch": (
+            select(Purchase.id)
+            .where(Purchase.status == "pending", Purchase.created_at < cutoff)
+            .order_by(Purchase.id)
+            .limit(500)
+        ),
+        # admin: participantes pagados por sesión
+        "admin.occupancy_by_occurrence": (
+            select(purchase_occurrences.c.occurrence_id, func.count(PurchaseParticipant.id))
+            .select_from(purchase_occurrences)
+            .join(Purchase, purchase_occurrences.c.purchase_id == Purchase.id)
+            .join(PurchaseParticipant, PurchaseParticipant.purchase_id == Purchase.id)
+            .where(Purchase.event_id == event_id, Purchase.status == "paid")
+            .group_by(purchase_occurrences.c.occurrence_id)
+        ),
+        # admin: compras de una sesión (cancelaciones, rosters)
+        "admin.purchases_by_occurrence": (
+            select(purchase_occurrences.c.purchase_id)
+            .where(purchase_occurrences.c.occurrence_id == 1)
+        ),
+        # pagos: lookup por token
+        "payments.by_token": select(Purchase.id, Purchase.status).where(Purchase.tbk_token == "x"),
+        # ledger: participantes por compra
+        "seats.participants_by_purchase": (
+            select(Purchase.event_id, func.count(PurchaseParticipant.id))
+            .join(PurchaseParticipant, PurchaseParticipant.purchase_id == Purchase.id)
+            .where(Purchase.id.in_([1, 2, 3]))
+            .group_by(Purchase.event_id)
+        ),
+        # público: catálogo
+        "public.home": (
+            select(Event.id)
+            .where(Event.status == "published")
+            .order_by(Event.created_at.desc())
+        ),
+    }
+
+
+def _explain_sqlite(conn, sql: str) -> tuple[list[str], list[str]]:
+    rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    plan = [row[-1] for row in rows]
+    # "SCAN tabla" sin índice = recorrido completo ("SCAN ... USING INDEX" es aceptable)
+    scans = [line for line in plan if line.startswith("SCAN ") and "USING" not in line]
+    return plan, scans
+
+
+def _explain_postgresql(conn, sql: str) -> tuple[list[str], list[str]]:
+    raw = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    doc = raw if isinstance(raw, list) else json.loads(raw)
+
+    plan, scans = [], []
+
+    def walk(node, depth=0):
+        line = "  " * depth + node["Node Type"]
+        if "Relation Name" in node:
+            line += f" on {node['Relation Name']}"
+        if "Index Name" in node:
+            line += f" using {node['Index Name']}"
+        plan.append(line)
+        if node["Node Type"] == "Seq Scan":
+            scans.append(line.strip())
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    walk(doc[0]["Plan"])
+    return plan, scans
+
+
+def explain_hot_queries(conn, event_id: int = 1) -> list[dict]:
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        explain = _explain_sqlite
+    elif dialect == "postgresql":
+        explain = _explain_postgresql
+    else:
+        raise ValueError(f"Dialecto no soportado para EXPLAIN: {dialect}")
+
+    report = []
+    for name, stmt in hot_queries(event_id).items():
+        sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+        plan, scans = explain(conn, sql)
+        report.append({"name": name, "plan": plan, "full_scans": scans})
+    return report
@@ -0,0 +1,313 @@
+# app/perf/seed.py
+#
+# Generador de datos sintéticos con INSERTs Core masivos (executemany por lotes).
+# No pasa por el ORM ni por los contadores: el ledger de cupos se acumula mientras
+# se generan las filas y se escribe al final. Determinista: misma semilla => mismos datos.
+
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import bindparam, func, insert, select, update
+
+from app.models import Event, Occurrence, Purchase, PurchaseParticipant
+from app.models.purchase_occurrence import purchase_occurrences
+from app.services.seats import LEDGER_COLUMNS
+
+DEFAULT_STATUS_MIX = {"paid": 0.6, "pending": 0.1, "expired": 0.25, "failed": 0.05}
+DEFAULT_PARTICIPANT_MIX = {1: 0.5, 2: 0.3, 3: 0.2}
+
+
+def parse_mix(spec: str, cast=str) -> dict:
+    """ "paid=0.6,pending=0.1" -> {"paid": 0.6, "pending": 0.1} """
+    mix = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        key, _, weight = part.partition("=")
+        mix[cast(key.strip())] = float(weight)
+    if not mix or any(w < 0 for w in mix.values()) or sum(mix.values()) <= 0:
+        raise ValueError(f"distribución inválida: {spec!r}")
+    return mix
+
+
+PURCHASE_COLUMNS = (
+    "id", "event_id", "buyer_name", "buyer_email", "buyer_phone", "total_amount", "status", "created_at",
+)
+PARTICIPANT_COLUMNS = ("purchase_id", "name", "age")
+LINK_COLUMNS = ("purchase_id", "occurrence_id")
+
+# placeholder posicional según el paramstyle del driver
+_PLACEHOLDERS = {"qmark": "?", "format": "%s", "pyformat": "%s"}
+
+
+def _insert_rows(conn, table, columns, rows) -> None:
+    """
+    executemany directo al driver con tuplas: se salta la construcción de parámetros
+    por fila de SQLAlchemy (lo más caro con millones de filas). Los tipos que
+    necesitan conversión (p.ej. DateTime en SQLite) pasan por su bind_processor.
+    """
+    if not rows:
+        return
+
+    placeholder = _PLACEHOLDERS.get(conn.dialect.paramstyle)
+    if placeholder is None:
+        conn.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+        return
+
+    processors = [
+        (i, processor)
+        for i, name in enumerate(columns)
+        if (processor := table.c[name].type.dialect_impl(conn.dialect).bind_processor(conn.dialect)) is not None
+    ]
+    if processors:
+        converted = []
+        for row in rows:
+            row = list(row)
+            for i, processor in processors:
+                row[i] = processor(row[i])
+            converted.append(tuple(row))
+        rows = converted
+
+    quote = conn.dialect.identifier_preparer.quote
+    sql = (
+        f"INSERT INTO {quote(table.name)} ({', '.join(quote(c) for c in columns)}) "
+        f"VALUES ({', '.join([placeholder] * len(columns))})"
+    )
+    conn.exec_driver_sql(sql, rows)
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def seed_dataset(
+    conn,
+    events: int = 10,
+    occurrences_per_event: int = 4,
+    purchases: int = 10_000,
+    seed: int = 0,
+    chunk_size: int = 20_000,
+    status_mix: dict | None = None,
+    participant_mix: dict | None = None,
+    per_occurrence_share: float = 0.0,
+    days: int = 90,
+    defer_indexes: bool = False,
+) -> dict:
+    """
+    Inserta eventos publicados, sus sesiones, compras y participantes usando la
+    conexión dada (cada lote en su propia transacción).
+
+    - status_mix: peso de cada estado de compra (default DEFAULT_STATUS_MIX)
+    - participant_mix: peso de cada cantidad de participantes por compra
+    - per_occurrence_share: fracción de eventos PER_OCCURRENCE (el resto PACKAGE)
+    - days: ventana hacia atrás de created_at de las compras
+    - defer_indexes: bota los índices secundarios de compras durante la carga y
+      los recrea al final (para volúmenes grandes)
+
+    Las compras quedan enlazadas a sesiones como lo hace la app: PACKAGE pagadas a
+    todas las sesiones del evento; PER_OCCURRENCE a un subconjunto elegido al comprar.
+    Devuelve los conteos insertados.
+    """
+    with _sqlite_bulk_mode(conn):
+        return _seed(
+            conn, events, occurrences_per_event, purchases, seed, chunk_size,
+            status_mix, participant_mix, per_occurrence_share, days, defer_indexes,
+        )
+
+
+@contextmanager
+def _sqlite_bulk_mode(conn):
+    # SQLite: sin fsync por commit y cache grande mientras dura la carga; se
+    # restauran al final porque la conexión vuelve al pool de la app
+    if conn.dialect.name != "sqlite":
+        yield
+        return
+    synchronous = conn.exec_driver_sql("PRAGMA synchronous").scalar()
+    cache_size = conn.exec_driver_sql("PRAGMA cache_size").scalar()
+    conn.commit()
+    conn.exec_driver_sql("PRAGMA synchronous = OFF")
+    conn.exec_driver_sql("PRAGMA cache_size = -262144")
+    try:
+        yield
+    finally:
+        conn.exec_driver_sql(f"PRAGMA synchronous = {int(synchronous)}")
+        conn.exec_driver_sql(f"PRAGMA cache_size = {int(cache_size)}")
+
+
+def _seed(
+    conn, events, occurrences_per_event, purchases, seed, chunk_size,
+    status_mix, participant_mix, per_occurrence_share, days, defer_indexes,
+) -> dict:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    status_mix = status_mix or DEFAULT_STATUS_MIX
+    participant_mix = participant_mix or DEFAULT_PARTICIPANT_MIX
+
+    base_event = (conn.scalar(select(func.max(Event.id))) or 0) + 1
+    base_occurrence = (conn.scalar(select(func.max(Occurrence.id))) or 0) + 1
+    base_purchase = (conn.scalar(select(func.max(Purchase.id))) or 0) + 1
+    conn.commit()
+
+    event_ids = list(range(base_event, base_event + events))
+    modes = {
+        eid: "PER_OCCURRENCE" if rng.random() < per_occurrence_share else "PACKAGE"
+        for eid in event_ids
+    }
+
+    with conn.begin():
+        conn.execute(
+            insert(Event),
+            [
+                {
+                    "id": eid,
+                    "title": f"Evento {eid}",
+                    "pricing_mode": modes[eid],
+                    "price": 10_000 if modes[eid] == "PACKAGE" else 3_000,
+                    "capacity_default": max(purchases // max(events, 1) * 3, 10),
+                    "location_name": "Casa de Sanger",
+                    "status": "published",
+                    "created_at": now - timedelta(days=eid),
+                }
+                for eid in event_ids
+            ],
+        )
+        occurrence_rows = []
+        occurrences_by_event = {}
+        oid = base_occurrence
+        for eid in event_ids:
+            for k in range(occurrences_per_event):
+                start = now + timedelta(days=7 * (k + 1), hours=eid % 24)
+                occurrence_rows.append(
+                    {
+                        "id": oid,
+                        "event_id": eid,
+                        "start_dt": start,
+                        "end_dt": start + timedelta(hours=2),
+                        "status": "scheduled",
+                    }
+                )
+                occurrences_by_event.setdefault(eid, []).append(oid)
+                oid += 1
+        if occurrence_rows:
+            conn.execute(insert(Occurrence), occurrence_rows)
+
+    statuses, status_weights = list(status_mix), list(status_mix.values())
+    sizes, size_weights = list(participant_mix), list(participant_mix.values())
+    window = 60 * 24 * days
+
+    # ledger de cupos calculado al generar (los eventos/sesiones son nuevos: todas
+    # sus compras salen de aquí), sin re-escanear compras al final
+    event_ledger = {eid: {"seats_reserved": 0, "seats_paid": 0} for eid in event_ids}
+    occurrence_ledger = {row["id"]: {"seats_reserved": 0, "seats_paid": 0} for row in occurrence_rows}
+
+    bulk_tables = (Purchase.__table__, PurchaseParticipant.__table__, purchase_occurrences)
+    deferred = [index for table in bulk_tables for index in table.indexes] if defer_indexes else []
+    if deferred:
+        # cargar sin índices secundarios y recrearlos al final (un sort) es mucho más
+        # rápido que mantenerlos fila a fila con ids/fechas en orden aleatorio
+        with conn.begin():
+            for index in deferred:
+                index.drop(conn, checkfirst=True)
+
+    purchase_ids = range(base_purchase, base_purchase + purchases)
+    participants = 0
+    links = 0
+    for chunk in _chunks(purchase_ids, chunk_size):
+        # decisiones aleatorias por lote (rng.choices con k=) en vez de fila a fila
+        n = len(chunk)
+        chunk_events = rng.choices(event_ids, k=n)
+        chunk_statuses = rng.choices(statuses, status_weights, k=n)
+        chunk_sizes = rng.choices(sizes, size_weights, k=n)
+
+        purchase_rows = []
+        participant_rows = []
+        link_rows = []
+        for pid, eid, status, size in zip(chunk, chunk_events, chunk_statuses, chunk_sizes):
+            event_occurrences = occurrences_by_event.get(eid, [])
+            if modes[eid] == "PER_OCCURRENCE" and event_occurrences:
+                chosen = rng.sample(event_occurrences, rng.randint(1, len(event_occurrences)))
+                amount = 3_000 * len(chosen) * size
+            else:
+                chosen = event_occurrences if status == "paid" else []
+                amount = 10_000 * size
+
+            purchase_rows.append(
+                (
+                    pid,
+                    eid,
+                    f"Comprador {pid}",
+                    f"comprador{pid}@example.com",
+                    "+56900000000",
+                    amount,
+                    status,
+                    now - timedelta(minutes=int(rng.random() * window)),
+                )
+            )
+            participant_rows.extend(
+                (pid, f"Participante {i + 1}", 6 + int(rng.random() * 65)) for i in range(size)
+            )
+            link_rows.extend((pid, occ) for occ in chosen)
+
+            column = LEDGER_COLUMNS.get(status)
+            if column:
+                event_ledger[eid][column] += size
+                for occ in chosen:
+                    occurrence_ledger[occ][column] += size
+
+        with conn.begin():
+            _insert_rows(conn, Purchase.__table__, PURCHASE_COLUMNS, purchase_rows)
+            _insert_rows(conn, PurchaseParticipant.__table__, PARTICIPANT_COLUMNS, participant_rows)
+            _insert_rows(conn, purchase_occurrences, LINK_COLUMNS, link_rows)
+        participants += len(participant_rows)
+        links += len(link_rows)
+
+    with conn.begin():
+        for index in deferred:
+            index.create(conn, checkfirst=True)
+        _write_ledger(conn, Event.__table__, event_ledger)
+        _write_ledger(conn, Occurrence.__table__, occurrence_ledger)
+        _sync_sequences(conn, (Event, Occurrence, Purchase, PurchaseParticipant))
+
+    return {
+        "events": events,
+        "occurrences": len(occurrence_rows),
+        "purchases": purchases,
+        "participants": participants,
+        "purchase_occurrences": links,
+    }
+
+
+def _sync_sequences(conn, models) -> None:
+    # Insertamos ids explícitos: en PostgreSQL la secuencia no se entera y el próximo
+    # INSERT del ORM chocaría con la PK. SQLite usa max(rowid) y no lo necesita.
+    if conn.dialect.name != "postgresql":
+        return
+    for model in models:
+        table = model.__table__.name
+        conn.exec_driver_sql(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"
+        )
+
+
+def _write_ledger(conn, table, ledger: dict) -> None:
+    # un solo UPDATE executemany para todas las filas
+    if not ledger:
+        return
+    conn.execute(
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values(seats_reserved=bindparam("reserved"), seats_paid=bindparam("paid")),
+        [
+            {"row_id": row_id, "reserved": values["seats_reserved"], "paid": values["seats_paid"]}
+            for row_id, values in ledger.items()
+        ],
+    )
@@ -0,0 +1,114 @@
+# app/perf/startup.py
+#
+# Tiempo de arranque de un proceso, medido en subprocesos limpios (como un worker
+# recién forkeado/reciclado): import de `app`, create_app() y primer request, más
+# el tiempo de pared total incluyendo el intérprete. Una corrida extra con
+# `python -X importtime` da el desglose de qué imports pesan.
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# corre en el subproceso (fuera del CLI de flask, como un worker de gunicorn);
+# la creación de tablas queda fuera de la medición
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app({"PUBLIC_CACHE_BACKEND": "null", "EXPIRY_SWEEP_INTERVAL_SECONDS": 0})
+t2 = time.perf_counter()
+first_request = None
+path = sys.argv[1]
+if path:
+    from app.extensions import db
+    with app.app_context():
+        db.create_all()
+    t3 = time.perf_counter()
+    status = app.test_client().get(path).status_code
+    first_request = (time.perf_counter() - t3) * 1000
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "create_app_ms": (t2 - t1) * 1000,
+    "first_request_ms": first_request,
+    "blueprints": list(app.config["ENABLED_BLUEPRINTS"]),
+    "modules": len(sys.modules),
+}))
+"""
+
+
+def _run_probe(path: str | None, env: dict, importtime: bool = False):
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", PROBE, path or ""]
+
+    started = time.perf_counter()
+    proc = subprocess.run(command, env=env, cwd=REPO_ROOT, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"el arranque falló:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), wall_ms, proc.stderr
+
+
+def _top_imports(importtime_log: str, limit: int) -> list[tuple[str, float]]:
+    # líneas "import time: self [us] | cumulative | módulo", con el módulo indentado
+    # según la profundidad. `app` (nivel 0) lo acumula todo: interesa lo que importa
+    # directamente (nivel 1, p.ej. flask, sqlalchemy, app.models) y el resto del nivel 0
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth > 1 or name.strip() == "app":
+            continue
+        rows.append((name.strip(), int(cumulative) / 1000))
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return rows[:limit]
+
+
+def startup_benchmark(runs: int = 5, blueprints: str | None = None, path: str | None = "/", top: int = 12) -> dict:
+    """
+    blueprints: valor de ENABLED_BLUEPRINTS para el subproceso (None = el de la config).
+    path: primer request (None/"" = sin request, p.ej. para workers sin blueprints).
+    Devuelve medianas en ms y los imports de primer nivel más caros.
+    """
+    fd, db_path = tempfile.mkstemp(suffix=".db", prefix="ar-startup-")
+    os.close(fd)
+    env = {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT,
+        "DATABASE_URL": f"sqlite:///{db_path}",
+    }
+    if blueprints is not None:
+        env["ENABLED_BLUEPRINTS"] = blueprints
+
+    try:
+        # la primera corrida compila bytecode / calienta el cache del SO: no cuenta
+        _run_probe(path, env)
+        samples = [_run_probe(path, env) for _ in range(runs)]
+        probe, _, importtime_log = _run_probe(path, env, importtime=True)
+    finally:
+        os.remove(db_path)
+
+    def median(key):
+        values = [result[key] for result, _, _ in samples if result[key] is not None]
+        return round(statistics.median(values), 1) if values else None
+
+    return {
+        "runs": runs,
+        "blueprints": probe["blueprints"],
+        "modules": probe["modules"],
+        "import_ms": median("import_ms"),
+        "create_app_ms": median("create_app_ms"),
+        "first_request_ms": median("first_request_ms"),
+        "total_ms": round(statistics.median(wall for _, wall, _ in samples), 1),
+        "top_imports": _top_imports(importtime_log, top),
+    }
@@ -0,0 +1,60 @@
+# app/query_budget.py
+#
+# Guardia contra N+1: cada vista declara cuántas sentencias SQL puede emitir
+# por request (@query_budget(n)). Con QUERY_BUDGET_ENFORCE (modo testing) un
+# request que se pasa del presupuesto falla con QueryBudgetExceeded.
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event as sa_event
+
+from app.extensions import db
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(n: int):
+    def decorator(view):
+        view.query_budget = n
+        return view
+
+    return decorator
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.sql_statements = g.get("sql_statements", 0) + 1
+        if current_app.config.get("QUERY_BUDGET_ENFORCE"):
+            g.setdefault("sql_log", []).append(statement)
+
+
+def _reset_counter():
+    g.sql_statements = 0
+    g.sql_log = []
+
+
+def _check_budget(response):
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, "query_budget", None)
+    used = g.get("sql_statements", 0)
+
+    if budget is not None and used > budget:
+        statements = "\n".join(g.get("sql_log", []))
+        raise QueryBudgetExceeded(
+            f"{request.endpoint}: {used} sentencias SQL (presupuesto {budget})\n{statements}"
+        )
+    return response
+
+
+def init_query_budget(app) -> None:
+    # solo los engines de esta app (primario y réplica), no todo Engine del proceso
+    with app.app_context():
+        for engine in db.engines.values():
+            if not sa_event.contains(engine, "before_cursor_execute", _count_statement):
+                sa_event.listen(engine, "before_cursor_execute", _count_statement)
+
+    app.before_request(_reset_counter)
+
+    if app.config.get("QUERY_BUDGET_ENFORCE"):
+        app.after_request(_check_budget)
@@ -0,0 +1,87 @@
+# app/replica.py
+#
+# Réplica de lectura opcional (SQLALCHEMY_REPLICA_URI, bind "replica").
+#
+# Las vistas marcadas con @read_replica (catálogo público, reportes del admin)
+# leen de la réplica; todo lo demás va al primario. Dentro de un request marcado,
+# la primera escritura (flush / INSERT / UPDATE / DELETE) fija el primario para
+# el resto del request. Entre requests, read-your-writes: quien acaba de escribir
+# sigue leyendo del primario REPLICA_STICKY_SECONDS (cookie propia, no la sesión de
+# Flask: el POST de vuelta de Webpay llega sin cookies y no debe pisar el login),
+# así el admin ve su edición aunque la réplica venga atrasada.
+
+import sqlite3
+import time
+
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = "replica"
+STICKY_COOKIE = "db_primary_until"
+
+
+def read_replica(view):
+    """Marca una vista de solo lectura para que sus SELECT vayan a la réplica."""
+    view.use_replica = True
+    return view
+
+
+class RoutingSession(Session):
+    """Session de Flask-SQLAlchemy que manda los SELECT de vistas @read_replica a la réplica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            is_write = self._flushing or isinstance(clause, sa.sql.dml.UpdateBase)
+            if is_write:
+                g.db_wrote = True
+            elif g.get("db_replica") and not g.get("db_wrote"):
+                replica = self._db.engines.get(REPLICA_BIND)
+                if replica is not None:
+                    g.db_replica_used = True
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _route_request():
+    view = current_app.view_functions.get(request.endpoint)
+    if not getattr(view, "use_replica", False):
+        return
+    try:
+        primary_until = float(request.cookies.get(STICKY_COOKIE) or 0)
+    except ValueError:
+        primary_until = 0
+    if primary_until > time.time():
+        # escribió hace poco: lee del primario hasta que la réplica lo alcance
+        return
+    g.db_replica = True
+
+
+def _remember_writes(response):
+    if g.get("db_wrote"):
+        seconds = current_app.config["REPLICA_STICKY_SECONDS"]
+        response.set_cookie(
+            STICKY_COOKIE, f"{time.time() + seconds:.0f}", max_age=seconds, httponly=True, samesite="Lax"
+        )
+    return response
+
+
+def init_replica(app) -> None:
+    if not app.config.get("SQLALCHEMY_REPLICA_URI"):
+        return
+    app.before_request(_route_request)
+    app.after_request(_remember_writes)
+
+
+def sync_sqlite_replica(primary_path: str, replica_path: str) -> None:
+    """
+    Replicador fake para desarrollo: copia la base SQLite primaria sobre la réplica
+    con la API de backup (copia consistente aunque haya escrituras en curso).
+    """
+    source = sqlite3.connect(primary_path)
+    target = sqlite3.connect(replica_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
@@ -0,0 +1,544 @@
+# app/services/cancellation.py
+#
+# Cancelación de sesiones con compras afectadas. El POST del admin solo:
+# - pasa la sesión a cancelled con un UPDATE condicional
+# - cuenta las compras afectadas (un join sobre purchase_occurrences)
+# - crea un CancellationJob y lo lanza en un hilo; la vista de progreso lo consulta
+#
+# El job (este módulo) trabaja por lotes de compras pagadas enlazadas a la sesión,
+# un commit por lote:
+# 1. reassign: inscribe en la sesión de reemplazo las que caben (UPDATE condicional
+#    sobre su cupo, como el checkout); las que no caben, o que ya tenían esa
+#    sesión, pasan a reembolso. Solo PER_OCCURRENCE: en PACKAGE toda compra pagada
+#    ya está en todas las sesiones (el admin no ofrece reemplazo)
+# 2. refund: inserta un Refund (PER_OCCURRENCE: lo pagado por la sesión, guardado en
+#    purchase_occurrences.unit_price; PACKAGE: la parte proporcional del pack), con
+#    tope en lo que aún no se reembolsó. Si era la última sesión de la compra, se
+#    reembolsa el resto y la compra queda cancelled
+# 3. saca las compras de la sesión cancelada y descuenta sus contadores
+# Luego llama al gateway para los reembolsos encolados (en paralelo, como la
+# conciliación) y deja el resultado en cada Refund.
+#
+# Compras pending/committing de la sesión (PER_OCCURRENCE) se resuelven solas
+# (pagan, fallan o vencen): el job vuelve a queued y se retoma cada
+# CANCELLATION_RECHECK_SECONDS hasta que no quede ninguna. Si un worker muere, el
+# lease vence y `flask cancellation-jobs` (o el hilo en proceso) lo retoma.
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import case, delete, exists, func, insert, literal, select, update
+
+from app.extensions import db, page_cache
+from app.models import CancellationJob, Event, Occurrence, Purchase, PurchaseParticipant, Refund
+from app.models.purchase_occurrence import purchase_occurrences
+from app.services.rollups import rollup_purchases
+from app.services.seats import _bump, shift_seats
+from app.services.waitlist import promote_waitlists
+from app.services.webpay import GatewayError, get_gateway
+
+log = logging.getLogger(__name__)
+
+# compras que ocupan cupo en la sesión
+AFFECTED_STATUSES = ("pending", "committing", "paid")
+
+# intentos de reservar cupo en la sesión de reemplazo si un checkout concurrente lo toma antes
+RESERVE_ATTEMPTS = 3
+
+
+def affected_purchases(occurrence_id: int) -> dict[str, int]:
+    """{status: compras} de las compras que ocupan cupo en la sesión (un solo join)."""
+    rows = db.session.execute(
+        select(Purchase.status, func.count(Purchase.id))
+        .select_from(purchase_occurrences)
+        .join(Purchase, Purchase.id == purchase_occurrences.c.purchase_id)
+        .where(
+            purchase_occurrences.c.occurrence_id == occurrence_id,
+            Purchase.status.in_(AFFECTED_STATUSES),
+        )
+        .group_by(Purchase.status)
+    )
+    return dict(rows.all())
+
+
+def start_cancellation(
+    event_id: int,
+    occurrence_id: int,
+    replacement_occurrence_id: int | None = None,
+) -> CancellationJob | None:
+    """
+    Cancela la sesión y crea el job de sus compras afectadas (reasignación si hay
+    sesión de reemplazo; si no, reembolso). Sin compras afectadas el job nace done.
+    Devuelve None si la sesión ya estaba cancelada. Quien llama hace el commit y
+    lanza el job (launch_cancellation_job).
+    """
+    cancelled = db.session.execute(
+        update(Occurrence)
+        .where(Occurrence.id == occurrence_id, Occurrence.status == "scheduled")
+        .values(status="cancelled"),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    if not cancelled:
+        return None
+
+    counts = affected_purchases(occurrence_id)
+    # PACKAGE: la sesión sale del mínimo de cupos del pack, que puede subir
+    promote_waitlists([event_id], occurrence_ids=())
+
+    waiting = counts.get("pending", 0) + counts.get("committing", 0)
+    total = waiting + counts.get("paid", 0)
+    job = CancellationJob(
+        event_id=event_id,
+        occurrence_id=occurrence_id,
+        action="reassign" if replacement_occurrence_id else "refund",
+        replacement_occurrence_id=replacement_occurrence_id,
+        total=total,
+        waiting=waiting,
+    )
+    if not total:
+        job.status = "done"
+        job.finished_at = datetime.now(timezone.utc)
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+
+def job_progress(job: CancellationJob) -> dict:
+    """Estado del job para la vista de progreso (JSON)."""
+    return {
+        "id": job.id,
+        "status": job.status,
+        "action": job.action,
+        "total": job.total,
+        "processed": job.processed,
+        "reassigned": job.reassigned,
+        "refunded": job.refunded,
+        "refund_errors": job.refund_errors,
+        # sacadas de la sesión con reembolso que el gateway aún no confirma
+        "refunds_pending": job.processed - job.reassigned - job.refunded - job.refund_errors,
+        "waiting": job.waiting,
+        "last_error": job.last_error,
+        "finished": job.status == "done",
+    }
+
+
+def claim_job(job_id: int | None = None) -> int | None:
+    """
+    Toma un job vencido (queued, o running con el lease vencido) y lo deja en
+    running hasta now + CANCELLATION_LEASE_SECONDS. Hace commit. Devuelve su id.
+    """
+    now = datetime.now(timezone.utc)
+    due = (
+        CancellationJob.status.in_(("queued", "running")),
+        CancellationJob.next_attempt_at <= now,
+    )
+    if job_id is None:
+        job_id = db.session.scalar(
+            select(CancellationJob.id)
+            .where(*due)
+            .order_by(CancellationJob.next_attempt_at, CancellationJob.id)
+            .limit(1)
+        )
+        if job_id is None:
+            return None
+
+    # condicional: si otro worker lo tomó entre el SELECT y el UPDATE, no vuelve
+    claimed = db.session.scalar(
+        update(CancellationJob)
+        .where(CancellationJob.id == job_id, *due)
+        .values(status="running", next_attempt_at=now + _lease())
+        .returning(CancellationJob.id),
+        execution_options={"synchronize_session": False},
+    )
+    db.session.commit()
+    return claimed
+
+
+def _lease() -> timedelta:
+    return timedelta(seconds=current_app.config["CANCELLATION_LEASE_SECONDS"])
+
+
+def _bump_job(job_id: int, **deltas) -> None:
+    # contadores atómicos + extiende el lease (el job sigue vivo)
+    values = {name: getattr(CancellationJob, name) + n for name, n in deltas.items() if n}
+    db.session.execute(
+        update(CancellationJob)
+        .where(CancellationJob.id == job_id)
+        .values(next_attempt_at=datetime.now(timezone.utc) + _lease(), **values),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def _paid_batch(occurrence_id: int, replacement_id: int | None, after: int, limit: int):
+    """
+    Lote de compras pagadas todavía en la sesión: (id, total_amount, participantes,
+    precio pagado por la sesión, sesiones enlazadas, monto ya reembolsado por
+    sesiones canceladas antes, ya inscrita en el reemplazo).
+    """
+    links = purchase_occurrences.alias("links")
+    participants = (
+        select(func.count(PurchaseParticipant.id))
+        .where(PurchaseParticipant.purchase_id == Purchase.id)
+        .scalar_subquery()
+    )
+    n_links = (
+        select(func.count())
+        .select_from(links)
+        .where(links.c.purchase_id == Purchase.id)
+        .scalar_subquery()
+    )
+    # todas las filas cuentan: una failed queda para revisión manual, igual se debe
+    refunded = (
+        select(func.coalesce(func.sum(Refund.amount), 0))
+        .where(Refund.purchase_id == Purchase.id)
+        .scalar_subquery()
+    )
+    in_replacement = literal(False)
+    if replacement_id:
+        in_replacement = exists().where(
+            links.c.purchase_id == Purchase.id,
+            links.c.occurrence_id == replacement_id,
+        )
+    return db.session.execute(
+        select(
+            Purchase.id,
+            Purchase.total_amount,
+            participants.label("participants"),
+            purchase_occurrences.c.unit_price,
+            n_links.label("n_links"),
+            refunded.label("refunded"),
+            in_replacement.label("in_replacement"),
+        )
+        .join(purchase_occurrences, purchase_occurrences.c.purchase_id == Purchase.id)
+        .where(
+            purchase_occurrences.c.occurrence_id == occurrence_id,
+            Purchase.status == "paid",
+            Purchase.id > after,
+        )
+        .order_by(Purchase.id)
+        .limit(limit)
+    ).all()
+
+
+def _reserve_replacement(replacement_id: int, rows) -> list:
+    """
+    Reserva en seats_paid de la sesión de reemplazo el cupo de las compras que
+    caben, en orden de compra. Un UPDATE condicional con el total: si un checkout
+    concurrente tomó cupo entre la lectura y el UPDATE, se vuelve a calcular.
+    Devuelve las filas reasignadas.
+    """
+    capacity = func.coalesce(Occurrence.capacity_override, Event.capacity_default)
+    used = Occurrence.seats_reserved + Occurrence.seats_paid
+    for _ in range(RESERVE_ATTEMPTS):
+        state = db.session.execute(
+            select(capacity, used)
+            .join(Event, Event.id == Occurrence.event_id)
+            .where(Occurrence.id == replacement_id, Occurrence.status == "scheduled")
+        ).first()
+        if state is None:
+            return []
+        cap, in_use = state
+
+        fits, free = [], None if cap is None else int(cap) - int(in_use)
+        for row in rows:
+            if free is None or row.participants <= free:
+                fits.append(row)
+                if free is not None:
+                    free -= row.participants
+        seats = sum(row.participants for row in fits)
+        if not seats:
+            return fits
+
+        stmt = (
+            update(Occurrence)
+            .where(Occurrence.id == replacement_id, Occurrence.status == "scheduled")
+            .values(seats_paid=Occurrence.seats_paid + seats)
+        )
+        if cap is not None:
+            # el chequeo va en la misma sentencia: dos procesos no venden el mismo cupo
+            stmt = stmt.where(used + seats <= cap)
+        if db.session.execute(stmt, execution_options={"synchronize_session": False}).rowcount:
+            return fits
+    return []
+
+
+def _refund_amount(row, pricing_mode: str) -> int:
+    # lo que queda por devolver: las sesiones canceladas antes ya se reembolsaron
+    remaining = max(row.total_amount - row.refunded, 0)
+    if row.n_links <= 1:
+        # era su última sesión: se devuelve el resto
+        return remaining
+    if pricing_mode == "PER_OCCURRENCE" and row.unit_price is not None:
+        # lo que pagó por esta sesión (un cambio de precio posterior no cuenta)
+        return min(row.unit_price * row.participants, remaining)
+    # PACKAGE (o enlaces sin precio guardado): parte proporcional de lo que queda
+    return remaining // row.n_links
+
+
+def _process_batch(job, rows) -> dict:
+    occurrence_id = job.occurrence_id
+    replacement_id = job.replacement_occurrence_id
+
+    reassigned = []
+    if replacement_id:
+        # las que ya tenían el reemplazo no ganan nada con él: se les reembolsa la sesión
+        reassigned = _reserve_replacement(replacement_id, [row for row in rows if not row.in_replacement])
+        # el enlace nuevo conserva lo pagado (por si después se cancela el reemplazo)
+        new_links = [
+            {"purchase_id": row.id, "occurrence_id": replacement_id, "unit_price": row.unit_price}
+            for row in reassigned
+        ]
+        if new_links:
+            db.session.execute(insert(purchase_occurrences), new_links)
+
+    moved = {row.id for row in reassigned}
+    to_refund = [row for row in rows if row.id not in moved]
+    if to_refund:
+        db.session.execute(
+            insert(Refund),
+            [
+                {
+                    "job_id": job.id,
+                    "purchase_id": row.id,
+                    "occurrence_id": occurrence_id,
+                    "amount": _refund_amount(row, job.pricing_mode),
+                }
+                for row in to_refund
+            ],
+        )
+
+    # fuera de la sesión cancelada: el enlace y su cupo
+    ids = [row.id for row in rows]
+    db.session.execute(
+        delete(purchase_occurrences).where(
+            purchase_occurrences.c.occurrence_id == occurrence_id,
+            purchase_occurrences.c.purchase_id.in_(ids),
+        ),
+        execution_options={"synchronize_session": False},
+    )
+    _bump(Occurrence, {occurrence_id: sum(row.participants for row in rows)}, "seats_paid", None)
+
+    # sin sesiones restantes: la compra se cancela (libera el cupo del evento y sale de los rollups)
+    emptied = [row.id for row in to_refund if row.n_links <= 1]
+    if emptied:
+        emptied = db.session.scalars(
+            update(Purchase)
+            .where(Purchase.id.in_(emptied), Purchase.status == "paid")
+            .values(status="cancelled")
+            .returning(Purchase.id),
+            execution_options={"synchronize_session": False},
+        ).all()
+        shift_seats(emptied, "paid", "cancelled")
+        rollup_purchases(emptied, "cancelled", previous_status="paid")
+
+    return {"processed": len(rows), "reassigned": len(reassigned)}
+
+
+def _claim_refunds(job_id: int, limit: int) -> list:
+    rows = db.session.execute(
+        update(Refund)
+        .where(
+            Refund.id.in_(
+                select(Refund.id)
+                .where(Refund.job_id == job_id, Refund.status == "pending")
+                .order_by(Refund.id)
+                .limit(limit)
+            ),
+            Refund.status == "pending",
+        )
+        .values(status="processing")
+        .returning(Refund.id, Refund.purchase_id, Refund.amount),
+        execution_options={"synchronize_session": False},
+    ).all()
+    if not rows:
+        return []
+    tokens = dict(
+        db.session.execute(
+            select(Purchase.id, Purchase.tbk_token).where(Purchase.id.in_([row.purchase_id for row in rows]))
+        ).all()
+    )
+    # processing queda registrado antes de ir al gateway
+    db.session.commit()
+    return [(row.id, tokens.get(row.purchase_id), row.amount) for row in rows]
+
+
+def _send_refunds(executor, gateway, claimed) -> dict:
+    """{refund_id: respuesta | error}, en paralelo."""
+
+    def refund(item):
+        refund_id, token, amount = item
+        if not amount:
+            return refund_id, {"type": "NOTHING_TO_REFUND", "nullified_amount": 0}
+        if not token:
+            return refund_id, GatewayError("compra sin tbk_token")
+        try:
+            return refund_id, gateway.refund(token, amount)
+        except GatewayError as exc:
+            return refund_id, exc
+
+    return dict(executor.map(refund, claimed))
+
+
+def _record_refunds(job_id: int, results: dict) -> tuple[int, int]:
+    now = datetime.now(timezone.utc)
+    rows = []
+    errors = 0
+    for refund_id, result in results.items():
+        if isinstance(result, GatewayError):
+            errors += 1
+            log.warning("cancelación: reembolso %s falló: %s", refund_id, result)
+            rows.append({"id": refund_id, "status": "failed", "response": str(result)[:500], "processed_at": now})
+        else:
+            rows.append({"id": refund_id, "status": "refunded", "response": json.dumps(result), "processed_at": now})
+    if rows:
+        db.session.execute(update(Refund), rows)
+    refunded = len(rows) - errors
+    _bump_job(job_id, refunded=refunded, refund_errors=errors)
+    db.session.commit()
+    return refunded, errors
+
+
+def _job_params(job_id: int):
+    # valores planos: los commits por lote expiran los objetos del ORM
+    return db.session.execute(
+        select(
+            CancellationJob.id,
+            CancellationJob.event_id,
+            CancellationJob.occurrence_id,
+            # solo reassign usa la sesión de reemplazo
+            case(
+                (CancellationJob.action == "reassign", CancellationJob.replacement_occurrence_id),
+            ).label("replacement_occurrence_id"),
+            Event.pricing_mode,
+        )
+        .join(Event, Event.id == CancellationJob.event_id)
+        .where(CancellationJob.id == job_id)
+    ).one()
+
+
+def _run_claimed(job_id: int, gateway=None, batch_size: int | None = None) -> dict:
+    config = current_app.config
+    batch_size = batch_size or config["CANCELLATION_BATCH_SIZE"]
+    job = _job_params(job_id)
+
+    try:
+        after = 0
+        while True:
+            rows = _paid_batch(job.occurrence_id, job.replacement_occurrence_id, after, batch_size)
+            if not rows:
+                break
+            _bump_job(job.id, **_process_batch(job, rows))
+            db.session.commit()
+            # los contadores cambiaron con UPDATE directos: no pasan por el cache del catálogo
+            page_cache.invalidate([job.event_id])
+            if len(rows) < batch_size:
+                break
+            after = rows[-1].id
+
+        gateway = gateway or get_gateway()
+        with ThreadPoolExecutor(
+            max_workers=config["CANCELLATION_REFUND_CONCURRENCY"], thread_name_prefix="refund"
+        ) as executor:
+            while claimed := _claim_refunds(job.id, batch_size):
+                _record_refunds(job.id, _send_refunds(executor, gateway, claimed))
+
+        _finish(job.id, job.occurrence_id)
+    except Exception as exc:
+        db.session.rollback()
+        # queda running: al vencer el lease otra pasada lo retoma
+        db.session.execute(
+            update(CancellationJob)
+            .where(CancellationJob.id == job_id)
+            .values(last_error=f"{type(exc).__name__}: {exc}"[:500]),
+            execution_options={"synchronize_session": False},
+        )
+        db.session.commit()
+        raise
+
+    return job_progress(db.session.get(CancellationJob, job_id))
+
+
+def run_cancellation_job(job_id: int, gateway=None, batch_size: int | None = None) -> dict | None:
+    """
+    Procesa un job (si se puede tomar): lotes de compras, reembolsos y cierre.
+    Devuelve su progreso, o None si otro worker lo tiene o no está vencido.
+    """
+    if claim_job(job_id) is None:
+        return None
+    return _run_claimed(job_id, gateway=gateway, batch_size=batch_size)
+
+
+def _finish(job_id: int, occurrence_id: int) -> None:
+    counts = affected_purchases(occurrence_id)
+    # pending/committing que aún pueden pagarse (y pagadas mientras corría el job)
+    waiting = counts.get("pending", 0) + counts.get("committing", 0) + counts.get("paid", 0)
+    now = datetime.now(timezone.utc)
+    values = {"waiting": waiting, "last_error": None}
+    if waiting:
+        recheck = timedelta(seconds=current_app.config["CANCELLATION_RECHECK_SECONDS"])
+        values.update(status="queued", next_attempt_at=now + recheck)
+    else:
+        values.update(status="done", finished_at=now)
+    db.session.execute(
+        update(CancellationJob).where(CancellationJob.id == job_id).values(**values),
+        execution_options={"synchronize_session": False},
+    )
+    db.session.commit()
+
+
+def run_due_cancellation_jobs(gateway=None) -> int:
+    """Procesa los jobs vencidos (nuevos, en espera o abandonados). Devuelve cuántos."""
+    done = 0
+    while (job_id := claim_job()) is not None:
+        _run_claimed(job_id, gateway=gateway)
+        done += 1
+    return done
+
+
+def launch_cancellation_job(app, job_id: int) -> threading.Thread:
+    # El POST no espera: el job corre en un hilo y la vista de progreso lo consulta.
+    def target():
+        with app.app_context():
+            try:
+                run_cancellation_job(job_id)
+            except Exception:
+                log.exception("cancelación: job %s falló", job_id)
+            finally:
+                db.session.remove()
+
+    thread = threading.Thread(target=target, name=f"cancellation-{job_id}", daemon=True)
+    thread.start()
+    return thread
+
+
+def run_cancellation_worker(app, interval: float, stop: threading.Event | None = None) -> None:
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                n = run_due_cancellation_jobs()
+                if n:
+                    log.info("cancelación: %s jobs procesados", n)
+            except Exception:
+                db.session.rollback()
+                log.exception("worker de cancelaciones falló")
+            finally:
+                db.session.remove()
+        stop.wait(interval)
+
+
+def start_cancellation_worker(app) -> threading.Thread:
+    # Hilo en proceso (opcional). En producción se recomienda `flask cancellation-jobs --loop`.
+    interval = app.config["CANCELLATION_WORKER_INTERVAL_SECONDS"]
+    thread = threading.Thread(
+        target=run_cancellation_worker,
+        args=(app, interval),
+        name="cancellation-worker",
+        daemon=True,
+    )
+    thread.start()
+    return thread
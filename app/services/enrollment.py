@@ -0,0 +1,122 @@
+# app/services/enrollment.py
+#
+# Inscripción de compras PACKAGE pagadas a sesiones, con sentencias set-based:
+# un INSERT ... SELECT en purchase_occurrences con ON CONFLICT DO NOTHING (la PK
+# (purchase_id, occurrence_id) lo hace idempotente) y RETURNING de los enlaces
+# nuevos, que son los únicos que suman a seats_paid. No carga compras ni
+# sesiones al ORM: el mismo statement sirve para una compra o para miles.
+#
+# - al pagar: la compra queda inscrita en todas las sesiones scheduled del evento
+# - al agregar sesiones a un evento PACKAGE: las compras ya pagadas se inscriben
+#   también en las sesiones nuevas
+#
+# En motores sin ON CONFLICT (ni SQLite ni PostgreSQL) se leen los enlaces que
+# faltan y se insertan en un savepoint; los que otra transacción creó entremedio
+# se omiten, igual que con DO NOTHING.
+
+from sqlalchemy import exists, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import Event, Occurrence, Purchase
+from app.models.purchase_occurrence import purchase_occurrences
+from app.services.seats import add_enrollment_seats
+
+
+def _dialect_insert():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+def _insert_links_stmt(dialect_insert, pairs):
+    table = purchase_occurrences
+    # SQLite exige WHERE en el SELECT de un INSERT ... SELECT ... ON CONFLICT: `pairs` siempre lo trae
+    return (
+        dialect_insert(table)
+        .from_select(["purchase_id", "occurrence_id"], pairs)
+        .on_conflict_do_nothing(index_elements=[table.c.purchase_id, table.c.occurrence_id])
+        .returning(table.c.purchase_id, table.c.occurrence_id)
+    )
+
+
+def _insert_links_portable(pairs):
+    table = purchase_occurrences
+    linked = exists().where(table.c.purchase_id == Purchase.id, table.c.occurrence_id == Occurrence.id)
+    links = db.session.execute(pairs.where(~linked)).all()
+    if not links:
+        return []
+    rows = [{"purchase_id": purchase_id, "occurrence_id": occurrence_id} for purchase_id, occurrence_id in links]
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(table), rows)
+        return links
+    except IntegrityError:
+        pass
+
+    # alguna ya existía (inscripción concurrente): de a una, omitiendo las repetidas
+    inserted = []
+    for link, row in zip(links, rows):
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table).values(row))
+            inserted.append(link)
+        except IntegrityError:
+            continue
+    return inserted
+
+
+def _enroll(pairs, participants: dict[int, int] | None = None) -> int:
+    dialect_insert = _dialect_insert()
+    if dialect_insert is None:
+        links = _insert_links_portable(pairs)
+    else:
+        links = db.session.execute(_insert_links_stmt(dialect_insert, pairs)).all()
+    add_enrollment_seats(links, "paid", participants)
+    return len({purchase_id for purchase_id, _ in links})
+
+
+def _package_pairs():
+    # (compra pagada, sesión scheduled de su evento) para eventos PACKAGE
+    return (
+        select(Purchase.id, Occurrence.id)
+        .join(Event, Event.id == Purchase.event_id)
+        .join(
+            Occurrence,
+            (Occurrence.event_id == Purchase.event_id) & (Occurrence.status == "scheduled"),
+        )
+        .where(Purchase.status == "paid", Event.pricing_mode == "PACKAGE")
+    )
+
+
+def enroll_package_purchases(purchase_ids, participants: dict[int, int] | None = None) -> int:
+    """
+    Inscribe compras pagadas de eventos PACKAGE en todas las sesiones scheduled de
+    su evento (las que falten). participants: {purchase_id: n} si ya se conoce
+    (ahorra una query). Quien llama hace el commit. Devuelve cuántas compras
+    quedaron con alguna sesión nueva.
+    """
+    purchase_ids = list(purchase_ids)
+    if not purchase_ids:
+        return 0
+    return _enroll(_package_pairs().where(Purchase.id.in_(purchase_ids)), participants)
+
+
+def enroll_new_occurrences(event_id: int, occurrence_ids) -> int:
+    """
+    Inscribe en esas sesiones (recién creadas) a todas las compras ya pagadas del
+    evento, si es PACKAGE. Un solo INSERT ... SELECT sobre
+    ix_purchases_event_status_created. Quien llama hace el commit. Devuelve cuántas
+    compras inscribió.
+    """
+    occurrence_ids = list(occurrence_ids)
+    if not occurrence_ids:
+        return 0
+    return _enroll(
+        _package_pairs().where(Purchase.event_id == event_id, Occurrence.id.in_(occurrence_ids))
+    )
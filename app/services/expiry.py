@@ -0,0 +1,236 @@
+# app/services/expiry.py
+
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import func, select, union_all, update
+
+from app.extensions import db
+from app.models import Occurrence, Purchase, PurchaseParticipant, WaitlistEntry
+from app.models.purchase_occurrence import purchase_occurrences
+from app.services.rollups import rollup_purchases
+from app.services.seats import shift_seats
+
+log = logging.getLogger(__name__)
+
+
+def pending_cutoff() -> datetime:
+    # pending creados antes de esto ya no reservan cupo (aunque el sweeper no haya pasado)
+    ttl = current_app.config["PENDING_PURCHASE_TTL_MINUTES"]
+    return datetime.now(timezone.utc) - timedelta(minutes=ttl)
+
+
+def is_stale_pending(purchase: Purchase, cutoff: datetime | None = None) -> bool:
+    # pending vencido que el sweeper aún no expiró (ya no reserva cupo)
+    created_at = purchase.created_at
+    if created_at.tzinfo is None:
+        # SQLite devuelve datetimes naive (guardados en UTC)
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return purchase.status == "pending" and created_at < (cutoff or pending_cutoff())
+
+
+def stale_pending_clause(cutoff: datetime):
+    # lo mismo que is_stale_pending, en SQL
+    return (Purchase.status == "pending") & (Purchase.created_at < cutoff)
+
+
+def stale_pending_seats_query(event_id, cutoff: datetime):
+    # participantes de pending vencidos: siguen en seats_reserved hasta que corra el sweeper
+    return (
+        select(func.count(PurchaseParticipant.id))
+        .join(Purchase, PurchaseParticipant.purchase_id == Purchase.id)
+        .where(Purchase.event_id == event_id, stale_pending_clause(cutoff))
+    )
+
+
+def _stale_occurrence_seats(cutoff: datetime):
+    return (
+        select(func.count(PurchaseParticipant.id))
+        .select_from(purchase_occurrences)
+        .join(Purchase, Purchase.id == purchase_occurrences.c.purchase_id)
+        .join(PurchaseParticipant, PurchaseParticipant.purchase_id == Purchase.id)
+        .where(stale_pending_clause(cutoff))
+    )
+
+
+def stale_pending_occurrence_seats_expr(cutoff: datetime):
+    # subquery correlacionada con Occurrence.id, para el UPDATE condicional por sesión
+    return (
+        _stale_occurrence_seats(cutoff)
+        .where(purchase_occurrences.c.occurrence_id == Occurrence.id)
+        .correlate(Occurrence)
+        .scalar_subquery()
+    )
+
+
+def lapsed_offer_seats_query(event_id, now: datetime):
+    # ofertas de lista de espera vencidas: siguen retenidas en seats_reserved hasta
+    # que corra expire_waitlist_offers (sweeper), pero ya no se pueden tomar
+    return (
+        select(func.coalesce(func.sum(WaitlistEntry.participant_count), 0))
+        .where(
+            WaitlistEntry.event_id == event_id,
+            WaitlistEntry.status == "offered",
+            WaitlistEntry.offer_expires_at < now,
+        )
+    )
+
+
+def _lapsed_occurrence_offers(now: datetime):
+    return select(func.coalesce(func.sum(WaitlistEntry.participant_count), 0)).where(
+        WaitlistEntry.status == "offered",
+        WaitlistEntry.offer_expires_at < now,
+    )
+
+
+def released_seats_expr(event_id, cutoff: datetime | None = None):
+    """
+    Cupos que seats_reserved del evento aún incluye pero ya no reservan: pending
+    vencidos y ofertas de lista de espera vencidas. Así un cupo no queda tomado
+    aunque el sweeper no corra (EXPIRY_SWEEP_INTERVAL_SECONDS=0).
+    """
+    cutoff = cutoff or pending_cutoff()
+    now = datetime.now(timezone.utc)
+    return (
+        stale_pending_seats_query(event_id, cutoff).scalar_subquery()
+        + lapsed_offer_seats_query(event_id, now).scalar_subquery()
+    )
+
+
+def released_occurrence_seats_expr(cutoff: datetime | None = None):
+    # lo mismo por sesión, correlacionado con Occurrence.id (UPDATE condicional)
+    cutoff = cutoff or pending_cutoff()
+    now = datetime.now(timezone.utc)
+    offers = (
+        _lapsed_occurrence_offers(now)
+        .where(WaitlistEntry.occurrence_id == Occurrence.id)
+        .correlate(Occurrence)
+        .scalar_subquery()
+    )
+    return stale_pending_occurrence_seats_expr(cutoff) + offers
+
+
+def released_seats(event_id: int, cutoff: datetime | None = None) -> int:
+    return db.session.scalar(select(released_seats_expr(event_id, cutoff))) or 0
+
+
+def released_seats_by_occurrence(occurrence_ids, cutoff: datetime | None = None) -> dict[int, int]:
+    # una sola query (pending vencidos + ofertas vencidas) para todas las sesiones
+    occurrence_ids = list(occurrence_ids)
+    if not occurrence_ids:
+        return {}
+    cutoff = cutoff or pending_cutoff()
+    now = datetime.now(timezone.utc)
+    stale = (
+        _stale_occurrence_seats(cutoff)
+        .add_columns(purchase_occurrences.c.occurrence_id.label("occurrence_id"))
+        .where(purchase_occurrences.c.occurrence_id.in_(occurrence_ids))
+        .group_by(purchase_occurrences.c.occurrence_id)
+    )
+    offers = (
+        _lapsed_occurrence_offers(now)
+        .add_columns(WaitlistEntry.occurrence_id.label("occurrence_id"))
+        .where(WaitlistEntry.occurrence_id.in_(occurrence_ids))
+        .group_by(WaitlistEntry.occurrence_id)
+    )
+    released: dict[int, int] = {}
+    for n, occurrence_id in db.session.execute(union_all(stale, offers)):
+        released[occurrence_id] = released.get(occurrence_id, 0) + int(n)
+    return released
+
+
+def expire_purchases(purchase_ids, cutoff: datetime | None = None) -> int:
+    """
+    Expira las compras de la lista que sigan pending y estén vencidas (UPDATE
+    condicional: un webpay_return o sweeper concurrente no se pisa), liberando
+    sus cupos y ofreciéndolos a la lista de espera. Quien llama hace el commit.
+    Devuelve cuántas expiró.
+    """
+    # import tardío: waitlist usa los helpers de este módulo
+    from app.services.waitlist import promote_waitlists
+
+    purchase_ids = list(purchase_ids)
+    if not purchase_ids:
+        return 0
+    cutoff = cutoff or pending_cutoff()
+
+    expired = db.session.execute(
+        update(Purchase)
+        .where(Purchase.id.in_(purchase_ids), Purchase.status == "pending", Purchase.created_at < cutoff)
+        .values(status="expired")
+        .returning(Purchase.id, Purchase.event_id),
+        execution_options={"synchronize_session": False},
+    ).all()
+    expired_ids = [purchase_id for purchase_id, _ in expired]
+
+    shift_seats(expired_ids, "pending", "expired")
+    rollup_purchases(expired_ids, "expired")
+    # los cupos liberados se ofrecen a la lista de espera en la misma transacción
+    promote_waitlists(event_id for _, event_id in expired)
+    return len(expired_ids)
+
+
+def expire_stale_pending(batch_size: int | None = None) -> int:
+    """
+    Expira pending vencidos de TODOS los eventos, por lotes (un commit por lote),
+    liberando sus cupos (y ofreciéndolos a la lista de espera) en la misma
+    transacción. Devuelve cuántas compras expiró.
+    Es seguro correrlo en paralelo: solo cuenta las filas que realmente cambió.
+    """
+    batch_size = batch_size or current_app.config["EXPIRY_SWEEP_BATCH_SIZE"]
+    cutoff = pending_cutoff()
+    total = 0
+
+    while True:
+        ids = db.session.scalars(
+            select(Purchase.id)
+            .where(Purchase.status == "pending", Purchase.created_at < cutoff)
+            .order_by(Purchase.id)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            break
+
+        total += expire_purchases(ids, cutoff)
+        db.session.commit()
+
+        if len(ids) < batch_size:
+            break
+
+    return total
+
+
+def run_expiry_sweeper(app, interval: float, stop: threading.Event | None = None) -> None:
+    from app.services.waitlist import expire_waitlist_offers
+
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                n = expire_stale_pending()
+                if n:
+                    log.info("expiry sweeper: %s compras expiradas", n)
+                offers = expire_waitlist_offers()
+                if offers:
+                    log.info("expiry sweeper: %s ofertas de lista de espera vencidas", offers)
+            except Exception:
+                db.session.rollback()
+                log.exception("expiry sweeper falló")
+            finally:
+                db.session.remove()
+        stop.wait(interval)
+
+
+def start_expiry_sweeper(app) -> threading.Thread:
+    # Hilo en proceso (opcional). En producción se recomienda `flask expire-pending --loop`.
+    interval = app.config["EXPIRY_SWEEP_INTERVAL_SECONDS"]
+    thread = threading.Thread(
+        target=run_expiry_sweeper,
+        args=(app, interval),
+        name="expiry-sweeper",
+        daemon=True,
+    )
+    thread.start()
+    return thread
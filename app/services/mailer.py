@@ -0,0 +1,168 @@
+# app/services/mailer.py
+#
+# Transporte de correo para el worker del outbox (app/services/outbox.py):
+# - pool de conexiones SMTP reutilizadas entre mensajes y lotes (un login por conexión)
+# - límite de envíos por segundo (token bucket compartido entre hilos)
+# - errores clasificados: permanentes (5xx, destinatario rechazado) vs reintentables
+#
+# MAIL_BACKEND="log" solo loguea (desarrollo). Para probar SMTP de verdad en local:
+#   python -m aiosmtpd -n -l localhost:8025   y   MAIL_SMTP_PORT=8025 MAIL_SMTP_STARTTLS=0
+
+import logging
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+class MailError(Exception):
+    def __init__(self, message: str, permanent: bool = False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+class RateLimiter:
+    """Token bucket: a lo sumo `rate` envíos por segundo (ráfagas de hasta `burst`)."""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.capacity = burst or max(int(rate), 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # se reserva el turno aunque falte saldo: los siguientes esperan más
+            delay = (1 - self._tokens) / self.rate if self._tokens < 1 else 0
+            self._tokens -= 1
+        if delay:
+            time.sleep(delay)
+
+
+class SmtpMailer:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        starttls: bool = True,
+        timeout: float = 10.0,
+        pool_size: int = 4,
+        rate_per_second: float = 0,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.limiter = RateLimiter(rate_per_second)
+        self._idle: list[smtplib.SMTP] = []
+        self._lock = threading.Lock()
+        # nunca más de pool_size conexiones abiertas (ocupadas + libres)
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _connect(self) -> smtplib.SMTP:
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            conn.starttls()
+        if self.username:
+            conn.login(self.username, self.password or "")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        self._slots.acquire()
+        conn = None
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._connect()
+            yield conn
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+            # rechazo del servidor: smtplib ya hizo RSET, la conexión sigue usable
+            raise
+        except BaseException:
+            # estado desconocido (p.ej. a mitad de DATA): no vuelve al pool
+            _quit(conn)
+            conn = None
+            raise
+        finally:
+            if conn is not None:
+                with self._lock:
+                    self._idle.append(conn)
+            self._slots.release()
+
+    def send(self, message) -> None:
+        self.limiter.wait()
+        try:
+            try:
+                with self._connection() as conn:
+                    conn.send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                # conexión libre que el servidor cerró por inactividad: una vez más con otra
+                with self._connection() as conn:
+                    conn.send_message(message)
+        except smtplib.SMTPRecipientsRefused as exc:
+            raise MailError(f"destinatario rechazado: {exc.recipients}", permanent=True) from exc
+        except smtplib.SMTPResponseException as exc:
+            raise MailError(f"SMTP {exc.smtp_code}: {exc.smtp_error!r}", permanent=exc.smtp_code >= 500) from exc
+        except (smtplib.SMTPException, OSError) as exc:
+            raise MailError(f"{type(exc).__name__}: {exc}") from exc
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            _quit(conn)
+
+
+class LogMailer:
+    """No envía: deja el correo en el log (desarrollo)."""
+
+    pool_size = 1
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message) -> None:
+        self.sent.append(message)
+        log.info("correo (MAIL_BACKEND=log) para %s: %s", message["To"], message["Subject"])
+
+    def close(self) -> None:
+        pass
+
+
+def _quit(conn) -> None:
+    if conn is None:
+        return
+    try:
+        conn.quit()
+    except (smtplib.SMTPException, OSError):
+        conn.close()
+
+
+def build_mailer(config):
+    if config["MAIL_BACKEND"] == "log":
+        return LogMailer()
+    return SmtpMailer(
+        host=config["MAIL_SMTP_HOST"],
+        port=config["MAIL_SMTP_PORT"],
+        username=config["MAIL_SMTP_USER"],
+        password=config["MAIL_SMTP_PASSWORD"],
+        starttls=config["MAIL_SMTP_STARTTLS"],
+        timeout=config["MAIL_SMTP_TIMEOUT"],
+        pool_size=config["MAIL_SMTP_POOL_SIZE"],
+        rate_per_second=config["MAIL_RATE_PER_SECOND"],
+    )
@@ -0,0 +1,80 @@
+# app/services/occupancy.py
+
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import func, literal, select, union_all
+
+from app.extensions import db
+from app.models import Purchase, PurchaseParticipant
+from app.models.purchase_occurrence import purchase_occurrences
+from app.services.expiry import pending_cutoff, stale_pending_clause
+
+
+@dataclass
+class SeatCounts:
+    paid: int = 0
+    # pending/committing: reservan cupo hasta que se paguen o expiren
+    pending: int = 0
+
+
+@dataclass
+class EventOccupancy:
+    event: SeatCounts = field(default_factory=SeatCounts)
+    occurrences: dict[int, SeatCounts] = field(default_factory=dict)
+
+    def for_occurrence(self, occurrence_id: int) -> SeatCounts:
+        return self.occurrences.get(occurrence_id) or SeatCounts()
+
+
+def _add(counts: SeatCounts, status: str, n: int) -> None:
+    if status == "paid":
+        counts.paid += n
+    elif status in ("pending", "committing"):
+        counts.pending += n
+
+
+def event_occupancy(event_id: int, cutoff: datetime | None = None) -> EventOccupancy:
+    """
+    Participantes paid/pending de un evento en UNA sola query agrupada:
+    - fila con occurrence_id NULL => total del evento (incluye compras sin sesiones asignadas)
+    - fila por occurrence_id => participantes de compras enlazadas a esa sesión
+
+    Los pending vencidos no cuentan aunque el sweeper no los haya expirado aún.
+    El número de queries no depende de cuántas sesiones tenga el evento.
+    """
+    statuses = ("paid", "pending", "committing")
+    live = Purchase.status.in_(statuses) & ~stale_pending_clause(cutoff or pending_cutoff())
+
+    totals = (
+        select(
+            literal(None).label("occurrence_id"),
+            Purchase.status,
+            func.count(PurchaseParticipant.id).label("n"),
+        )
+        .join(PurchaseParticipant, PurchaseParticipant.purchase_id == Purchase.id)
+        .where(Purchase.event_id == event_id, live)
+        .group_by(Purchase.status)
+    )
+
+    by_occurrence = (
+        select(
+            purchase_occurrences.c.occurrence_id,
+            Purchase.status,
+            func.count(PurchaseParticipant.id).label("n"),
+        )
+        .select_from(purchase_occurrences)
+        .join(Purchase, purchase_occurrences.c.purchase_id == Purchase.id)
+        .join(PurchaseParticipant, PurchaseParticipant.purchase_id == Purchase.id)
+        .where(Purchase.event_id == event_id, live)
+        .group_by(purchase_occurrences.c.occurrence_id, Purchase.status)
+    )
+
+    occupancy = EventOccupancy()
+    for occurrence_id, status, n in db.session.execute(union_all(totals, by_occurrence)):
+        if occurrence_id is None:
+            _add(occupancy.event, status, n)
+        else:
+            _add(occupancy.occurrences.setdefault(occurrence_id, SeatCounts()), status, n)
+
+    return occupancy
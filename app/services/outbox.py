@@ -0,0 +1,329 @@
+# app/services/outbox.py
+#
+# Outbox de correos. Quien cambia el estado (webpay_return al marcar paid, la lista
+# de espera al ofrecer cupos) solo inserta una fila en outbox_messages en su misma
+# transacción: el request no espera al SMTP y no hay correo de un cambio cuyo
+# commit falló.
+#
+# El worker (`flask outbox-send --loop` o el hilo con OUTBOX_WORKER_INTERVAL_SECONDS)
+# entrega por lotes:
+# 1. toma hasta OUTBOX_BATCH_SIZE filas vencidas con un UPDATE condicional que las
+#    deja en sending con un lease (varios workers no toman la misma; si uno muere,
+#    el lease vence y otra pasada las retoma)
+# 2. arma los correos del lote con una carga de compras y una de entradas de la
+#    lista de espera (sin N+1)
+# 3. envía en paralelo sobre el pool SMTP, respetando MAIL_RATE_PER_SECOND
+# 4. marca enviados con un UPDATE; los fallidos se reprograman con backoff
+#    exponencial o quedan failed (error permanente / OUTBOX_MAX_ATTEMPTS)
+
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+
+from flask import current_app, render_template
+from sqlalchemy import insert, literal, select, update
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.extensions import db
+from app.models import OutboxMessage, Purchase, WaitlistEntry
+from app.services.mailer import MailError, build_mailer
+
+log = logging.getLogger(__name__)
+
+PURCHASE_CONFIRMATION = "purchase_confirmation"
+WAITLIST_OFFER = "waitlist_offer"
+
+# ruta de checkout.waitlist_offer: el worker puede correr sin blueprints (sin url_for)
+WAITLIST_OFFER_PATH = "/checkout/waitlist/{token}"
+
+
+def enqueue_purchase_confirmation(purchase: Purchase) -> None:
+    """Encola la confirmación de una compra pagada. Quien llama hace el commit."""
+    db.session.add(
+        OutboxMessage(
+            kind=PURCHASE_CONFIRMATION,
+            purchase_id=purchase.id,
+            recipient=purchase.buyer_email,
+        )
+    )
+
+
+def enqueue_purchase_confirmations(purchase_ids) -> None:
+    """Lo mismo para un lote de compras (conciliación): un INSERT ... SELECT."""
+    purchase_ids = list(purchase_ids)
+    if not purchase_ids:
+        return
+    now = datetime.now(timezone.utc)
+    db.session.execute(
+        insert(OutboxMessage).from_select(
+            ["kind", "purchase_id", "recipient", "status", "attempts", "next_attempt_at", "created_at"],
+            select(
+                literal(PURCHASE_CONFIRMATION),
+                Purchase.id,
+                Purchase.buyer_email,
+                literal("pending"),
+                literal(0),
+                literal(now, OutboxMessage.next_attempt_at.type),
+                literal(now, OutboxMessage.created_at.type),
+            ).where(Purchase.id.in_(purchase_ids)),
+        )
+    )
+
+
+def enqueue_waitlist_offers(entry_ids) -> None:
+    """Encola el aviso de las ofertas recién hechas (un INSERT ... SELECT). Quien llama hace el commit."""
+    entry_ids = list(entry_ids)
+    if not entry_ids:
+        return
+    now = datetime.now(timezone.utc)
+    db.session.execute(
+        insert(OutboxMessage).from_select(
+            ["kind", "waitlist_entry_id", "recipient", "status", "attempts", "next_attempt_at", "created_at"],
+            select(
+                literal(WAITLIST_OFFER),
+                WaitlistEntry.id,
+                WaitlistEntry.buyer_email,
+                literal("pending"),
+                literal(0),
+                literal(now, OutboxMessage.next_attempt_at.type),
+                literal(now, OutboxMessage.created_at.type),
+            ).where(WaitlistEntry.id.in_(entry_ids)),
+        )
+    )
+
+
+def claim_batch(limit: int) -> list:
+    """
+    Toma hasta `limit` mensajes vencidos (pending, o sending con el lease vencido)
+    y los deja en sending hasta now + OUTBOX_LEASE_SECONDS. Hace commit.
+    """
+    now = datetime.now(timezone.utc)
+    due = (
+        OutboxMessage.status.in_(("pending", "sending")),
+        OutboxMessage.next_attempt_at <= now,
+    )
+    ids = db.session.scalars(
+        select(OutboxMessage.id)
+        .where(*due)
+        .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+        .limit(limit)
+    ).all()
+    if not ids:
+        return []
+
+    # condicional: si otro worker los tomó entre el SELECT y el UPDATE, no vuelven
+    rows = db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(ids), *due)
+        .values(
+            status="sending",
+            attempts=OutboxMessage.attempts + 1,
+            next_attempt_at=now + timedelta(seconds=current_app.config["OUTBOX_LEASE_SECONDS"]),
+        )
+        .returning(
+            OutboxMessage.id,
+            OutboxMessage.kind,
+            OutboxMessage.purchase_id,
+            OutboxMessage.waitlist_entry_id,
+            OutboxMessage.recipient,
+            OutboxMessage.attempts,
+        ),
+        execution_options={"synchronize_session": False},
+    ).all()
+    db.session.commit()
+    return rows
+
+
+def _purchase_confirmation(purchase: Purchase, recipient: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = current_app.config["MAIL_FROM"]
+    message["To"] = recipient
+    message["Subject"] = f"Inscripción confirmada: {purchase.event.title}"
+    message.set_content(render_template("emails/purchase_confirmation.txt", purchase=purchase))
+    return message
+
+
+def _waitlist_offer(entry: WaitlistEntry, recipient: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = current_app.config["MAIL_FROM"]
+    message["To"] = recipient
+    message["Subject"] = f"Se liberó un cupo: {entry.event.title}"
+    link = current_app.config["PUBLIC_BASE_URL"].rstrip("/") + WAITLIST_OFFER_PATH.format(token=entry.token)
+    message.set_content(render_template("emails/waitlist_offer.txt", entry=entry, link=link))
+    return message
+
+
+def _load_entries(rows) -> dict:
+    entry_ids = [row.waitlist_entry_id for row in rows if row.kind == WAITLIST_OFFER]
+    if not entry_ids:
+        return {}
+    return {
+        entry.id: entry
+        for entry in db.session.scalars(
+            select(WaitlistEntry)
+            .where(WaitlistEntry.id.in_(entry_ids))
+            .options(joinedload(WaitlistEntry.event), joinedload(WaitlistEntry.occurrence))
+        )
+    }
+
+
+def _build_messages(rows) -> tuple[dict, dict]:
+    """({id: EmailMessage}, {id: error}) del lote; una carga de compras y una de ofertas."""
+    purchase_ids = [row.purchase_id for row in rows if row.kind == PURCHASE_CONFIRMATION]
+    purchases = {}
+    if purchase_ids:
+        purchases = {
+            purchase.id: purchase
+            for purchase in db.session.scalars(
+                select(Purchase)
+                .where(Purchase.id.in_(purchase_ids))
+                .options(
+                    joinedload(Purchase.event),
+                    selectinload(Purchase.occurrences),
+                    selectinload(Purchase.participants),
+                )
+            )
+        }
+
+    entries = _load_entries(rows)
+
+    messages, errors = {}, {}
+    for row in rows:
+        if row.kind == PURCHASE_CONFIRMATION and row.purchase_id in purchases:
+            messages[row.id] = _purchase_confirmation(purchases[row.purchase_id], row.recipient)
+        elif row.kind == WAITLIST_OFFER and row.waitlist_entry_id in entries:
+            messages[row.id] = _waitlist_offer(entries[row.waitlist_entry_id], row.recipient)
+        else:
+            target = row.purchase_id if row.kind == PURCHASE_CONFIRMATION else row.waitlist_entry_id
+            errors[row.id] = MailError(f"no se puede armar {row.kind} ({target})", permanent=True)
+    return messages, errors
+
+
+def _send_all(mailer, messages: dict) -> dict:
+    """Envía en paralelo (un hilo por conexión del pool); devuelve {id: error}."""
+
+    def send(item):
+        message_id, message = item
+        try:
+            mailer.send(message)
+        except MailError as exc:
+            return message_id, exc
+        return message_id, None
+
+    with ThreadPoolExecutor(max_workers=max(mailer.pool_size, 1)) as pool:
+        results = list(pool.map(send, messages.items()))
+    return {message_id: error for message_id, error in results if error is not None}
+
+
+def retry_delay(attempts: int) -> float:
+    """Segundos hasta el próximo intento: backoff exponencial con tope y algo de jitter."""
+    config = current_app.config
+    delay = min(config["OUTBOX_RETRY_BACKOFF_SECONDS"] * 2 ** (attempts - 1), config["OUTBOX_RETRY_MAX_SECONDS"])
+    return delay * random.uniform(1.0, 1.2)
+
+
+def _record_results(rows, errors: dict) -> tuple[int, int, int]:
+    now = datetime.now(timezone.utc)
+    sent_ids = [row.id for row in rows if row.id not in errors]
+    if sent_ids:
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(sent_ids))
+            .values(status="sent", sent_at=now, last_error=None),
+            execution_options={"synchronize_session": False},
+        )
+
+    retried = failed = 0
+    max_attempts = current_app.config["OUTBOX_MAX_ATTEMPTS"]
+    for row in rows:
+        error = errors.get(row.id)
+        if error is None:
+            continue
+        if error.permanent or row.attempts >= max_attempts:
+            values = {"status": "failed"}
+            failed += 1
+        else:
+            values = {"status": "pending", "next_attempt_at": now + timedelta(seconds=retry_delay(row.attempts))}
+            retried += 1
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id == row.id)
+            .values(last_error=str(error)[:500], **values),
+            execution_options={"synchronize_session": False},
+        )
+        log.warning("outbox: mensaje %s (%s) -> %s: %s", row.id, row.recipient, values["status"], error)
+
+    db.session.commit()
+    return len(sent_ids), retried, failed
+
+
+def deliver_outbox(mailer=None, batch_size: int | None = None) -> dict:
+    """
+    Entrega todo lo vencido, lote por lote. `mailer`: el del worker (su pool SMTP se
+    reutiliza entre pasadas); sin él se crea uno y se cierra al terminar.
+    Devuelve {"sent", "retried", "failed"}.
+    """
+    batch_size = batch_size or current_app.config["OUTBOX_BATCH_SIZE"]
+    own_mailer = mailer is None
+    mailer = mailer or build_mailer(current_app.config)
+    totals = {"sent": 0, "retried": 0, "failed": 0}
+
+    try:
+        while True:
+            rows = claim_batch(batch_size)
+            if not rows:
+                break
+
+            messages, errors = _build_messages(rows)
+            # los correos ya están armados: las sesiones SMTP no retienen la conexión a la base
+            db.session.rollback()
+            errors.update(_send_all(mailer, messages))
+
+            sent, retried, failed = _record_results(rows, errors)
+            totals["sent"] += sent
+            totals["retried"] += retried
+            totals["failed"] += failed
+
+            if len(rows) < batch_size:
+                break
+    finally:
+        if own_mailer:
+            mailer.close()
+
+    return totals
+
+
+def run_outbox_worker(app, interval: float, stop: threading.Event | None = None) -> None:
+    stop = stop or threading.Event()
+    mailer = build_mailer(app.config)
+    try:
+        while not stop.is_set():
+            with app.app_context():
+                try:
+                    totals = deliver_outbox(mailer)
+                    if any(totals.values()):
+                        log.info("outbox: %s enviados, %s reprogramados, %s fallidos", *totals.values())
+                except Exception:
+                    db.session.rollback()
+                    log.exception("outbox worker falló")
+                finally:
+                    db.session.remove()
+            stop.wait(interval)
+    finally:
+        mailer.close()
+
+
+def start_outbox_worker(app) -> threading.Thread:
+    # Hilo en proceso (opcional). En producción se recomienda `flask outbox-send --loop`.
+    interval = app.config["OUTBOX_WORKER_INTERVAL_SECONDS"]
+    thread = threading.Thread(
+        target=run_outbox_worker,
+        args=(app, interval),
+        name="outbox-worker",
+        daemon=True,
+    )
+    thread.start()
+    return thread
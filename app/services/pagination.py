@@ -0,0 +1,108 @@
+# app/services/pagination.py
+#
+# Paginación keyset (seek) para listados del admin: en vez de OFFSET, cada página
+# arranca después de la última fila vista, comparando (created_at, id) contra un
+# índice que termina en esas columnas. El costo por página es constante sin
+# importar qué tan "profunda" sea.
+#
+# Los totales no se cuentan exacto en cada página: COUNT acotado (COUNT_CAP) y
+# cacheado unos segundos por combinación de filtros.
+
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, select, tuple_
+
+from app.cache import MemoryCache
+from app.extensions import db
+
+COUNT_CAP = 10_000
+
+_count_cache = MemoryCache(max_entries=256)
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    # cursores opacos para ?after= / ?before= (None si no hay más en esa dirección)
+    next_cursor: str | None
+    prev_cursor: str | None
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str | None) -> tuple[datetime, int] | None:
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        # cursor manipulado o de otra versión: primera página
+        return None
+
+
+def keyset_page(stmt, created_col, id_col, after=None, before=None, per_page: int = 50, scalars: bool = False) -> KeysetPage:
+    """
+    stmt: select ya filtrado, sin ORDER BY ni LIMIT. Orden: más recientes primero.
+    scalars: True si stmt selecciona una entidad (select(Event)) y se quieren objetos.
+    """
+
+    def key(row):
+        return getattr(row, created_col.key), getattr(row, id_col.key)
+
+    def fetch(query):
+        result = db.session.execute(query)
+        return result.scalars().all() if scalars else result.all()
+
+    after = decode_cursor(after)
+    before = decode_cursor(before) if after is None else None
+
+    if before is not None:
+        # página anterior: se recorre hacia adelante y se invierte
+        rows = fetch(
+            stmt.where(tuple_(created_col, id_col) > tuple_(*before))
+            .order_by(created_col.asc(), id_col.asc())
+            .limit(per_page + 1)
+        )
+        has_more_before = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        has_more_after = True
+    else:
+        if after is not None:
+            stmt = stmt.where(tuple_(created_col, id_col) < tuple_(*after))
+        rows = fetch(stmt.order_by(created_col.desc(), id_col.desc()).limit(per_page + 1))
+        has_more_after = len(rows) > per_page
+        rows = rows[:per_page]
+        has_more_before = after is not None
+
+    return KeysetPage(
+        items=rows,
+        next_cursor=encode_cursor(*key(rows[-1])) if rows and has_more_after else None,
+        prev_cursor=encode_cursor(*key(rows[0])) if rows and has_more_before else None,
+    )
+
+
+def approximate_count(stmt, cache_key: str) -> tuple[int, bool]:
+    """
+    stmt: select liviano (p.ej. solo el id) con los mismos filtros del listado.
+    Cuenta sus filas hasta COUNT_CAP (LIMIT dentro de la subquery: el costo
+    no crece con la tabla) y cachea el resultado ADMIN_COUNT_CACHE_TTL segundos.
+    Devuelve (n, exacto); exacto=False significa "COUNT_CAP o más".
+    """
+    cached = _count_cache.get(cache_key)
+    if cached is not None:
+        return tuple(cached)
+
+    capped = stmt.limit(COUNT_CAP + 1).subquery()
+    n = db.session.scalar(select(func.count()).select_from(capped))
+    result = (min(n, COUNT_CAP), n <= COUNT_CAP)
+    _count_cache.set(cache_key, result, current_app.config["ADMIN_COUNT_CACHE_TTL"])
+    return result
@@ -0,0 +1,241 @@
+# app/services/reconcile.py
+#
+# Conciliación de pagos contra el gateway. Compras con tbk_token que nunca
+# recibieron (o no terminaron) su webpay_return:
+# - pending: el comprador pagó pero no volvió al sitio
+# - committing: webpay_return murió entre tx.commit y el commit de la base
+# - expired: el sweeper las expiró aunque Transbank las haya autorizado
+#
+# Se leen por lotes con keyset (created_at, id) sobre ix_purchases_status_created,
+# se consulta el estado de cada token en paralelo (pool de hilos acotado, el pool
+# HTTP del gateway se comparte) y se aplican las mismas transiciones que
+# webpay_return, pero en bloque: un UPDATE condicional por estado de origen,
+# contadores de cupos, rollups, inscripción PACKAGE y correos por lote.
+
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import select, tuple_, update
+
+from app.extensions import db
+from app.models import Purchase
+from app.services.enrollment import enroll_package_purchases
+from app.services.outbox import enqueue_purchase_confirmations
+from app.services.rollups import rollup_purchases
+from app.services.seats import shift_seats
+from app.services.waitlist import promote_waitlists
+from app.services.webpay import GatewayError, get_gateway
+
+log = logging.getLogger(__name__)
+
+RECONCILE_STATUSES = ("pending", "committing", "expired")
+
+# estados de Transbank sin cobro vigente
+GATEWAY_FAILED = ("FAILED", "REVERSED", "NULLIFIED")
+
+
+def _candidate_batches(batch_size: int, min_age_minutes: int, lookback_hours: int):
+    """Lotes de (id, status, tbk_token, total_amount, event_id), del más antiguo al más nuevo."""
+    now = datetime.now(timezone.utc)
+    stmt = select(
+        Purchase.id, Purchase.status, Purchase.tbk_token, Purchase.total_amount, Purchase.event_id,
+        Purchase.created_at,
+    ).where(
+        Purchase.status.in_(RECONCILE_STATUSES),
+        Purchase.tbk_token.is_not(None),
+        # más nuevas pueden estar en el formulario de Webpay o en su webpay_return
+        Purchase.created_at < now - timedelta(minutes=min_age_minutes),
+        # Transbank solo responde el estado de transacciones recientes
+        Purchase.created_at >= now - timedelta(hours=lookback_hours),
+    )
+
+    after = None
+    while True:
+        query = stmt
+        if after is not None:
+            query = query.where(tuple_(Purchase.created_at, Purchase.id) > tuple_(*after))
+        rows = db.session.execute(
+            query.order_by(Purchase.created_at, Purchase.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1].created_at, rows[-1].id)
+
+
+def _query_gateway(executor, gateway, tokens) -> dict:
+    """{token: respuesta | GatewayError}, consultando en paralelo."""
+
+    def status(token):
+        try:
+            return token, gateway.status(token)
+        except GatewayError as exc:
+            return token, exc
+
+    return dict(executor.map(status, tokens))
+
+
+def _transition(ids_by_status: dict, new_status: str, **values) -> dict:
+    """
+    Un UPDATE condicional por estado de origen: solo pasan las compras que siguen
+    en ese estado (un webpay_return concurrente gana). Devuelve {origen: [ids]}.
+    """
+    moved = {}
+    for old_status, ids in ids_by_status.items():
+        if not ids:
+            continue
+        moved[old_status] = db.session.scalars(
+            update(Purchase)
+            .where(Purchase.id.in_(ids), Purchase.status == old_status)
+            .values(status=new_status, **values)
+            .returning(Purchase.id),
+            execution_options={"synchronize_session": False},
+        ).all()
+    return moved
+
+
+def _apply(paid: dict, failed: dict, reverted: list, responses: dict) -> dict:
+    now = datetime.now(timezone.utc)
+    counts = {"paid": 0, "failed": 0, "reverted": 0, "recovered_expired": 0}
+
+    paid = _transition(paid, "paid", paid_at=now)
+    paid_ids = [purchase_id for ids in paid.values() for purchase_id in ids]
+    for old_status, ids in paid.items():
+        shift_seats(ids, old_status, "paid")
+        rollup_purchases(ids, "paid", previous_status=old_status)
+    # misma regla que webpay_return (PACKAGE: todas las sesiones), para el lote completo
+    enroll_package_purchases(paid_ids)
+    enqueue_purchase_confirmations(paid_ids)
+    counts["paid"] = len(paid_ids)
+    counts["recovered_expired"] = len(paid.get("expired", ()))
+
+    failed = _transition(failed, "failed")
+    failed_ids = [purchase_id for ids in failed.values() for purchase_id in ids]
+    for old_status, ids in failed.items():
+        shift_seats(ids, old_status, "failed")
+        rollup_purchases(ids, "failed", previous_status=old_status)
+    counts["failed"] = len(failed_ids)
+
+    # la respuesta del gateway queda guardada, como en webpay_return (UPDATE por PK en lote)
+    if paid_ids or failed_ids:
+        db.session.execute(
+            update(Purchase),
+            [
+                {"id": purchase_id, "commit_response": json.dumps(responses[purchase_id])}
+                for purchase_id in paid_ids + failed_ids
+            ],
+        )
+
+    if failed_ids:
+        # los cupos liberados pasan a la lista de espera en la misma transacción
+        event_ids = db.session.scalars(
+            select(Purchase.event_id).where(Purchase.id.in_(failed_ids)).distinct()
+        ).all()
+        promote_waitlists(event_ids)
+
+    if reverted:
+        # el commit nunca llegó a Transbank: vuelve a pending (reintentable / expira)
+        counts["reverted"] = db.session.execute(
+            update(Purchase)
+            .where(Purchase.id.in_(reverted), Purchase.status == "committing")
+            .values(status="pending"),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+
+    return counts
+
+
+def reconcile_payments(
+    batch_size: int | None = None,
+    concurrency: int | None = None,
+    min_age_minutes: int | None = None,
+    lookback_hours: int | None = None,
+    dry_run: bool = False,
+    gateway=None,
+) -> dict:
+    """
+    Concilia las compras con token sin resultado final contra el estado del gateway.
+    Un commit por lote. dry_run: consulta y clasifica, sin escribir.
+    Devuelve los conteos y el throughput de consultas al gateway.
+    """
+    config = current_app.config
+    batch_size = batch_size or config["RECONCILE_BATCH_SIZE"]
+    concurrency = concurrency or config["RECONCILE_CONCURRENCY"]
+    min_age_minutes = config["RECONCILE_MIN_AGE_MINUTES"] if min_age_minutes is None else min_age_minutes
+    lookback_hours = lookback_hours or config["RECONCILE_LOOKBACK_HOURS"]
+    gateway = gateway or get_gateway()
+
+    report = {
+        "scanned": 0, "paid": 0, "failed": 0, "reverted": 0, "recovered_expired": 0,
+        "unchanged": 0, "errors": 0, "mismatched": 0,
+    }
+    started = time.perf_counter()
+    gateway_seconds = 0.0
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="reconcile") as executor:
+        for rows in _candidate_batches(batch_size, min_age_minutes, lookback_hours):
+            report["scanned"] += len(rows)
+            # sin transacción abierta mientras se espera al gateway
+            db.session.rollback()
+
+            t0 = time.perf_counter()
+            by_token = _query_gateway(executor, gateway, [row.tbk_token for row in rows])
+            gateway_seconds += time.perf_counter() - t0
+
+            paid = {status: [] for status in RECONCILE_STATUSES}
+            failed = {"pending": [], "committing": []}
+            reverted, responses = [], {}
+            for row in rows:
+                resp = by_token[row.tbk_token]
+                if isinstance(resp, GatewayError):
+                    report["errors"] += 1
+                    log.warning("conciliación: compra %s: %s", row.id, resp)
+                    continue
+
+                gateway_status = (resp.get("status") or "").upper()
+                if gateway_status == "AUTHORIZED":
+                    if resp.get("amount") is not None and int(resp["amount"]) != row.total_amount:
+                        # no se da por pagada una compra con otro monto: revisión manual
+                        report["mismatched"] += 1
+                        log.error(
+                            "conciliación: compra %s autorizada por %s (esperado %s)",
+                            row.id, resp["amount"], row.total_amount,
+                        )
+                        continue
+                    paid[row.status].append(row.id)
+                elif gateway_status in GATEWAY_FAILED and row.status in failed:
+                    failed[row.status].append(row.id)
+                elif gateway_status == "INITIALIZED" and row.status == "committing":
+                    reverted.append(row.id)
+                else:
+                    # sin pagar todavía (pending: lo expira el sweeper) o ya sin cupo (expired)
+                    report["unchanged"] += 1
+                    continue
+                responses[row.id] = resp
+
+            if dry_run:
+                report["paid"] += sum(len(ids) for ids in paid.values())
+                report["recovered_expired"] += len(paid["expired"])
+                report["failed"] += sum(len(ids) for ids in failed.values())
+                report["reverted"] += len(reverted)
+                continue
+
+            for key, n in _apply(paid, failed, reverted, responses).items():
+                report[key] += n
+            db.session.commit()
+
+    if report["recovered_expired"]:
+        # sus cupos se habían liberado: puede haber sobrecupo que revisar a mano
+        log.warning("conciliación: %s compras expiradas estaban pagadas", report["recovered_expired"])
+
+    elapsed = time.perf_counter() - started
+    report["elapsed_s"] = round(elapsed, 3)
+    report["gateway_s"] = round(gateway_seconds, 3)
+    report["purchases_per_s"] = round(report["scanned"] / elapsed, 1) if elapsed else 0
+    return report
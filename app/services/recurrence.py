@@ -0,0 +1,99 @@
+# app/services/recurrence.py
+
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import insert, select
+
+from app.extensions import db
+from app.models import Occurrence
+
+# tope de sesiones por regla (evita reglas "until" mal escritas que generen años)
+MAX_OCCURRENCES = 200
+
+WEEKDAYS = [
+    (0, "Lunes"),
+    (1, "Martes"),
+    (2, "Miércoles"),
+    (3, "Jueves"),
+    (4, "Viernes"),
+    (5, "Sábado"),
+    (6, "Domingo"),
+]
+
+
+def expand_recurrence(
+    start_date: date,
+    weekdays: list[int],
+    start_time: time,
+    end_time: time,
+    interval_weeks: int = 1,
+    count: int | None = None,
+    until: date | None = None,
+    excluded: set[date] | None = None,
+) -> list[tuple[datetime, datetime]]:
+    """
+    Expande una regla semanal/quincenal a pares (inicio, fin).
+    - Las semanas se cuentan desde la semana (lunes) de start_date.
+    - Las fechas excluidas se saltan y NO consumen el count.
+    - Se detiene en count, en until (inclusive) o en MAX_OCCURRENCES.
+    """
+    excluded = excluded or set()
+    weekdays = sorted(set(weekdays))
+    if not weekdays:
+        return []
+
+    week0 = start_date - timedelta(days=start_date.weekday())
+    limit = min(count or MAX_OCCURRENCES, MAX_OCCURRENCES)
+    last_day = until or start_date + timedelta(weeks=MAX_OCCURRENCES * interval_weeks)
+
+    result = []
+    day = start_date
+    while len(result) < limit and day <= last_day:
+        week_index = (day - week0).days // 7
+        if week_index % interval_weeks == 0 and day.weekday() in weekdays and day not in excluded:
+            result.append((datetime.combine(day, start_time), datetime.combine(day, end_time)))
+        day += timedelta(days=1)
+
+    return result
+
+
+def existing_starts(event_id: int, starts: list[datetime]) -> set[datetime]:
+    # una sola query contra uq_event_start para todas las fechas generadas
+    if not starts:
+        return set()
+    rows = db.session.scalars(
+        select(Occurrence.start_dt).where(
+            Occurrence.event_id == event_id,
+            Occurrence.start_dt.in_(starts),
+        )
+    )
+    return {dt.replace(tzinfo=None) for dt in rows}
+
+
+def bulk_create_occurrences(
+    event_id: int,
+    slots: list[tuple[datetime, datetime]],
+    capacity_override: int | None = None,
+    price_override: int | None = None,
+) -> list[int]:
+    """
+    Inserta todas las sesiones en un solo INSERT (executemany con RETURNING).
+    Quien llama hace commit. Devuelve los ids creados.
+    """
+    if not slots:
+        return []
+
+    return db.session.scalars(
+        insert(Occurrence).returning(Occurrence.id),
+        [
+            {
+                "event_id": event_id,
+                "start_dt": start_dt,
+                "end_dt": end_dt,
+                "capacity_override": capacity_override,
+                "price_override": price_override,
+                "status": "scheduled",
+            }
+            for start_dt, end_dt in slots
+        ],
+    ).all()
@@ -0,0 +1,245 @@
+# app/services/rollups.py
+#
+# Mantiene sales_daily (SalesRollup) en la misma transacción que cada cambio de
+# estado de Purchase: checkout (created), webpay_return (paid / failed) y el
+# sweeper (expired). Cada ajuste es un UPSERT con incremento (col = col + n), así
+# requests concurrentes sobre el mismo (evento, día) no se pisan. En motores sin
+# ON CONFLICT (ni SQLite ni PostgreSQL) se hace UPDATE incremental y, si la fila
+# no existe, INSERT en un savepoint.
+
+from datetime import date
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import Event, Occurrence, Purchase, PurchaseParticipant, SalesRollup
+
+COUNTERS = (
+    "purchases_created",
+    "purchases_paid",
+    "purchases_failed",
+    "purchases_expired",
+    "revenue",
+    "seats_sold",
+)
+
+# columna que suma 1 al pasar a cada estado
+STATUS_COUNTERS = {
+    "pending": "purchases_created",
+    "paid": "purchases_paid",
+    "failed": "purchases_failed",
+    "expired": "purchases_expired",
+}
+
+
+def _dialect_insert():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+def _upsert_stmt(dialect_insert):
+    table = SalesRollup.__table__
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.event_id, table.c.day],
+        set_={name: table.c[name] + stmt.excluded[name] for name in COUNTERS},
+    )
+
+
+def add_to_rollup(deltas) -> None:
+    """
+    deltas: iterable de dicts {event_id, day, <contador>: n, ...}. Un solo
+    executemany; los contadores que falten van en 0.
+    """
+    rows = [{name: 0 for name in COUNTERS} | delta for delta in deltas]
+    if not rows:
+        return
+    dialect_insert = _dialect_insert()
+    if dialect_insert is None:
+        _add_rows_portable(rows)
+    else:
+        db.session.execute(_upsert_stmt(dialect_insert), rows)
+
+
+def _add_rows_portable(rows) -> None:
+    table = SalesRollup.__table__
+    for row in rows:
+        increment = (
+            update(table)
+            .where(table.c.event_id == row["event_id"], table.c.day == row["day"])
+            .values({name: table.c[name] + row[name] for name in COUNTERS})
+        )
+        if db.session.execute(increment).rowcount:
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table).values(row))
+        except IntegrityError:
+            # otro request creó la fila entre el UPDATE y el INSERT: ahora sí existe
+            db.session.execute(increment)
+
+
+def rollup_delta(event_id: int, created_at, status: str, amount: int = 0, seats: int = 0) -> dict:
+    delta = {"event_id": event_id, "day": created_at.date()}
+    column = STATUS_COUNTERS.get(status)
+    if column:
+        delta[column] = 1
+    if status == "paid":
+        delta["revenue"] = amount
+        delta["seats_sold"] = seats
+    return delta
+
+
+def rollup_purchases(purchase_ids, status: str, previous_status: str | None = None) -> None:
+    """
+    Suma al rollup las compras que acaban de pasar a `status` (p.ej. un lote del
+    sweeper): una query agrupada por (evento, día) + un UPSERT. Si venían de un
+    estado final ya contado (p.ej. expired -> paid al conciliar), `previous_status`
+    lo descuenta. Para paid suma también recaudación y participantes; paid ->
+    cancelled (sin contador propio) los resta.
+    """
+    purchase_ids = list(purchase_ids)
+    column = STATUS_COUNTERS.get(status)
+    # pending cuenta en purchases_created, que no se descuenta al cambiar de estado
+    previous = STATUS_COUNTERS.get(previous_status) if previous_status != "pending" else None
+    if not purchase_ids or (column is None and previous is None):
+        return
+
+    # recaudación y participantes: suman al pagar, se restan si una pagada sale de paid
+    sign = 1 if status == "paid" else -1 if previous_status == "paid" else 0
+    day = func.date(Purchase.created_at)
+    columns = [Purchase.event_id, day, func.count(Purchase.id)]
+    if sign:
+        participants = (
+            select(PurchaseParticipant.purchase_id, func.count(PurchaseParticipant.id).label("n"))
+            .where(PurchaseParticipant.purchase_id.in_(purchase_ids))
+            .group_by(PurchaseParticipant.purchase_id)
+            .subquery()
+        )
+        columns += [func.sum(Purchase.total_amount), func.sum(func.coalesce(participants.c.n, 0))]
+    query = select(*columns).where(Purchase.id.in_(purchase_ids)).group_by(Purchase.event_id, day)
+    if sign:
+        query = query.outerjoin(participants, participants.c.purchase_id == Purchase.id)
+
+    deltas = []
+    for event_id, d, n, *paid in db.session.execute(query):
+        delta = {"event_id": event_id, "day": _as_date(d)}
+        if column:
+            delta[column] = n
+        if previous:
+            delta[previous] = -n
+        if paid:
+            delta["revenue"], delta["seats_sold"] = sign * int(paid[0] or 0), sign * int(paid[1] or 0)
+        deltas.append(delta)
+    add_to_rollup(deltas)
+
+
+def _as_date(value):
+    # func.date() devuelve texto en SQLite y date en PostgreSQL
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def rebuild_rollups() -> int:
+    """
+    Recalcula sales_daily completo desde purchases (DELETE + INSERT ... SELECT
+    agrupado). Quien llama hace el commit. Devuelve cuántas filas quedaron.
+    """
+    participants = (
+        select(PurchaseParticipant.purchase_id, func.count(PurchaseParticipant.id).label("n"))
+        .group_by(PurchaseParticipant.purchase_id)
+        .subquery()
+    )
+    day = func.date(Purchase.created_at)
+    paid = Purchase.status == "paid"
+
+    def count_if(condition):
+        return func.sum(case((condition, 1), else_=0))
+
+    query = (
+        select(
+            Purchase.event_id,
+            day,
+            func.count(Purchase.id),
+            count_if(paid),
+            count_if(Purchase.status == "failed"),
+            count_if(Purchase.status == "expired"),
+            func.sum(case((paid, Purchase.total_amount), else_=0)),
+            func.sum(case((paid, func.coalesce(participants.c.n, 0)), else_=0)),
+        )
+        .outerjoin(participants, participants.c.purchase_id == Purchase.id)
+        .group_by(Purchase.event_id, day)
+    )
+
+    db.session.execute(delete(SalesRollup))
+    db.session.execute(
+        insert(SalesRollup).from_select(["event_id", "day", *COUNTERS], query)
+    )
+    return db.session.scalar(select(func.count()).select_from(SalesRollup))
+
+
+def _ratio(part, whole):
+    return round(part / whole, 3) if whole else None
+
+
+def sales_dashboard(since: date, top_events: int = 20) -> dict:
+    """
+    Lee solo agregados: sales_daily (ventana desde `since`) y los contadores
+    materializados de las sesiones para la ocupación. Tres queries chicas, sin
+    importar cuántas compras haya.
+    """
+    sums = [func.coalesce(func.sum(getattr(SalesRollup, name)), 0).label(name) for name in COUNTERS]
+
+    by_day = db.session.execute(
+        select(SalesRollup.day, *sums)
+        .where(SalesRollup.day >= since)
+        .group_by(SalesRollup.day)
+        .order_by(SalesRollup.day)
+    ).all()
+
+    by_event = db.session.execute(
+        select(SalesRollup.event_id, Event.title, *sums)
+        .join(Event, Event.id == SalesRollup.event_id)
+        .where(SalesRollup.day >= since)
+        .group_by(SalesRollup.event_id, Event.title)
+        .order_by(func.sum(SalesRollup.revenue).desc(), SalesRollup.event_id)
+        .limit(top_events)
+    ).all()
+
+    # ocupación = asientos-sesión pagados / capacidad de las sesiones scheduled
+    capacity = func.coalesce(Occurrence.capacity_override, Event.capacity_default)
+    fill = {
+        event_id: _ratio(paid, cap)
+        for event_id, paid, cap in db.session.execute(
+            select(Occurrence.event_id, func.sum(Occurrence.seats_paid), func.sum(capacity))
+            .join(Event, Event.id == Occurrence.event_id)
+            .where(Occurrence.event_id.in_([row.event_id for row in by_event]), Occurrence.status == "scheduled")
+            .group_by(Occurrence.event_id)
+        )
+    } if by_event else {}
+
+    totals = {name: sum(getattr(row, name) for row in by_day) for name in COUNTERS}
+    totals["conversion"] = _ratio(totals["purchases_paid"], totals["purchases_created"])
+
+    return {
+        "totals": totals,
+        "days": [
+            {"day": row.day, **{name: getattr(row, name) for name in COUNTERS},
+             "conversion": _ratio(row.purchases_paid, row.purchases_created)}
+            for row in by_day
+        ],
+        "events": [
+            {"event_id": row.event_id, "title": row.title, **{name: getattr(row, name) for name in COUNTERS},
+             "conversion": _ratio(row.purchases_paid, row.purchases_created),
+             "fill_rate": fill.get(row.event_id)}
+            for row in by_event
+        ],
+    }
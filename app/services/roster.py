@@ -0,0 +1,134 @@
+# app/services/roster.py
+#
+# Nóminas de participantes por evento / sesión para exportar.
+# Se recorren con yield_per (cursor del lado del servidor en PostgreSQL, lectura
+# incremental en SQLite) y se escriben fila a fila: la memoria no crece con el
+# tamaño del evento y la respuesta empieza apenas llega la primera fila.
+
+import csv
+import io
+import tempfile
+
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import Occurrence, Purchase, PurchaseParticipant
+from app.models.purchase_occurrence import purchase_occurrences
+
+ROSTER_HEADER = (
+    "Sesión",
+    "Sesión ID",
+    "Compra ID",
+    "Estado",
+    "Comprador",
+    "Email",
+    "Teléfono",
+    "Participante",
+    "Edad",
+    "Pagado el",
+)
+
+ROSTER_STATUSES = ("paid",)
+# con pending: incluye compras en proceso de pago (útil para prever asistencia)
+ROSTER_STATUSES_WITH_PENDING = ("paid", "committing", "pending")
+
+STREAM_BATCH = 1000
+
+
+def roster_query(event_id: int, occurrence_id: int | None = None, statuses=ROSTER_STATUSES):
+    stmt = (
+        select(
+            Occurrence.start_dt,
+            Occurrence.id,
+            Purchase.id,
+            Purchase.status,
+            Purchase.buyer_name,
+            Purchase.buyer_email,
+            Purchase.buyer_phone,
+            PurchaseParticipant.name,
+            PurchaseParticipant.age,
+            Purchase.paid_at,
+        )
+        .select_from(purchase_occurrences)
+        .join(Occurrence, Occurrence.id == purchase_occurrences.c.occurrence_id)
+        .join(Purchase, Purchase.id == purchase_occurrences.c.purchase_id)
+        .join(PurchaseParticipant, PurchaseParticipant.purchase_id == Purchase.id)
+        .where(Occurrence.event_id == event_id, Purchase.status.in_(statuses))
+        .order_by(Occurrence.start_dt, Occurrence.id, Purchase.id, PurchaseParticipant.id)
+    )
+    if occurrence_id is not None:
+        stmt = stmt.where(purchase_occurrences.c.occurrence_id == occurrence_id)
+    return stmt
+
+
+def iter_roster(stmt, batch: int = STREAM_BATCH):
+    # filas Core (tuplas), sin objetos ORM en el identity map
+    result = db.session.execute(stmt.execution_options(yield_per=batch))
+    for row in result:
+        start_dt, occurrence_id, purchase_id, status, buyer, email, phone, name, age, paid_at = row
+        yield (
+            start_dt.strftime("%d-%m-%Y %H:%M"),
+            occurrence_id,
+            purchase_id,
+            status,
+            buyer,
+            email,
+            phone,
+            name,
+            age,
+            paid_at.strftime("%d-%m-%Y %H:%M") if paid_at else "",
+        )
+
+
+def stream_csv(rows, flush_every: int = 500):
+    """Genera el CSV en trozos (BOM UTF-8 para que Excel respete los acentos)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write("\ufeff")
+    writer.writerow(ROSTER_HEADER)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= flush_every:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if pending:
+        yield buffer.getvalue()
+
+
+def xlsx_available() -> bool:
+    try:
+        import openpyxl  # noqa: F401  dependencia opcional
+    except ImportError:
+        return False
+    return True
+
+
+def stream_xlsx(rows, title: str = "Participantes", chunk_size: int = 64 * 1024):
+    """
+    XLSX es un zip: no se puede emitir antes de cerrarlo. openpyxl en modo
+    write_only vuelca las filas a disco a medida que llegan (memoria plana) y el
+    archivo terminado se envía por trozos desde un temporal.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    sheet.append(ROSTER_HEADER)
+    for row in rows:
+        sheet.append(row)
+
+    with tempfile.TemporaryFile() as fh:
+        workbook.save(fh)
+        fh.seek(0)
+        while chunk := fh.read(chunk_size):
+            yield chunk
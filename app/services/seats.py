@@ -0,0 +1,281 @@
+# app/services/seats.py
+
+from sqlalchemy import func, or_, select, text, update
+
+from app.extensions import db
+from app.models import Event, Occurrence, Purchase, PurchaseParticipant, WaitlistEntry
+from app.models.purchase_occurrence import purchase_occurrences
+
+
+# Qué contador materializado corresponde a cada estado de Purchase.
+# Los demás estados (failed | expired | cancelled) no ocupan cupo.
+LEDGER_COLUMNS = {
+    "pending": "seats_reserved",
+    "committing": "seats_reserved",
+    "paid": "seats_paid",
+}
+
+
+def _event_participants(purchase_ids) -> dict[int, int]:
+    rows = db.session.execute(
+        select(Purchase.event_id, func.count(PurchaseParticipant.id))
+        .join(PurchaseParticipant, PurchaseParticipant.purchase_id == Purchase.id)
+        .where(Purchase.id.in_(purchase_ids))
+        .group_by(Purchase.event_id)
+    )
+    return {event_id: n for event_id, n in rows}
+
+
+def _occurrence_participants(purchase_ids) -> dict[int, int]:
+    rows = db.session.execute(
+        select(purchase_occurrences.c.occurrence_id, func.count(PurchaseParticipant.id))
+        .select_from(purchase_occurrences)
+        .join(
+            PurchaseParticipant,
+            PurchaseParticipant.purchase_id == purchase_occurrences.c.purchase_id,
+        )
+        .where(purchase_occurrences.c.purchase_id.in_(purchase_ids))
+        .group_by(purchase_occurrences.c.occurrence_id)
+    )
+    return {occurrence_id: n for occurrence_id, n in rows}
+
+
+def _bump(model, row_ids_to_n: dict[int, int], old_column: str | None, new_column: str | None) -> None:
+    # UPDATE atómico (col = col ± n): no depende de lo que haya en memoria.
+    # Un solo UPDATE por cada n distinto (p.ej. todas las sesiones de un pack).
+    ids_by_n: dict[int, list[int]] = {}
+    for row_id, n in row_ids_to_n.items():
+        if n:
+            ids_by_n.setdefault(n, []).append(row_id)
+
+    for n, row_ids in ids_by_n.items():
+        values = {}
+        if old_column:
+            values[old_column] = getattr(model, old_column) - n
+        if new_column:
+            values[new_column] = getattr(model, new_column) + n
+        if values:
+            db.session.execute(
+                update(model).where(model.id.in_(row_ids)).values(**values),
+                execution_options={"synchronize_session": False},
+            )
+
+
+def shift_seats(purchase_ids, old_status: str | None, new_status: str | None) -> None:
+    """
+    Mueve los participantes de esas compras entre contadores, en la misma
+    transacción que el cambio de estado (quien llama hace el commit):
+    - None -> pending: reserva (checkout)
+    - pending -> paid: confirma (webpay_return)
+    - pending -> None/failed/expired: libera
+    Aplica al Event y a las Occurrences ya enlazadas en purchase_occurrences.
+    """
+    purchase_ids = list(purchase_ids)
+    old_column = LEDGER_COLUMNS.get(old_status)
+    new_column = LEDGER_COLUMNS.get(new_status)
+    if not purchase_ids or old_column == new_column:
+        return
+
+    _bump(Event, _event_participants(purchase_ids), old_column, new_column)
+    _bump(Occurrence, _occurrence_participants(purchase_ids), old_column, new_column)
+
+
+def _set_lock_timeout(lock_timeout_ms: int | None) -> None:
+    # Bajo carga preferimos fallar rápido (409) antes que encolar requests esperando el lock.
+    # Solo PostgreSQL: SET LOCAL muere con la transacción. En SQLite el PRAGMA busy_timeout
+    # quedaría pegado a la conexión del pool para todos los requests siguientes; ahí
+    # manda SQLITE_BUSY_TIMEOUT_MS, que app/database.py fija en cada conexión.
+    if not lock_timeout_ms:
+        return
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+
+
+def reserve_event_seats(
+    event_id: int,
+    n: int,
+    capacity: int | None,
+    lock_timeout_ms: int | None = None,
+    released=None,
+) -> bool:
+    """
+    Reserva n cupos del evento con un UPDATE condicional: el chequeo de cupo y el
+    incremento ocurren en la misma sentencia, así dos checkouts simultáneos no
+    pueden vender el mismo cupo (en PostgreSQL el row lock dura solo hasta el commit
+    de la compra; en SQLite el UPDATE toma el lock de escritura de la base).
+
+    released: expresión SQL opcional con cupos que el contador aún incluye pero ya no
+    cuentan (pending u ofertas de lista de espera vencidos que el sweeper no ha
+    expirado); se evalúa en la misma sentencia.
+
+    Devuelve False si no alcanza el cupo. Si el lock no se obtiene dentro de
+    lock_timeout_ms, el driver lanza OperationalError (quien llama responde 409).
+    """
+    _set_lock_timeout(lock_timeout_ms)
+
+    stmt = (
+        update(Event)
+        .where(Event.id == event_id)
+        .values(seats_reserved=Event.seats_reserved + n)
+    )
+    if capacity is not None:
+        used = Event.seats_reserved + Event.seats_paid
+        if released is not None:
+            used = used - released
+        stmt = stmt.where(used + n <= capacity)
+
+    result = db.session.execute(stmt, execution_options={"synchronize_session": False})
+    return result.rowcount == 1
+
+
+def reserve_occurrence_seats(
+    event_id: int,
+    occurrence_ids,
+    n: int,
+    event_capacity: int | None,
+    lock_timeout_ms: int | None = None,
+    released=None,
+) -> bool:
+    """
+    PER_OCCURRENCE: reserva n cupos en TODAS las sesiones elegidas con un solo UPDATE
+    condicional (set-based). Si alguna no tiene cupo (o no está scheduled) el UPDATE
+    toca menos filas que las pedidas y se devuelve False: quien llama hace rollback,
+    así la reserva es todo o nada.
+
+    released: expresión correlacionada con Occurrence.id (pending y ofertas vencidos por sesión).
+    """
+    occurrence_ids = sorted(set(occurrence_ids))
+    if not occurrence_ids:
+        return False
+
+    _set_lock_timeout(lock_timeout_ms)
+
+    capacity = func.coalesce(Occurrence.capacity_override, event_capacity)
+    used = Occurrence.seats_reserved + Occurrence.seats_paid
+    if released is not None:
+        used = used - released
+
+    result = db.session.execute(
+        update(Occurrence)
+        .where(
+            Occurrence.id.in_(occurrence_ids),
+            Occurrence.event_id == event_id,
+            Occurrence.status == "scheduled",
+            or_(capacity.is_(None), used + n <= capacity),
+        )
+        .values(seats_reserved=Occurrence.seats_reserved + n),
+        execution_options={"synchronize_session": False},
+    )
+    if result.rowcount != len(occurrence_ids):
+        return False
+
+    # el contador del evento cuenta participantes (no participantes x sesión)
+    _bump(Event, {event_id: n}, None, "seats_reserved")
+    return True
+
+
+ENROLLMENT_CHUNK = 10_000
+
+
+def add_enrollment_seats(links, status: str, participants: dict[int, int] | None = None) -> None:
+    """
+    Suma al contador de cada sesión los participantes de las compras recién
+    enlazadas: links = [(purchase_id, occurrence_id), ...] (p.ej. el RETURNING del
+    INSERT en purchase_occurrences). participants: {purchase_id: n} si quien llama
+    ya lo sabe; si no, una query agrupada. Un UPDATE por cada total distinto.
+    """
+    column = LEDGER_COLUMNS.get(status)
+    links = list(links)
+    if column is None or not links:
+        return
+
+    if participants is None:
+        purchase_ids = sorted({purchase_id for purchase_id, _ in links})
+        participants = {}
+        # por tramos: SQLite limita los parámetros por sentencia
+        for i in range(0, len(purchase_ids), ENROLLMENT_CHUNK):
+            participants.update(
+                db.session.execute(
+                    select(PurchaseParticipant.purchase_id, func.count(PurchaseParticipant.id))
+                    .where(PurchaseParticipant.purchase_id.in_(purchase_ids[i:i + ENROLLMENT_CHUNK]))
+                    .group_by(PurchaseParticipant.purchase_id)
+                ).all()
+            )
+
+    per_occurrence: dict[int, int] = {}
+    for purchase_id, occurrence_id in links:
+        per_occurrence[occurrence_id] = per_occurrence.get(occurrence_id, 0) + participants.get(purchase_id, 0)
+    _bump(Occurrence, per_occurrence, None, column)
+
+
+def release_held_seats(event_seats: dict[int, int], occurrence_seats: dict[int, int]) -> None:
+    # Cupos retenidos fuera de una compra (ofertas de lista de espera que vencen)
+    _bump(Event, event_seats, "seats_reserved", None)
+    _bump(Occurrence, occurrence_seats, "seats_reserved", None)
+
+
+def _actual_counts(group_column, select_from, join_on) -> dict[int, dict[str, int]]:
+    rows = db.session.execute(
+        select(group_column, Purchase.status, func.count(PurchaseParticipant.id))
+        .select_from(select_from)
+        .join(PurchaseParticipant, join_on)
+        .where(Purchase.status.in_(tuple(LEDGER_COLUMNS)))
+        .group_by(group_column, Purchase.status)
+    )
+    actual: dict[int, dict[str, int]] = {}
+    for row_id, status, n in rows:
+        actual.setdefault(row_id, {})[LEDGER_COLUMNS[status]] = n
+    return actual
+
+
+def rebuild_seat_ledger(apply: bool = True) -> list[tuple[str, int, str, int, int]]:
+    """
+    Recalcula los contadores desde cero (purchases + participants + ofertas de
+    lista de espera vigentes) y devuelve
+    la lista de diferencias (tabla, id, columna, guardado, real).
+    Si apply=True deja los contadores corregidos en la sesión (quien llama hace el commit).
+    """
+    events_actual = _actual_counts(
+        Purchase.event_id,
+        Purchase,
+        PurchaseParticipant.purchase_id == Purchase.id,
+    )
+    occurrences_actual = _actual_counts(
+        purchase_occurrences.c.occurrence_id,
+        purchase_occurrences.join(Purchase, purchase_occurrences.c.purchase_id == Purchase.id),
+        PurchaseParticipant.purchase_id == Purchase.id,
+    )
+
+    # ofertas vigentes de lista de espera: retienen cupo en seats_reserved sin compra
+    holds = db.session.execute(
+        select(WaitlistEntry.event_id, WaitlistEntry.occurrence_id, func.sum(WaitlistEntry.participant_count))
+        .where(WaitlistEntry.status == "offered")
+        .group_by(WaitlistEntry.event_id, WaitlistEntry.occurrence_id)
+    )
+    for event_id, occurrence_id, n in holds:
+        for actual, row_id in ((events_actual, event_id), (occurrences_actual, occurrence_id)):
+            if row_id is not None:
+                counts = actual.setdefault(row_id, {})
+                counts["seats_reserved"] = counts.get("seats_reserved", 0) + n
+
+    drift = []
+    for model, actual in ((Event, events_actual), (Occurrence, occurrences_actual)):
+        fixes = []
+        stored_rows = db.session.execute(
+            select(model.id, model.seats_reserved, model.seats_paid)
+        )
+        for row_id, reserved, paid in stored_rows:
+            expected = actual.get(row_id, {})
+            fix = {}
+            for column, stored in (("seats_reserved", reserved), ("seats_paid", paid)):
+                real = expected.get(column, 0)
+                if stored != real:
+                    drift.append((model.__tablename__, row_id, column, stored, real))
+                    fix[column] = real
+            if fix:
+                fixes.append({"id": row_id, **fix})
+
+        if apply and fixes:
+            db.session.execute(update(model), fixes)
+
+    return drift
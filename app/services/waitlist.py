@@ -0,0 +1,282 @@
+# app/services/waitlist.py
+#
+# Lista de espera por evento (PACKAGE) o por sesión (PER_OCCURRENCE).
+#
+# Cuando se liberan cupos (pending que expiran, pagos rechazados, ofertas que
+# vencen) se ofrecen a las entradas waiting en orden de llegada. La oferta
+# retiene los cupos con el mismo UPDATE condicional del checkout (quedan en
+# seats_reserved, como un pending) durante WAITLIST_OFFER_MINUTES; al tomarla,
+# el pending creado hereda esos cupos sin volver a reservar. Cada oferta encola un
+# correo con el enlace para tomarla (outbox, misma transacción). Una oferta vencida
+# deja de retener al leer (released_seats_expr), aunque el sweeper no haya
+# corrido; expire_waitlist_offers solo ajusta contadores y ofrece al siguiente.
+#
+# La cola se lee por ix_waitlist_queue (evento, sesión, estado, id): cada
+# promoción lee a lo sumo tantas entradas como cupos libres, sin escanear la lista.
+
+import logging
+import secrets
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import func, select, update
+
+from app.extensions import db
+from app.models import Event, Occurrence, WaitlistEntry
+from app.services.expiry import released_occurrence_seats_expr, released_seats_expr
+from app.services.outbox import enqueue_waitlist_offers
+from app.services.seats import release_held_seats, reserve_event_seats, reserve_occurrence_seats
+
+log = logging.getLogger(__name__)
+
+# tope de ofertas por pasada cuando la cola no tiene cupo (sesión sin capacidad definida)
+UNLIMITED_BATCH = 100
+
+
+def join_waitlist(
+    event_id: int,
+    occurrence_id: int | None,
+    buyer_name: str,
+    buyer_email: str,
+    buyer_phone: str,
+    participant_count: int,
+) -> WaitlistEntry:
+    """
+    Agrega una entrada al final de la cola e intenta promover de inmediato (si se
+    liberó cupo sin que nadie reintentara, la oferta sale en el mismo request).
+    Quien llama hace el commit.
+    """
+    entry = WaitlistEntry(
+        event_id=event_id,
+        occurrence_id=occurrence_id,
+        buyer_name=buyer_name,
+        buyer_email=buyer_email,
+        buyer_phone=buyer_phone,
+        participant_count=participant_count,
+        status="waiting",
+        token=secrets.token_urlsafe(24),
+    )
+    db.session.add(entry)
+    db.session.flush()
+
+    promote_queue(event_id, occurrence_id)
+    return entry
+
+
+def _free_seats(event_id: int, occurrence_id: int | None) -> tuple[bool, int | None, int]:
+    """
+    (abierta, capacidad para el UPDATE condicional, cupos libres) de la cola.
+    Misma cuenta que el checkout: contadores - pending y ofertas vencidos.
+    """
+    if occurrence_id is not None:
+        row = db.session.execute(
+            select(
+                Event.capacity_default,
+                func.coalesce(Occurrence.capacity_override, Event.capacity_default),
+                Occurrence.seats_reserved
+                + Occurrence.seats_paid
+                - released_occurrence_seats_expr(),
+            )
+            .join(Event, Event.id == Occurrence.event_id)
+            .where(
+                Occurrence.id == occurrence_id,
+                Occurrence.event_id == event_id,
+                Occurrence.status == "scheduled",
+                Event.status == "published",
+            )
+        ).first()
+        if row is None:
+            return False, None, 0
+        event_capacity, capacity, used = row
+        if capacity is None:
+            return True, event_capacity, UNLIMITED_BATCH
+        return True, event_capacity, max(int(capacity) - int(used), 0)
+
+    # PACKAGE: el cupo del pack es el mínimo entre sesiones scheduled (ver package_capacity)
+    capacity = func.coalesce(Occurrence.capacity_override, Event.capacity_default)
+    row = db.session.execute(
+        select(
+            func.min(capacity),
+            func.count(Occurrence.id),
+            func.count(capacity),
+            Event.seats_reserved
+            + Event.seats_paid
+            - released_seats_expr(event_id),
+        )
+        .select_from(Event)
+        .join(Occurrence, (Occurrence.event_id == Event.id) & (Occurrence.status == "scheduled"))
+        .where(Event.id == event_id, Event.status == "published")
+        .group_by(Event.id, Event.seats_reserved, Event.seats_paid)
+    ).first()
+    if row is None:
+        return False, None, 0
+    pack_capacity, n_scheduled, n_capped, used = row
+    if n_capped < n_scheduled:
+        # alguna sesión sin cupo definido => pack ilimitado
+        return True, None, UNLIMITED_BATCH
+    return True, int(pack_capacity), max(int(pack_capacity) - int(used), 0)
+
+
+def _hold(event_id: int, occurrence_id: int | None, n: int, capacity: int | None) -> bool:
+    if occurrence_id is not None:
+        return reserve_occurrence_seats(
+            event_id, [occurrence_id], n, capacity,
+            released=released_occurrence_seats_expr(),
+        )
+    return reserve_event_seats(
+        event_id, n, capacity,
+        released=released_seats_expr(event_id),
+    )
+
+
+def promote_queue(event_id: int, occurrence_id: int | None = None) -> int:
+    """
+    Ofrece los cupos libres a las próximas entradas waiting de la cola, en orden
+    estricto de llegada: si la primera pide más cupos de los que hay, espera (las
+    de atrás no se la saltan). Cantidad fija de sentencias sin importar cuántas
+    ofertas salgan. Devuelve cuántas ofertas hizo; quien llama hace el commit.
+    """
+    is_open, capacity, free = _free_seats(event_id, occurrence_id)
+    if not is_open or free <= 0:
+        return 0
+
+    queue = select(WaitlistEntry.id, WaitlistEntry.participant_count).where(
+        WaitlistEntry.event_id == event_id,
+        WaitlistEntry.status == "waiting",
+    )
+    if occurrence_id is None:
+        queue = queue.where(WaitlistEntry.occurrence_id.is_(None))
+    else:
+        queue = queue.where(WaitlistEntry.occurrence_id == occurrence_id)
+
+    # cada oferta ocupa al menos un cupo: nunca hacen falta más de `free` entradas
+    candidates = db.session.execute(queue.order_by(WaitlistEntry.id).limit(free)).all()
+
+    chosen = []
+    for entry_id, n in candidates:
+        if n > free:
+            break
+        chosen.append(entry_id)
+        free -= n
+    if not chosen:
+        return 0
+
+    # se toman las entradas con un UPDATE condicional (un promotor concurrente no
+    # puede ofrecer la misma dos veces) y se retienen sus cupos juntos
+    now = datetime.now(timezone.utc)
+    taken = db.session.execute(
+        update(WaitlistEntry)
+        .where(WaitlistEntry.id.in_(chosen), WaitlistEntry.status == "waiting")
+        .values(
+            status="offered",
+            offered_at=now,
+            offer_expires_at=now + timedelta(minutes=current_app.config["WAITLIST_OFFER_MINUTES"]),
+        )
+        .returning(WaitlistEntry.id, WaitlistEntry.participant_count),
+        execution_options={"synchronize_session": False},
+    ).all()
+    if not taken:
+        return 0
+
+    # el UPDATE condicional de cupos decide; `free` es solo la estimación
+    if not _hold(event_id, occurrence_id, sum(n for _, n in taken), capacity):
+        db.session.execute(
+            update(WaitlistEntry)
+            .where(WaitlistEntry.id.in_([entry_id for entry_id, _ in taken]))
+            .values(status="waiting", offered_at=None, offer_expires_at=None),
+            execution_options={"synchronize_session": False},
+        )
+        return 0
+
+    # el aviso sale por el outbox: si esta transacción hace rollback, no hay correo
+    enqueue_waitlist_offers(entry_id for entry_id, _ in taken)
+    log.info(
+        "lista de espera: %s ofertas (evento %s, sesión %s)", len(taken), event_id, occurrence_id
+    )
+    return len(taken)
+
+
+def promote_waitlists(event_ids, occurrence_ids=None) -> int:
+    """
+    Promueve las colas con entradas waiting de esos eventos (tras liberar cupos).
+    occurrence_ids: si se sabe qué sesiones liberaron cupo, solo esas colas (más
+    la del evento). Sin listas de espera el costo es una query indexada.
+    Quien llama hace el commit.
+    """
+    event_ids = sorted(set(event_ids))
+    if not event_ids:
+        return 0
+
+    stmt = (
+        select(WaitlistEntry.event_id, WaitlistEntry.occurrence_id)
+        .where(WaitlistEntry.event_id.in_(event_ids), WaitlistEntry.status == "waiting")
+        .distinct()
+    )
+    if occurrence_ids is not None:
+        stmt = stmt.where(
+            WaitlistEntry.occurrence_id.is_(None) | WaitlistEntry.occurrence_id.in_(list(occurrence_ids))
+        )
+    queues = db.session.execute(stmt).all()
+    return sum(promote_queue(event_id, occurrence_id) for event_id, occurrence_id in queues)
+
+
+def expire_waitlist_offers() -> int:
+    """
+    Vence las ofertas no tomadas a tiempo: devuelve sus cupos y los ofrece a los
+    siguientes de cada cola, en la misma transacción. Devuelve cuántas venció.
+    """
+    now = datetime.now(timezone.utc)
+    rows = db.session.execute(
+        update(WaitlistEntry)
+        .where(WaitlistEntry.status == "offered", WaitlistEntry.offer_expires_at < now)
+        .values(status="expired")
+        .returning(WaitlistEntry.event_id, WaitlistEntry.occurrence_id, WaitlistEntry.participant_count),
+        execution_options={"synchronize_session": False},
+    ).all()
+    if not rows:
+        return 0
+
+    event_seats: dict[int, int] = defaultdict(int)
+    occurrence_seats: dict[int, int] = defaultdict(int)
+    for event_id, occurrence_id, n in rows:
+        event_seats[event_id] += n
+        if occurrence_id is not None:
+            occurrence_seats[occurrence_id] += n
+
+    release_held_seats(event_seats, occurrence_seats)
+    promote_waitlists(event_seats)
+    db.session.commit()
+    return len(rows)
+
+
+def offer_is_open(entry: WaitlistEntry) -> bool:
+    return (
+        entry.status == "offered"
+        and entry.offer_expires_at is not None
+        and _as_utc(entry.offer_expires_at) > datetime.now(timezone.utc)
+    )
+
+
+def claim_offer(entry_id: int, purchase_id: int) -> bool:
+    """
+    Marca la oferta como tomada por esa compra (pending). Condicional: si venció o
+    el sweeper ya la expiró, no toca nada y quien llama hace rollback. Los cupos
+    retenidos pasan a ser los del pending, sin mover contadores.
+    """
+    result = db.session.execute(
+        update(WaitlistEntry)
+        .where(
+            WaitlistEntry.id == entry_id,
+            WaitlistEntry.status == "offered",
+            WaitlistEntry.offer_expires_at > datetime.now(timezone.utc),
+        )
+        .values(status="claimed", purchase_id=purchase_id),
+        execution_options={"synchronize_session": False},
+    )
+    return result.rowcount == 1
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite devuelve datetimes naive (guardados en UTC)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
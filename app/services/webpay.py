@@ -0,0 +1,241 @@
+# app/services/webpay.py
+#
+# Cliente de Webpay Plus (API REST v1.2) con:
+# - sesión HTTP reutilizada (pool de conexiones keep-alive por proceso)
+# - timeouts estrictos de conexión/lectura
+# - reintentos con backoff solo donde es seguro: errores de conexión (el request no
+#   salió) en cualquier método; 502/503/504 solo en GET (status). Un POST/PUT que
+#   recibe 502/503/504 pudo haberse ejecutado igual en Transbank detrás del proxy:
+#   reenviar un create/commit/refund podría duplicarlo.
+# - variante async (httpx) para despliegues ASGI
+#
+# Las vistas usan get_gateway(); en tests se configura PAYMENT_GATEWAY="fake".
+# Las dependencias pesadas (requests, httpx, asyncio) se importan al crear el
+# gateway, no al importar el módulo: procesos que no cobran no las cargan.
+
+from flask import current_app
+
+API_PATH = "/rswebpaytransaction/api/webpay/v1.2/transactions"
+
+BASE_URLS = {
+    "integration": "https://webpay3gint.transbank.cl",
+    "production": "https://webpay3g.transbank.cl",
+}
+
+# Credenciales públicas de integración de Transbank (Webpay Plus)
+INTEGRATION_COMMERCE_CODE = "597055555532"
+INTEGRATION_API_KEY = "579B532A7440BB0C9079DED94D31EA1615BACEB56610332264630D42D0A36B1C"
+
+RETRY_STATUSES = (502, 503, 504)
+# únicos métodos que se reintentan ante RETRY_STATUSES (lecturas sin efecto)
+STATUS_RETRY_METHODS = frozenset({"GET"})
+
+
+class GatewayError(Exception):
+    pass
+
+
+def _headers(commerce_code: str, api_key: str) -> dict:
+    return {
+        "Tbk-Api-Key-Id": commerce_code,
+        "Tbk-Api-Key-Secret": api_key,
+        "Content-Type": "application/json",
+    }
+
+
+class WebpayGateway:
+    def __init__(
+        self,
+        commerce_code: str,
+        api_key: str,
+        base_url: str,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 10.0,
+        retries: int = 2,
+        backoff: float = 0.3,
+        pool_size: int = 10,
+    ):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.base_url = base_url.rstrip("/") + API_PATH
+        self.timeout = (connect_timeout, read_timeout)
+
+        # read=0: un commit que ya llegó a Transbank no se reenvía a ciegas.
+        # urllib3 reintenta errores de conexión en cualquier método; los de status solo
+        # en allowed_methods (GET): create/commit/refund con 503 no se reenvían.
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=STATUS_RETRY_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(_headers(commerce_code, api_key))
+
+    def _request(self, method: str, path: str, payload: dict | None = None) -> dict:
+        import requests
+
+        try:
+            resp = self.session.request(
+                method, self.base_url + path, json=payload, timeout=self.timeout
+            )
+        except requests.RequestException as exc:
+            raise GatewayError(f"Webpay {method} {path}: {exc}") from exc
+
+        if resp.status_code >= 400:
+            raise GatewayError(f"Webpay {method} {path}: HTTP {resp.status_code} {resp.text[:200]}")
+        return resp.json()
+
+    def create(self, buy_order: str, session_id: str, amount: int, return_url: str) -> dict:
+        return self._request(
+            "POST",
+            "",
+            {"buy_order": buy_order, "session_id": session_id, "amount": amount, "return_url": return_url},
+        )
+
+    def commit(self, token: str) -> dict:
+        return self._request("PUT", f"/{token}")
+
+    def status(self, token: str) -> dict:
+        return self._request("GET", f"/{token}")
+
+    def refund(self, token: str, amount: int) -> dict:
+        return self._request("POST", f"/{token}/refunds", {"amount": amount})
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncWebpayGateway:
+    """
+    Misma API que WebpayGateway pero con corrutinas (httpx).
+    Pensado para un despliegue ASGI: la espera a Transbank no bloquea un worker.
+    """
+
+    def __init__(
+        self,
+        commerce_code: str,
+        api_key: str,
+        base_url: str,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 10.0,
+        retries: int = 2,
+        backoff: float = 0.3,
+        pool_size: int = 10,
+    ):
+        import httpx
+
+        self.retries = retries
+        self.backoff = backoff
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/") + API_PATH,
+            headers=_headers(commerce_code, api_key),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def _request(self, method: str, path: str, payload: dict | None = None) -> dict:
+        import asyncio
+
+        import httpx
+
+        for attempt in range(self.retries + 1):
+            try:
+                resp = await self.client.request(method, path, json=payload)
+            except httpx.ConnectError as exc:
+                error = GatewayError(f"Webpay {method} {path}: {exc}")
+            except httpx.HTTPError as exc:
+                # timeout de lectura u otro error tras enviar: no reintentar
+                raise GatewayError(f"Webpay {method} {path}: {exc}") from exc
+            else:
+                if resp.status_code not in RETRY_STATUSES or method not in STATUS_RETRY_METHODS:
+                    if resp.status_code >= 400:
+                        raise GatewayError(f"Webpay {method} {path}: HTTP {resp.status_code}")
+                    return resp.json()
+                error = GatewayError(f"Webpay {method} {path}: HTTP {resp.status_code}")
+
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+
+        raise error
+
+    async def create(self, buy_order: str, session_id: str, amount: int, return_url: str) -> dict:
+        return await self._request(
+            "POST",
+            "",
+            {"buy_order": buy_order, "session_id": session_id, "amount": amount, "return_url": return_url},
+        )
+
+    async def commit(self, token: str) -> dict:
+        return await self._request("PUT", f"/{token}")
+
+    async def status(self, token: str) -> dict:
+        return await self._request("GET", f"/{token}")
+
+    async def refund(self, token: str, amount: int) -> dict:
+        return await self._request("POST", f"/{token}/refunds", {"amount": amount})
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+def check_gateway_config(config) -> None:
+    """
+    Falla al arrancar si Webpay real no tiene credenciales. Solo el ambiente de
+    integración (y testing) usa las credenciales públicas de Transbank por defecto.
+    """
+    if config["PAYMENT_GATEWAY"] == "fake" or config.get("TESTING"):
+        return
+    if config["WEBPAY_ENVIRONMENT"] == "integration":
+        return
+    missing = [name for name in ("WEBPAY_COMMERCE_CODE", "WEBPAY_API_KEY") if not config.get(name)]
+    if missing:
+        raise RuntimeError(
+            f"Webpay ({config['WEBPAY_ENVIRONMENT']}) sin credenciales: falta {', '.join(missing)}."
+        )
+
+
+def _gateway_kwargs(config) -> dict:
+    env = config["WEBPAY_ENVIRONMENT"]
+    integration = env == "integration"
+    return {
+        "commerce_code": config["WEBPAY_COMMERCE_CODE"] or (INTEGRATION_COMMERCE_CODE if integration else None),
+        "api_key": config["WEBPAY_API_KEY"] or (INTEGRATION_API_KEY if integration else None),
+        "base_url": config["WEBPAY_BASE_URL"] or BASE_URLS[env],
+        "connect_timeout": config["WEBPAY_CONNECT_TIMEOUT"],
+        "read_timeout": config["WEBPAY_READ_TIMEOUT"],
+        "retries": config["WEBPAY_RETRIES"],
+        "backoff": config["WEBPAY_RETRY_BACKOFF"],
+        "pool_size": config["WEBPAY_POOL_SIZE"],
+    }
+
+
+def build_gateway(config):
+    if config["PAYMENT_GATEWAY"] == "fake":
+        from app.services.webpay_fake import FakeWebpayGateway
+
+        return FakeWebpayGateway(latency=config["FAKE_GATEWAY_LATENCY"])
+    return WebpayGateway(**_gateway_kwargs(config))
+
+
+def build_async_gateway(config) -> AsyncWebpayGateway:
+    return AsyncWebpayGateway(**_gateway_kwargs(config))
+
+
+def get_gateway():
+    # Un gateway (y su pool HTTP) por proceso, creado al primer uso
+    gateway = current_app.extensions.get("payment_gateway")
+    if gateway is None:
+        gateway = build_gateway(current_app.config)
+        current_app.extensions["payment_gateway"] = gateway
+    return gateway
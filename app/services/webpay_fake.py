@@ -0,0 +1,112 @@
+# app/services/webpay_fake.py
+#
+# Dobles de Webpay para tests y benchmarks locales:
+# - FakeWebpayGateway: en proceso, misma API que WebpayGateway
+# - make_fake_webpay_app / serve_fake_webpay: servidor HTTP local que imita la
+#   API REST, para ejercitar el cliente real (pool, timeouts, reintentos)
+
+import itertools
+import json
+import threading
+import time
+
+from app.services.webpay import API_PATH
+
+
+class FakeWebpayGateway:
+    def __init__(self, latency: float = 0.0, authorize: bool = True):
+        self.latency = latency
+        self.authorize = authorize
+        self.calls = {"create": 0, "commit": 0, "status": 0, "refund": 0}
+        self._tokens = {}
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _hit(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _tx(self, token: str) -> dict:
+        with self._lock:
+            return self._tokens.setdefault(token, {"amount": 0, "buy_order": None, "status": "INITIALIZED"})
+
+    def seed(self, token: str, amount: int, buy_order: str | None = None, status: str = "INITIALIZED") -> None:
+        """Registra una transacción ya existente (p.ej. para conciliar compras sembradas)."""
+        with self._lock:
+            self._tokens[token] = {"amount": amount, "buy_order": buy_order, "status": status}
+
+    def create(self, buy_order: str, session_id: str, amount: int, return_url: str) -> dict:
+        self._hit("create")
+        token = f"fake-{next(self._seq):08d}-{buy_order}"
+        with self._lock:
+            self._tokens[token] = {"amount": amount, "buy_order": buy_order, "status": "INITIALIZED"}
+        return {"token": token, "url": "http://fake-webpay.local/pay"}
+
+    def commit(self, token: str) -> dict:
+        self._hit("commit")
+        tx = self._tx(token)
+        tx["status"] = "AUTHORIZED" if self.authorize else "FAILED"
+        return {
+            "status": tx["status"],
+            "amount": tx["amount"],
+            "buy_order": tx["buy_order"],
+            "response_code": 0 if self.authorize else -1,
+        }
+
+    def status(self, token: str) -> dict:
+        self._hit("status")
+        tx = self._tx(token)
+        return {"status": tx["status"], "amount": tx["amount"], "buy_order": tx["buy_order"]}
+
+    def refund(self, token: str, amount: int) -> dict:
+        self._hit("refund")
+        tx = self._tx(token)
+        tx["status"] = "REVERSED"
+        return {"type": "REVERSED", "nullified_amount": amount}
+
+    def close(self) -> None:
+        pass
+
+
+def make_fake_webpay_app(gateway: FakeWebpayGateway | None = None):
+    """WSGI app que expone la API REST de Webpay sobre un FakeWebpayGateway."""
+    from werkzeug.wrappers import Request, Response
+
+    gateway = gateway or FakeWebpayGateway()
+
+    @Request.application
+    def app(request):
+        if not request.path.startswith(API_PATH):
+            return Response(status=404)
+
+        parts = [p for p in request.path[len(API_PATH):].split("/") if p]
+        body = request.get_json(silent=True) or {}
+
+        if request.method == "POST" and not parts:
+            result = gateway.create(body["buy_order"], body["session_id"], body["amount"], body["return_url"])
+        elif request.method == "PUT" and len(parts) == 1:
+            result = gateway.commit(parts[0])
+        elif request.method == "GET" and len(parts) == 1:
+            result = gateway.status(parts[0])
+        elif request.method == "POST" and len(parts) == 2 and parts[1] == "refunds":
+            result = gateway.refund(parts[0], body["amount"])
+        else:
+            return Response(status=404)
+
+        return Response(json.dumps(result), content_type="application/json")
+
+    return app
+
+
+def serve_fake_webpay(host: str = "127.0.0.1", port: int = 0, gateway: FakeWebpayGateway | None = None):
+    """
+    Levanta el servidor fake en un hilo. Devuelve (server, base_url); usar
+    WEBPAY_BASE_URL=base_url y server.shutdown() al terminar.
+    """
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, make_fake_webpay_app(gateway), threaded=True)
+    threading.Thread(target=server.serve_forever, name="fake-webpay", daemon=True).start()
+    return server, f"http://{host}:{server.port}"
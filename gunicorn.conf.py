@@ -0,0 +1,31 @@
+# gunicorn.conf.py
+#
+# Perfil de producción: gunicorn -c gunicorn.conf.py wsgi:app  (con FLASK_ENV=production)
+#
+# Workers gthread: cada worker atiende `threads` requests a la vez y tiene su propio
+# pool de conexiones, así que DB_POOL_SIZE (+ DB_MAX_OVERFLOW) debe cubrir los hilos,
+# y workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) no debe pasar max_connections de PostgreSQL.
+# Con SQLite conviene un solo worker (un solo escritor a la vez) y varios hilos.
+
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# la espera a Webpay (WEBPAY_READ_TIMEOUT + reintentos) debe caber holgada aquí
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# recicla workers de a poco (fugas de memoria) sin reiniciarlos todos juntos
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+
+# sin preload: cada worker crea su engine después del fork (las conexiones no se comparten)
+preload_app = False
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
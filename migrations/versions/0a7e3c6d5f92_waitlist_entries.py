@@ -0,0 +1,50 @@
+"""Lista de espera por evento o sesión
+
+Revision ID: 0a7e3c6d5f92
+Revises: 91c5d2b7a4e6
+Create Date: 2026-10-18 12:56:02.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a7e3c6d5f92'
+down_revision = '91c5d2b7a4e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('waitlist_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('occurrence_id', sa.Integer(), nullable=True),
+    sa.Column('buyer_name', sa.String(length=120), nullable=False),
+    sa.Column('buyer_email', sa.String(length=120), nullable=False),
+    sa.Column('buyer_phone', sa.String(length=30), nullable=False),
+    sa.Column('participant_count', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('token', sa.String(length=64), nullable=False),
+    sa.Column('offered_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('offer_expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('purchase_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['occurrence_id'], ['occurrences.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['purchase_id'], ['purchases.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('token')
+    )
+    with op.batch_alter_table('waitlist_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_waitlist_queue', ['event_id', 'occurrence_id', 'status', 'id'], unique=False)
+        batch_op.create_index('ix_waitlist_status_offer_expires', ['status', 'offer_expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('waitlist_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_waitlist_status_offer_expires')
+        batch_op.drop_index('ix_waitlist_queue')
+
+    op.drop_table('waitlist_entries')
@@ -0,0 +1,96 @@
+"""Esquema inicial (eventos, sesiones, compras, participantes, usuarios)
+
+Bases creadas antes de tener migraciones (db.create_all): `flask db stamp 3b1c7e20a9d4`
+y luego `flask db upgrade`.
+
+Revision ID: 3b1c7e20a9d4
+Revises: 
+Create Date: 2026-10-18 12:19:30.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b1c7e20a9d4'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=120), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('pricing_mode', sa.String(length=20), nullable=False),
+    sa.Column('price', sa.Integer(), nullable=False),
+    sa.Column('capacity_default', sa.Integer(), nullable=True),
+    sa.Column('location_name', sa.String(length=120), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email')
+    )
+    op.create_table('occurrences',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('start_dt', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('end_dt', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('capacity_override', sa.Integer(), nullable=True),
+    sa.Column('price_override', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_id', 'start_dt', name='uq_event_start')
+    )
+    op.create_table('purchases',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('buyer_name', sa.String(length=120), nullable=False),
+    sa.Column('buyer_email', sa.String(length=120), nullable=False),
+    sa.Column('buyer_phone', sa.String(length=30), nullable=False),
+    sa.Column('total_amount', sa.Integer(), nullable=False),
+    sa.Column('tbk_token', sa.String(length=120), nullable=True),
+    sa.Column('buy_order', sa.String(length=120), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('paid_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('buy_order'),
+    sa.UniqueConstraint('tbk_token')
+    )
+    op.create_table('purchase_occurrences',
+    sa.Column('purchase_id', sa.Integer(), nullable=False),
+    sa.Column('occurrence_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['occurrence_id'], ['occurrences.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['purchase_id'], ['purchases.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('purchase_id', 'occurrence_id')
+    )
+    op.create_table('purchase_participants',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('purchase_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.Column('age', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['purchase_id'], ['purchases.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('purchase_participants')
+    op.drop_table('purchase_occurrences')
+    op.drop_table('purchases')
+    op.drop_table('occurrences')
+    op.drop_table('users')
+    op.drop_table('events')
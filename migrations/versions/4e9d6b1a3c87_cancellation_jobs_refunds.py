@@ -0,0 +1,75 @@
+"""Jobs de cancelación de sesiones y reembolsos
+
+Revision ID: 4e9d6b1a3c87
+Revises: b84f1e2a7c50
+Create Date: 2026-10-18 13:19:42.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e9d6b1a3c87'
+down_revision = 'b84f1e2a7c50'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cancellation_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('occurrence_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(length=20), nullable=False),
+    sa.Column('replacement_occurrence_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('total', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('processed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('reassigned', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('refunded', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('refund_errors', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('waiting', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['occurrence_id'], ['occurrences.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['replacement_occurrence_id'], ['occurrences.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('cancellation_jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_cancellation_jobs_event_id', ['event_id', 'id'], unique=False)
+        batch_op.create_index('ix_cancellation_jobs_status_next_attempt', ['status', 'next_attempt_at'], unique=False)
+
+    op.create_table('refunds',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('purchase_id', sa.Integer(), nullable=False),
+    sa.Column('occurrence_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('response', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['cancellation_jobs.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['occurrence_id'], ['occurrences.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['purchase_id'], ['purchases.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('purchase_id', 'occurrence_id', name='uq_refunds_purchase_occurrence')
+    )
+    with op.batch_alter_table('refunds', schema=None) as batch_op:
+        batch_op.create_index('ix_refunds_job_status', ['job_id', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('refunds', schema=None) as batch_op:
+        batch_op.drop_index('ix_refunds_job_status')
+
+    op.drop_table('refunds')
+    with op.batch_alter_table('cancellation_jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_cancellation_jobs_status_next_attempt')
+        batch_op.drop_index('ix_cancellation_jobs_event_id')
+
+    op.drop_table('cancellation_jobs')
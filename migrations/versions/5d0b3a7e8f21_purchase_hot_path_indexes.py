@@ -0,0 +1,49 @@
+"""Índices de las consultas calientes de compras, participantes y sesiones
+
+En PostgreSQL con tablas grandes conviene crearlos antes a mano con
+CREATE INDEX CONCURRENTLY (mismos nombres); ver `flask db-explain`.
+
+Revision ID: 5d0b3a7e8f21
+Revises: c2e98b4f6a13
+Create Date: 2026-10-18 12:33:39.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0b3a7e8f21'
+down_revision = 'c2e98b4f6a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.create_index('ix_events_status_created', ['status', 'created_at'], unique=False)
+
+    with op.batch_alter_table('purchase_occurrences', schema=None) as batch_op:
+        batch_op.create_index('ix_purchase_occurrences_occurrence_id', ['occurrence_id'], unique=False)
+
+    with op.batch_alter_table('purchase_participants', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_purchase_participants_purchase_id'), ['purchase_id'], unique=False)
+
+    with op.batch_alter_table('purchases', schema=None) as batch_op:
+        batch_op.create_index('ix_purchases_event_status_created', ['event_id', 'status', 'created_at'], unique=False)
+        batch_op.create_index('ix_purchases_status_created', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('purchases', schema=None) as batch_op:
+        batch_op.drop_index('ix_purchases_status_created')
+        batch_op.drop_index('ix_purchases_event_status_created')
+
+    with op.batch_alter_table('purchase_participants', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_purchase_participants_purchase_id'))
+
+    with op.batch_alter_table('purchase_occurrences', schema=None) as batch_op:
+        batch_op.drop_index('ix_purchase_occurrences_occurrence_id')
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_index('ix_events_status_created')
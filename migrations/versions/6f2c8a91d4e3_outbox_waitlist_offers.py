@@ -0,0 +1,33 @@
+"""Correos de oferta de la lista de espera en el outbox
+
+Revision ID: 6f2c8a91d4e3
+Revises: d71b5e08c2fa
+Create Date: 2026-10-18 14:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f2c8a91d4e3'
+down_revision = 'd71b5e08c2fa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('outbox_messages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('waitlist_entry_id', sa.Integer(), nullable=True))
+        batch_op.create_unique_constraint('uq_outbox_kind_waitlist_entry', ['kind', 'waitlist_entry_id'])
+        batch_op.create_foreign_key(
+            'fk_outbox_messages_waitlist_entry_id', 'waitlist_entries',
+            ['waitlist_entry_id'], ['id'], ondelete='CASCADE',
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('outbox_messages', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_outbox_messages_waitlist_entry_id', type_='foreignkey')
+        batch_op.drop_constraint('uq_outbox_kind_waitlist_entry', type_='unique')
+        batch_op.drop_column('waitlist_entry_id')
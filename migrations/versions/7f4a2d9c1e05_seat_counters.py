@@ -0,0 +1,73 @@
+"""Contadores de cupos materializados en eventos y sesiones
+
+Los contadores se llenan desde las compras existentes (pending/committing ->
+seats_reserved, paid -> seats_paid); `flask seats-reconcile --dry-run` los verifica.
+
+Revision ID: 7f4a2d9c1e05
+Revises: 3b1c7e20a9d4
+Create Date: 2026-10-18 12:25:43.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f4a2d9c1e05'
+down_revision = '3b1c7e20a9d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('seats_reserved', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('seats_paid', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('occurrences', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('seats_reserved', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('seats_paid', sa.Integer(), server_default='0', nullable=False))
+
+    # cupos de las compras existentes (misma cuenta que rebuild_seat_ledger)
+    op.execute(
+        """
+        UPDATE events SET
+            seats_reserved = (
+                SELECT COUNT(pp.id) FROM purchase_participants pp
+                JOIN purchases p ON p.id = pp.purchase_id
+                WHERE p.event_id = events.id AND p.status IN ('pending', 'committing')
+            ),
+            seats_paid = (
+                SELECT COUNT(pp.id) FROM purchase_participants pp
+                JOIN purchases p ON p.id = pp.purchase_id
+                WHERE p.event_id = events.id AND p.status = 'paid'
+            )
+        """
+    )
+    op.execute(
+        """
+        UPDATE occurrences SET
+            seats_reserved = (
+                SELECT COUNT(pp.id) FROM purchase_occurrences po
+                JOIN purchases p ON p.id = po.purchase_id
+                JOIN purchase_participants pp ON pp.purchase_id = p.id
+                WHERE po.occurrence_id = occurrences.id AND p.status IN ('pending', 'committing')
+            ),
+            seats_paid = (
+                SELECT COUNT(pp.id) FROM purchase_occurrences po
+                JOIN purchases p ON p.id = po.purchase_id
+                JOIN purchase_participants pp ON pp.purchase_id = p.id
+                WHERE po.occurrence_id = occurrences.id AND p.status = 'paid'
+            )
+        """
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('occurrences', schema=None) as batch_op:
+        batch_op.drop_column('seats_paid')
+        batch_op.drop_column('seats_reserved')
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_column('seats_paid')
+        batch_op.drop_column('seats_reserved')
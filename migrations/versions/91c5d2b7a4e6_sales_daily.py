@@ -0,0 +1,42 @@
+"""Tabla de rollups diarios de ventas
+
+La tabla nace vacía: correr `flask rollups-rebuild` una vez después del upgrade.
+
+Revision ID: 91c5d2b7a4e6
+Revises: e6a41f0c9b38
+Create Date: 2026-10-18 12:51:19.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '91c5d2b7a4e6'
+down_revision = 'e6a41f0c9b38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sales_daily',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('purchases_created', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('purchases_paid', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('purchases_failed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('purchases_expired', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('revenue', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('seats_sold', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id', 'day')
+    )
+    with op.batch_alter_table('sales_daily', schema=None) as batch_op:
+        batch_op.create_index('ix_sales_daily_day', ['day'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('sales_daily', schema=None) as batch_op:
+        batch_op.drop_index('ix_sales_daily_day')
+
+    op.drop_table('sales_daily')
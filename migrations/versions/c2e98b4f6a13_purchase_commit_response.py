@@ -0,0 +1,26 @@
+"""Respuesta del commit de Webpay guardada en la compra (webpay_return idempotente)
+
+Revision ID: c2e98b4f6a13
+Revises: 7f4a2d9c1e05
+Create Date: 2026-10-18 12:31:20.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e98b4f6a13'
+down_revision = '7f4a2d9c1e05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('purchases', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('commit_response', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('purchases', schema=None) as batch_op:
+        batch_op.drop_column('commit_response')
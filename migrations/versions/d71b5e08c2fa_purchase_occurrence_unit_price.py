@@ -0,0 +1,29 @@
+"""Precio pagado por sesión en purchase_occurrences (reembolsos PER_OCCURRENCE)
+
+Los enlaces existentes quedan en NULL: al cancelar su sesión se reembolsa la
+parte proporcional de lo que queda por devolver, como en PACKAGE.
+
+Revision ID: d71b5e08c2fa
+Revises: 4e9d6b1a3c87
+Create Date: 2026-10-18 14:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd71b5e08c2fa'
+down_revision = '4e9d6b1a3c87'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('purchase_occurrences', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('unit_price', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('purchase_occurrences', schema=None) as batch_op:
+        batch_op.drop_column('unit_price')
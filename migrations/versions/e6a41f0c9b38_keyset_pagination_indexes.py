@@ -0,0 +1,36 @@
+"""Índices (created_at, id) para la paginación keyset del admin
+
+Revision ID: e6a41f0c9b38
+Revises: 5d0b3a7e8f21
+Create Date: 2026-10-18 12:49:12.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a41f0c9b38'
+down_revision = '5d0b3a7e8f21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.create_index('ix_events_created_id', ['created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('purchases', schema=None) as batch_op:
+        batch_op.create_index('ix_purchases_buyer_email_created_id', ['buyer_email', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_purchases_created_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_purchases_event_created_id', ['event_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('purchases', schema=None) as batch_op:
+        batch_op.drop_index('ix_purchases_event_created_id')
+        batch_op.drop_index('ix_purchases_created_id')
+        batch_op.drop_index('ix_purchases_buyer_email_created_id')
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_index('ix_events_created_id')
@@ -0,0 +1,167 @@
+# tests/conftest.py
+#
+# Cada test usa una app nueva sobre una base SQLite en un archivo temporal (los
+# tests concurrentes necesitan que varios hilos vean la misma base) con el
+# gateway fake en memoria.
+
+import os
+
+os.environ.setdefault("FLASK_ENV", "testing")
+os.environ.setdefault("FLASK_SKIP_DOTENV", "1")
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event as sa_event
+
+from app import create_app
+from app.extensions import db
+from app.models import Event, Occurrence, Purchase, User
+from app.services.webpay import get_gateway
+
+ADMIN_EMAIL = "admin@example.com"
+ADMIN_PASSWORD = "secret-password"
+
+
+@pytest.fixture
+def app_config():
+    """Config extra para la app de un módulo de tests (se sobreescribe en el módulo)."""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+            "PAYMENT_GATEWAY": "fake",
+            "PUBLIC_CACHE_BACKEND": "null",
+            "EXPIRY_SWEEP_INTERVAL_SECONDS": 0,
+            "OUTBOX_WORKER_INTERVAL_SECONDS": 0,
+            "CANCELLATION_WORKER_INTERVAL_SECONDS": 0,
+            # checkouts en paralelo esperan el lock de escritura en vez de fallar de inmediato
+            "SQLITE_BUSY_TIMEOUT_MS": 5000,
+            **app_config,
+        }
+    )
+    with app.app_context():
+        # solo el primario: test_replica deja registrada la metadata del bind "replica" en db
+        db.create_all(bind_key=None)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def gateway(app):
+    # FakeWebpayGateway de la app (se crea al primer uso)
+    with app.app_context():
+        return get_gateway()
+
+
+@pytest.fixture
+def make_event(app):
+    def make(sessions: int = 3, capacity: int | None = 10, pricing_mode: str = "PACKAGE", price: int = 1000) -> dict:
+        """Evento publicado con `sessions` sesiones; devuelve {"id", "occurrence_ids"}."""
+        with app.app_context():
+            event = Event(
+                title="Torneo",
+                pricing_mode=pricing_mode,
+                price=price,
+                capacity_default=capacity,
+                status="published",
+            )
+            db.session.add(event)
+            db.session.flush()
+            start = datetime(2030, 1, 1, 10, tzinfo=timezone.utc)
+            occurrences = [
+                Occurrence(
+                    event_id=event.id,
+                    start_dt=start + timedelta(days=i),
+                    end_dt=start + timedelta(days=i, hours=2),
+                )
+                for i in range(sessions)
+            ]
+            db.session.add_all(occurrences)
+            db.session.commit()
+            created = {"id": event.id, "occurrence_ids": [oc.id for oc in occurrences]}
+            db.session.remove()
+        return created
+
+    return make
+
+
+@pytest.fixture
+def admin_client(app):
+    with app.app_context():
+        user = User(email=ADMIN_EMAIL)
+        user.set_password(ADMIN_PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        db.session.remove()
+    client = app.test_client()
+    response = client.post("/admin/login", data={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    assert response.status_code == 302
+    return client
+
+
+def checkout_form(participants: int = 1, occurrence_ids=()) -> dict:
+    form = {
+        "buyer_name": "Ana",
+        "buyer_email": "ana@example.com",
+        "buyer_phone": "+56900000000",
+        "participant_count": str(participants),
+    }
+    for i in range(participants):
+        form[f"participant_name_{i}"] = f"Participante {i}"
+        form[f"participant_age_{i}"] = "10"
+    if occurrence_ids:
+        form["occurrence_ids"] = [str(oc_id) for oc_id in occurrence_ids]
+    return form
+
+
+@pytest.fixture
+def buy(app):
+    def buy(event_id: int, participants: int = 1, occurrence_ids=(), pay: bool = True) -> int:
+        """Checkout (y pago con el gateway fake si pay); devuelve el id de la compra."""
+        client = app.test_client()
+        response = client.post(f"/checkout/event/{event_id}", data=checkout_form(participants, occurrence_ids))
+        assert response.status_code == 302, response.status_code
+        purchase_id = int(response.location.rstrip("/").rsplit("/", 1)[-1])
+        client.get(f"/pay/webpay/start/{purchase_id}")
+        if pay:
+            with app.app_context():
+                token = db.session.get(Purchase, purchase_id).tbk_token
+                db.session.remove()
+            assert client.get(f"/pay/webpay/return?token_ws={token}").status_code == 302
+        return purchase_id
+
+    return buy
+
+
+class QueryCounter:
+    """Cuenta las sentencias SQL que emite el engine dentro del bloque."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        sa_event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        sa_event.remove(self.engine, "before_cursor_execute", self._count)
+
+
+@pytest.fixture
+def count_queries(app):
+    def count():
+        with app.app_context():
+            return QueryCounter(db.engine)
+
+    return count
@@ -0,0 +1,103 @@
+from sqlalchemy import func, select, update
+
+from app.extensions import db
+from app.models import CancellationJob, Occurrence, Purchase, Refund
+from app.models.purchase_occurrence import purchase_occurrences
+from app.services.cancellation import run_cancellation_job, start_cancellation
+from app.services.seats import rebuild_seat_ledger
+
+
+def _cancel(app, gateway, event_id: int, occurrence_id: int) -> None:
+    with app.app_context():
+        job_id = start_cancellation(event_id, occurrence_id).id
+        db.session.commit()
+        run_cancellation_job(job_id, gateway=gateway)
+        db.session.remove()
+
+
+def _refunds(app, purchase_id: int) -> tuple[list[int], str]:
+    with app.app_context():
+        amounts = db.session.scalars(
+            select(Refund.amount).where(Refund.purchase_id == purchase_id).order_by(Refund.id)
+        ).all()
+        status = db.session.get(Purchase, purchase_id).status
+        assert rebuild_seat_ledger(apply=False) == []
+        db.session.rollback()
+        db.session.remove()
+    return amounts, status
+
+
+def test_package_refunds_add_up_to_the_total_paid(app, gateway, make_event, buy):
+    event = make_event(sessions=3, pricing_mode="PACKAGE", price=31)
+    purchase_id = buy(event["id"])
+
+    for occurrence_id in event["occurrence_ids"]:
+        _cancel(app, gateway, event["id"], occurrence_id)
+
+    # parte proporcional de lo que queda; la última sesión devuelve el resto
+    assert _refunds(app, purchase_id) == ([10, 10, 11], "cancelled")
+    assert gateway.calls["refund"] == 3
+
+
+def test_per_occurrence_refund_is_what_was_paid_for_the_session(app, gateway, make_event, buy):
+    event = make_event(sessions=3, pricing_mode="PER_OCCURRENCE", price=1000)
+    first, second, third = event["occurrence_ids"]
+    with app.app_context():
+        db.session.execute(update(Occurrence).where(Occurrence.id == third).values(price_override=3000))
+        db.session.commit()
+        db.session.remove()
+    purchase_id = buy(event["id"], participants=2, occurrence_ids=[first, second, third])
+    with app.app_context():
+        # el precio cambia después de la venta: no afecta lo que se devuelve
+        db.session.execute(update(Occurrence).where(Occurrence.id == first).values(price_override=1500))
+        db.session.execute(update(Occurrence).where(Occurrence.id == third).values(price_override=500))
+        db.session.commit()
+        db.session.remove()
+
+    for occurrence_id in (first, third, second):
+        _cancel(app, gateway, event["id"], occurrence_id)
+
+    # pagó 2 × (1000 + 1000 + 3000) = 10000
+    assert _refunds(app, purchase_id) == ([2000, 6000, 2000], "cancelled")
+
+
+def test_reassign_refunds_buyers_already_in_the_replacement(app, gateway, make_event, buy):
+    event = make_event(sessions=2, capacity=10, pricing_mode="PER_OCCURRENCE", price=1000)
+    cancelled, replacement = event["occurrence_ids"]
+    both = buy(event["id"], participants=2, occurrence_ids=[cancelled, replacement])
+    only_cancelled = buy(event["id"], participants=1, occurrence_ids=[cancelled])
+
+    with app.app_context():
+        job_id = start_cancellation(event["id"], cancelled, replacement).id
+        db.session.commit()
+        progress = run_cancellation_job(job_id, gateway=gateway)
+        links = db.session.execute(
+            select(purchase_occurrences.c.purchase_id, purchase_occurrences.c.unit_price)
+            .where(purchase_occurrences.c.occurrence_id == replacement)
+            .order_by(purchase_occurrences.c.purchase_id)
+        ).all()
+        seats = db.session.scalar(select(Occurrence.seats_paid).where(Occurrence.id == replacement))
+        db.session.remove()
+
+    assert (progress["reassigned"], progress["refunded"]) == (1, 1)
+    # ya tenía el reemplazo: se le devuelve la sesión cancelada y sigue pagada por la otra
+    assert _refunds(app, both) == ([2000], "paid")
+    # la otra pasa al reemplazo sin reembolso, con lo que pagó guardado en el enlace nuevo
+    assert _refunds(app, only_cancelled) == ([], "paid")
+    assert [tuple(link) for link in links] == [(both, 1000), (only_cancelled, 1000)]
+    assert seats == 3
+
+
+def test_package_events_do_not_accept_a_replacement_session(app, admin_client, make_event):
+    event = make_event(sessions=2, pricing_mode="PACKAGE")
+    cancelled, other = event["occurrence_ids"]
+
+    response = admin_client.post(
+        f"/admin/occurrences/{cancelled}/cancel", data={"replacement_occurrence_id": other}
+    )
+
+    assert response.status_code == 302
+    with app.app_context():
+        assert db.session.get(Occurrence, cancelled).status == "scheduled"
+        assert db.session.scalar(select(func.count(CancellationJob.id))) == 0
+        db.session.remove()
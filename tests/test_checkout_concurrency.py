@@ -0,0 +1,47 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select, text
+
+from app.extensions import db
+from app.models import Event, Purchase
+from app.services.seats import rebuild_seat_ledger, reserve_event_seats
+
+from conftest import checkout_form
+
+CAPACITY = 5
+BUYERS = 40
+
+
+def test_concurrent_checkouts_sell_exactly_capacity(app, make_event):
+    event = make_event(sessions=2, capacity=CAPACITY)
+    url = f"/checkout/event/{event['id']}"
+
+    def checkout(_):
+        return app.test_client().post(url, data=checkout_form()).status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(checkout, range(BUYERS)))
+    elapsed = time.perf_counter() - started
+    print(f"\n{BUYERS} checkouts concurrentes, cupo {CAPACITY}: {BUYERS / elapsed:.1f} checkouts/s")
+
+    assert statuses.count(302) == CAPACITY
+    assert set(statuses) <= {302, 409}
+
+    with app.app_context():
+        sold = db.session.scalar(select(func.count(Purchase.id)).where(Purchase.event_id == event["id"]))
+        reserved = db.session.get(Event, event["id"]).seats_reserved
+        assert (sold, reserved) == (CAPACITY, CAPACITY)
+        assert rebuild_seat_ledger(apply=False) == []
+        db.session.rollback()
+
+
+def test_lock_timeout_does_not_stick_to_sqlite_connection(app, make_event):
+    event = make_event(sessions=1, capacity=CAPACITY)
+    with app.app_context():
+        assert reserve_event_seats(event["id"], 1, CAPACITY, lock_timeout_ms=10)
+        db.session.commit()
+        # el busy_timeout de la conexión sigue siendo el configurado (SQLITE_BUSY_TIMEOUT_MS)
+        assert db.session.scalar(text("PRAGMA busy_timeout")) == app.config["SQLITE_BUSY_TIMEOUT_MS"]
+        db.session.remove()
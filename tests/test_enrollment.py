@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.models import Occurrence
+from app.models.purchase_occurrence import purchase_occurrences
+from app.services import enrollment
+from app.services.enrollment import enroll_new_occurrences, enroll_package_purchases
+
+
+@pytest.mark.parametrize("upsert", [True, False], ids=["on_conflict", "portable"])
+def test_package_purchases_enroll_once_in_new_sessions(app, make_event, buy, monkeypatch, upsert):
+    if not upsert:
+        # motor sin ON CONFLICT: lee los enlaces que faltan y los inserta en un savepoint
+        monkeypatch.setattr(enrollment, "_dialect_insert", lambda: None)
+    event = make_event(sessions=2)
+    purchase_ids = [buy(event["id"], participants=2), buy(event["id"], participants=1)]
+
+    with app.app_context():
+        added = Occurrence(
+            event_id=event["id"],
+            start_dt=datetime(2030, 2, 1, 10, tzinfo=timezone.utc),
+            end_dt=datetime(2030, 2, 1, 12, tzinfo=timezone.utc),
+        )
+        db.session.add(added)
+        db.session.flush()
+
+        assert enroll_new_occurrences(event["id"], [added.id]) == 2
+        # idempotente: nada que agregar, no suma asientos de nuevo
+        assert enroll_new_occurrences(event["id"], [added.id]) == 0
+        assert enroll_package_purchases(purchase_ids) == 0
+        db.session.commit()
+
+        links = db.session.scalar(
+            select(func.count()).where(purchase_occurrences.c.occurrence_id == added.id)
+        )
+        assert links == 2
+        assert db.session.get(Occurrence, added.id).seats_paid == 3
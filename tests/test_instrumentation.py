@@ -0,0 +1,74 @@
+import json
+import logging
+import re
+
+import pytest
+
+
+@pytest.fixture
+def app_config():
+    return {"INSTRUMENTATION_ENABLED": True, "SLOW_QUERY_THRESHOLD_MS": 0}
+
+
+def _samples(client) -> dict[str, float]:
+    response = client.get("/metrics")
+    assert response.mimetype == "text/plain"
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_request_reports_server_timing_and_a_json_log_line(app, make_event, caplog):
+    make_event()
+    client = app.test_client()
+
+    with caplog.at_level(logging.INFO, logger="app.requests"):
+        response = client.get("/")
+
+    timing = response.headers["Server-Timing"]
+    queries = int(re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', timing).group(1))
+    assert timing.startswith("app;dur=") and "render;dur=" in timing
+
+    [line] = [json.loads(r.message) for r in caplog.records if r.name == "app.requests"]
+    assert (line["endpoint"], line["status"], line["sql_count"]) == ("public.home", 200, queries)
+    assert queries > 0 and "render_ms" in line
+
+
+def test_metrics_expose_prometheus_counters_and_histograms(app, make_event):
+    make_event()
+    client = app.test_client()
+    requests = 'http_requests_total{endpoint="public.home",method="GET",status="200"}'
+    before = _samples(client)
+
+    client.get("/")
+    after = _samples(client)
+
+    # /metrics no se cuenta a sí mismo
+    assert after.get(requests, 0) == before.get(requests, 0) + 1
+    assert not any('endpoint="metrics"' in name for name in after)
+
+    buckets = [
+        value for name, value in after.items()
+        if name.startswith('http_request_duration_seconds_bucket{endpoint="public.home"')
+    ]
+    assert buckets == sorted(buckets)  # acumulados: cada le incluye a los anteriores
+    assert buckets[-1] == after['http_request_duration_seconds_count{endpoint="public.home"}']
+    assert after['db_statements_per_request_count{endpoint="public.home"}'] == buckets[-1]
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert "# TYPE http_requests_total counter" in text
+
+
+def test_slow_queries_are_logged(app, make_event, caplog):
+    make_event()
+    caplog.clear()  # make_event también pasa el umbral 0 (fuera de un request)
+    with caplog.at_level(logging.WARNING, logger="app.sql.slow"):
+        app.test_client().get("/")
+
+    slow = [json.loads(r.message) for r in caplog.records if r.name == "app.sql.slow"]
+    assert slow and all(entry["endpoint"] == "public.home" for entry in slow)
+    assert any(entry["statement"].startswith("SELECT") for entry in slow)
@@ -0,0 +1,60 @@
+from pathlib import Path
+
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import downgrade, upgrade
+from sqlalchemy import inspect, text
+
+from app import create_app
+from app.extensions import db
+
+MIGRATIONS = str(Path(__file__).resolve().parent.parent / "migrations")
+INITIAL = "3b1c7e20a9d4"
+
+
+def _app(tmp_path):
+    return create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'migrated.db'}", "MIGRATIONS": "1"})
+
+
+def test_upgrade_head_matches_the_models(tmp_path):
+    app = _app(tmp_path)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        with db.engine.connect() as conn:
+            assert compare_metadata(MigrationContext.configure(conn), db.metadata) == []
+
+        downgrade(directory=MIGRATIONS, revision="base")
+        assert inspect(db.engine).get_table_names() == ["alembic_version"]
+        db.engine.dispose()
+
+
+def test_seat_counters_are_backfilled_from_existing_purchases(tmp_path):
+    app = _app(tmp_path)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS, revision=INITIAL)
+        with db.engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO events (id, title, pricing_mode, price, location_name, status, created_at) "
+                "VALUES (1, 'Torneo', 'PACKAGE', 1000, 'Club', 'published', '2030-01-01')"
+            ))
+            conn.execute(text(
+                "INSERT INTO occurrences (id, event_id, start_dt, end_dt, status) "
+                "VALUES (1, 1, '2030-01-01 10:00', '2030-01-01 12:00', 'scheduled')"
+            ))
+            for purchase_id, status, participants in ((1, "paid", 2), (2, "pending", 1), (3, "failed", 3)):
+                conn.execute(text(
+                    "INSERT INTO purchases (id, event_id, buyer_name, buyer_email, buyer_phone, total_amount, "
+                    f"status, created_at) VALUES ({purchase_id}, 1, 'A', 'a@example.com', '1', 1000, "
+                    f"'{status}', '2030-01-01')"
+                ))
+                conn.execute(text(f"INSERT INTO purchase_occurrences VALUES ({purchase_id}, 1)"))
+                for _ in range(participants):
+                    conn.execute(text(
+                        f"INSERT INTO purchase_participants (purchase_id, name, age) VALUES ({purchase_id}, 'P', 10)"
+                    ))
+
+        upgrade(directory=MIGRATIONS)
+        with db.engine.connect() as conn:
+            assert conn.execute(text("SELECT seats_reserved, seats_paid FROM events")).one() == (1, 2)
+            assert conn.execute(text("SELECT seats_reserved, seats_paid FROM occurrences")).one() == (1, 2)
+        db.engine.dispose()
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from app.extensions import db
+from app.models import Purchase
+from app.services.cancellation import start_cancellation
+from app.services.occupancy import event_occupancy
+
+
+def test_event_detail_query_count_does_not_depend_on_sessions(app, admin_client, make_event, count_queries):
+    counts = {}
+    for sessions in (3, 40):
+        event = make_event(sessions=sessions)
+        admin_client.get(f"/admin/events/{event['id']}")  # calienta caches de Jinja/mappers
+        with count_queries() as counter:
+            response = admin_client.get(f"/admin/events/{event['id']}")
+        assert response.status_code == 200
+        counts[sessions] = counter.count
+
+    assert counts[3] == counts[40]
+
+
+def test_event_detail_lists_cancellation_jobs_only_when_a_session_was_cancelled(
+    app, admin_client, make_event, count_queries
+):
+    event = make_event(sessions=2)
+    url = f"/admin/events/{event['id']}"
+    admin_client.get(url)
+    with count_queries() as without_jobs:
+        assert b"Ver progreso" not in admin_client.get(url).data
+
+    with app.app_context():
+        start_cancellation(event["id"], event["occurrence_ids"][0])
+        db.session.commit()
+        db.session.remove()
+
+    with count_queries() as with_jobs:
+        response = admin_client.get(url)
+    # @query_budget(5) se hace cumplir en testing
+    assert response.status_code == 200
+    assert b"Ver progreso" in response.data
+    assert with_jobs.count == without_jobs.count + 1
+
+
+def test_event_occupancy_counts_paid_and_pending(app, make_event, buy):
+    event = make_event(sessions=2, capacity=10, pricing_mode="PER_OCCURRENCE")
+    first, second = event["occurrence_ids"]
+    buy(event["id"], participants=2, occurrence_ids=[first, second])
+    buy(event["id"], participants=1, occurrence_ids=[first], pay=False)
+
+    with app.app_context():
+        occupancy = event_occupancy(event["id"])
+        db.session.remove()
+
+    assert (occupancy.event.paid, occupancy.event.pending) == (2, 1)
+    assert (occupancy.for_occurrence(first).paid, occupancy.for_occurrence(first).pending) == (2, 1)
+    assert (occupancy.for_occurrence(second).paid, occupancy.for_occurrence(second).pending) == (2, 0)
+
+
+def test_event_occupancy_ignores_stale_pending(app, make_event, buy):
+    event = make_event(sessions=1, capacity=10, pricing_mode="PER_OCCURRENCE")
+    [occurrence_id] = event["occurrence_ids"]
+    stale = buy(event["id"], participants=3, occurrence_ids=[occurrence_id], pay=False)
+    buy(event["id"], participants=1, occurrence_ids=[occurrence_id], pay=False)
+
+    ttl = app.config["PENDING_PURCHASE_TTL_MINUTES"]
+    with app.app_context():
+        # vencido pero aún pending: el sweeper no pasó
+        db.session.execute(
+            update(Purchase)
+            .where(Purchase.id == stale)
+            .values(created_at=datetime.now(timezone.utc) - timedelta(minutes=ttl + 1))
+        )
+        db.session.commit()
+        occupancy = event_occupancy(event["id"])
+        db.session.remove()
+
+    assert occupancy.event.pending == 1
+    assert occupancy.for_occurrence(occurrence_id).pending == 1
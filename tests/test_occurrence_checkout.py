@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select, update
+
+from app.extensions import db
+from app.models import Event, Occurrence, Purchase
+from app.models.purchase_occurrence import purchase_occurrences
+from app.services.seats import rebuild_seat_ledger
+
+from conftest import checkout_form
+
+
+def _post(app, event_id: int, participants: int, occurrence_ids):
+    return app.test_client().post(f"/checkout/event/{event_id}", data=checkout_form(participants, occurrence_ids))
+
+
+def _seats(app, occurrence_ids) -> list[int]:
+    with app.app_context():
+        reserved = db.session.scalars(
+            select(Occurrence.seats_reserved).where(Occurrence.id.in_(occurrence_ids)).order_by(Occurrence.id)
+        ).all()
+        db.session.remove()
+    return reserved
+
+
+def test_prices_sessions_and_links_them_at_reservation(app, make_event):
+    event = make_event(sessions=3, capacity=10, pricing_mode="PER_OCCURRENCE", price=1000)
+    first, second, third = event["occurrence_ids"]
+    with app.app_context():
+        db.session.execute(update(Occurrence).where(Occurrence.id == second).values(price_override=1500))
+        db.session.commit()
+        db.session.remove()
+
+    response = _post(app, event["id"], 2, [first, second])
+
+    assert response.status_code == 302
+    purchase_id = int(response.location.rstrip("/").rsplit("/", 1)[-1])
+    with app.app_context():
+        purchase = db.session.get(Purchase, purchase_id)
+        # effective_price() de cada sesión, por participante
+        assert purchase.total_amount == (1000 + 1500) * 2
+        assert sorted(db.session.scalars(
+            select(purchase_occurrences.c.occurrence_id).where(purchase_occurrences.c.purchase_id == purchase_id)
+        )) == [first, second]
+        assert db.session.get(Event, event["id"]).seats_reserved == 2
+        db.session.remove()
+    assert _seats(app, [first, second, third]) == [2, 2, 0]
+
+
+def test_reservation_is_all_or_nothing(app, make_event):
+    event = make_event(sessions=2, capacity=3, pricing_mode="PER_OCCURRENCE")
+    first, second = event["occurrence_ids"]
+    assert _post(app, event["id"], 2, [second]).status_code == 302
+
+    # la segunda sesión no tiene cupo para 2 más: tampoco se reserva la primera
+    response = _post(app, event["id"], 2, [first, second])
+
+    assert response.status_code == 409
+    assert _seats(app, [first, second]) == [0, 2]
+    with app.app_context():
+        assert db.session.scalar(select(func.count(Purchase.id))) == 1
+        db.session.remove()
+
+
+def test_query_count_does_not_depend_on_selected_sessions(app, make_event, count_queries):
+    counts = {}
+    for sessions in (2, 12):
+        event = make_event(sessions=sessions, capacity=50, pricing_mode="PER_OCCURRENCE")
+        _post(app, event["id"], 1, event["occurrence_ids"][:1])  # calienta templates/mappers
+        with count_queries() as counter:
+            response = _post(app, event["id"], 1, event["occurrence_ids"])
+        assert response.status_code == 302
+        counts[sessions] = counter.count
+
+    assert counts[2] == counts[12]
+
+
+def test_concurrent_checkouts_never_oversell_a_session(app, make_event):
+    capacity = 4
+    event = make_event(sessions=2, capacity=capacity, pricing_mode="PER_OCCURRENCE")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(lambda _: _post(app, event["id"], 1, event["occurrence_ids"]).status_code, range(20)))
+
+    assert statuses.count(302) == capacity
+    assert _seats(app, event["occurrence_ids"]) == [capacity, capacity]
+    with app.app_context():
+        assert rebuild_seat_ledger(apply=False) == []
+        db.session.rollback()
+        db.session.remove()
@@ -0,0 +1,159 @@
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, update
+
+from app.extensions import db
+from app.models import OutboxMessage, Purchase
+from app.services.outbox import claim_batch, deliver_outbox
+
+from conftest import checkout_form
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class Handler:
+    """Servidor SMTP de prueba: guarda lo recibido y responde `reply` al DATA."""
+
+    def __init__(self):
+        self.received = []
+        self.reply = "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.reply.startswith("250"):
+            self.received.append(envelope)
+        return self.reply
+
+
+@pytest.fixture
+def smtp(app):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    handler = Handler()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    app.config.update(
+        MAIL_BACKEND="smtp",
+        MAIL_SMTP_HOST="127.0.0.1",
+        MAIL_SMTP_PORT=port,
+        MAIL_SMTP_STARTTLS=False,
+        MAIL_SMTP_USER=None,
+        MAIL_RATE_PER_SECOND=0,
+    )
+    yield handler
+    controller.stop()
+
+
+def _messages(app):
+    with app.app_context():
+        rows = db.session.execute(
+            select(OutboxMessage.status, OutboxMessage.attempts, OutboxMessage.next_attempt_at, OutboxMessage.last_error)
+        ).all()
+        db.session.remove()
+    return rows
+
+
+def _deliver(app):
+    with app.app_context():
+        totals = deliver_outbox()
+        db.session.remove()
+    return totals
+
+
+def test_paid_purchase_is_delivered_over_smtp(app, smtp, make_event, buy):
+    event = make_event()
+    buy(event["id"], participants=2)
+
+    # el pago no esperó al SMTP: el correo quedó encolado
+    assert smtp.received == []
+    assert [row.status for row in _messages(app)] == ["pending"]
+
+    assert _deliver(app) == {"sent": 1, "retried": 0, "failed": 0}
+
+    [envelope] = smtp.received
+    assert envelope.rcpt_tos == ["ana@example.com"]
+    assert b"Inscripci" in envelope.content and b"Participante 1" in envelope.content
+    [(status, attempts, _, error)] = _messages(app)
+    assert (status, attempts, error) == ("sent", 1, None)
+
+
+def test_checkout_does_not_wait_for_smtp(app, gateway, make_event):
+    event = make_event()
+    # un SMTP que no responde: el request no lo toca
+    app.config.update(MAIL_BACKEND="smtp", MAIL_SMTP_HOST="10.255.255.1", MAIL_SMTP_TIMEOUT=5)
+    client = app.test_client()
+    response = client.post(f"/checkout/event/{event['id']}", data=checkout_form(1))
+    purchase_id = int(response.location.rstrip("/").rsplit("/", 1)[-1])
+    client.get(f"/pay/webpay/start/{purchase_id}")
+    with app.app_context():
+        token = db.session.get(Purchase, purchase_id).tbk_token
+        db.session.remove()
+    started = time.perf_counter()
+    assert client.get(f"/pay/webpay/return?token_ws={token}").status_code == 302
+    # enviar habría esperado MAIL_SMTP_TIMEOUT
+    assert time.perf_counter() - started < 1
+    assert [row.status for row in _messages(app)] == ["pending"]
+
+
+def test_transient_failure_is_retried_with_backoff(app, smtp, make_event, buy):
+    event = make_event()
+    buy(event["id"])
+    smtp.reply = "451 4.3.0 intente más tarde"
+
+    before = datetime.now(timezone.utc)
+    assert _deliver(app) == {"sent": 0, "retried": 1, "failed": 0}
+
+    [(status, attempts, next_attempt_at, error)] = _messages(app)
+    delay = (next_attempt_at.replace(tzinfo=timezone.utc) - before).total_seconds()
+    backoff = app.config["OUTBOX_RETRY_BACKOFF_SECONDS"]
+    assert (status, attempts) == ("pending", 1)
+    assert backoff <= delay <= backoff * 1.2 + 1
+    assert "451" in error
+    # antes del backoff no se reintenta
+    assert _deliver(app) == {"sent": 0, "retried": 0, "failed": 0}
+
+    smtp.reply = "250 OK"
+    with app.app_context():
+        db.session.execute(update(OutboxMessage).values(next_attempt_at=before))
+        db.session.commit()
+        db.session.remove()
+    assert _deliver(app) == {"sent": 1, "retried": 0, "failed": 0}
+    assert [(row.status, row.attempts) for row in _messages(app)] == [("sent", 2)]
+
+
+def test_permanent_failure_is_not_retried(app, smtp, make_event, buy):
+    event = make_event()
+    buy(event["id"])
+    smtp.reply = "550 5.1.1 buzón inexistente"
+
+    assert _deliver(app) == {"sent": 0, "retried": 0, "failed": 1}
+    assert [(row.status, row.attempts) for row in _messages(app)] == [("failed", 1)]
+
+
+def test_claimed_messages_are_leased_to_one_worker(app, make_event, buy):
+    event = make_event()
+    for _ in range(3):
+        buy(event["id"])
+
+    with app.app_context():
+        first = claim_batch(2)
+        second = claim_batch(10)
+        assert len(first) == 2 and len(second) == 1
+        assert {row.id for row in first}.isdisjoint(row.id for row in second)
+        # todos tomados: nadie más los ve hasta que venza el lease
+        assert claim_batch(10) == []
+
+        # el worker murió: al vencer el lease otra pasada los retoma
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_([row.id for row in first]))
+            .values(next_attempt_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+        )
+        db.session.commit()
+        retaken = claim_batch(10)
+        assert sorted(row.id for row in retaken) == sorted(row.id for row in first)
+        assert {row.attempts for row in retaken} == {2}
+        db.session.remove()
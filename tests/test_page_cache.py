@@ -0,0 +1,135 @@
+import time
+
+import pytest
+
+from app.cache import RedisCache, event_key, home_key
+from app.extensions import page_cache
+
+
+class FakeRedis:
+    """Lo que RedisCache usa de redis.Redis: get / setex / delete, con vencimiento."""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    def get(self, key):
+        expires_at, value = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at < time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def setex(self, key, ttl, value):
+        self.ttls[key] = ttl
+        self.data[key] = (time.monotonic() + ttl, value.encode())
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+@pytest.fixture
+def memory_cache(app):
+    app.config["PUBLIC_CACHE_BACKEND"] = "memory"
+    page_cache.init_app(app)
+    return page_cache
+
+
+def test_etag_and_last_modified_answer_304_without_queries(app, memory_cache, make_event, count_queries):
+    event = make_event()
+    client = app.test_client()
+    first = client.get(f"/events/{event['id']}")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    with count_queries() as counter:
+        by_etag = client.get(f"/events/{event['id']}", headers={"If-None-Match": etag})
+        by_date = client.get(
+            f"/events/{event['id']}", headers={"If-Modified-Since": first.headers["Last-Modified"]}
+        )
+        again = client.get(f"/events/{event['id']}")
+
+    assert (by_etag.status_code, by_date.status_code) == (304, 304)
+    assert by_etag.data == b""
+    assert again.status_code == 200 and again.headers["ETag"] == etag
+    # todo salió del cache
+    assert counter.count == 0
+
+
+def test_admin_edits_invalidate_the_catalog(app, memory_cache, admin_client, make_event):
+    event = make_event()
+    client = app.test_client()
+    etag = client.get(f"/events/{event['id']}").headers["ETag"]
+    assert "Torneo" in client.get("/").get_data(as_text=True)
+
+    response = admin_client.post(
+        f"/admin/events/{event['id']}/edit",
+        data={
+            "title": "Torneo de primavera",
+            "pricing_mode": "PACKAGE",
+            "price": "1000",
+            "capacity_default": "10",
+            "location_name": "Club",
+            "status": "published",
+        },
+    )
+    assert response.status_code == 302
+
+    # el ETag viejo ya no vale y ambas páginas muestran el cambio
+    page = client.get(f"/events/{event['id']}", headers={"If-None-Match": etag})
+    assert page.status_code == 200
+    assert "Torneo de primavera" in page.get_data(as_text=True)
+    assert "Torneo de primavera" in client.get("/").get_data(as_text=True)
+
+
+def test_occurrence_cancellation_invalidates_the_event_page(
+    app, memory_cache, admin_client, make_event, count_queries
+):
+    event = make_event(sessions=2)
+    client = app.test_client()
+    client.get(f"/events/{event['id']}")
+    assert memory_cache.backend.get(event_key(event["id"])) is not None
+
+    # la sesión se cancela con un UPDATE directo (no pasa por los eventos de sesión del ORM)
+    admin_client.post(f"/admin/occurrences/{event['occurrence_ids'][0]}/cancel")
+    assert memory_cache.backend.get(event_key(event["id"])) is None
+
+    with count_queries() as counter:
+        assert client.get(f"/events/{event['id']}").status_code == 200
+    assert counter.count > 0
+
+
+def test_purchases_keep_the_catalog_cached(app, memory_cache, make_event, buy, count_queries):
+    # el catálogo no muestra cupos vendidos: una compra no lo invalida (la idea del cache
+    # es que el tráfico de inscripciones no toque la base para las páginas públicas)
+    event = make_event()
+    client = app.test_client()
+    before = client.get(f"/events/{event['id']}")
+
+    buy(event["id"], participants=2)
+
+    with count_queries() as counter:
+        after = client.get(f"/events/{event['id']}", headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 304
+    assert counter.count == 0
+
+
+def test_redis_backend_round_trip(app, make_event, count_queries):
+    redis = FakeRedis()
+    page_cache.backend = RedisCache(redis, ttl=120)
+    event = make_event()
+    client = app.test_client()
+
+    first = client.get(f"/events/{event['id']}")
+    assert redis.ttls == {"ar:" + event_key(event["id"]): 120}
+
+    with count_queries() as counter:
+        cached = client.get(f"/events/{event['id']}")
+    assert counter.count == 0
+    assert (cached.data, cached.headers["ETag"]) == (first.data, first.headers["ETag"])
+
+    client.get("/")
+    page_cache.invalidate([event["id"]])
+    assert redis.get("ar:" + home_key()) is None
+    assert redis.get("ar:" + event_key(event["id"])) is None
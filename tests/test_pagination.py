@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.extensions import db
+from app.models import Event
+from app.services.pagination import keyset_page
+
+
+def _seed_events(app, n: int, ties: int = 0) -> list[int]:
+    """n eventos; los `ties` primeros comparten created_at (desempate por id). Devuelve ids en orden del listado."""
+    base = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    rows = [
+        {
+            "title": f"Evento {i}",
+            "pricing_mode": "PACKAGE",
+            "price": 1000,
+            "location_name": "Club",
+            "status": "published",
+            "created_at": base + timedelta(minutes=max(i - ties + 1, 0)),
+        }
+        for i in range(n)
+    ]
+    with app.app_context():
+        ids = db.session.scalars(insert(Event).returning(Event.id), rows).all()
+        db.session.commit()
+        ordered = db.session.scalars(select(Event.id).order_by(Event.created_at.desc(), Event.id.desc())).all()
+        db.session.remove()
+    assert sorted(ids) == sorted(ordered)
+    return ordered
+
+
+def _page(after=None, before=None, per_page=2):
+    return keyset_page(
+        select(Event), Event.created_at, Event.id, after=after, before=before, per_page=per_page, scalars=True
+    )
+
+
+def _walk_forward(app, per_page):
+    pages = []
+    with app.app_context():
+        page = _page(per_page=per_page)
+        pages.append(page)
+        while page.next_cursor:
+            page = _page(after=page.next_cursor, per_page=per_page)
+            pages.append(page)
+        ids = [[event.id for event in p.items] for p in pages]
+        db.session.remove()
+    return pages, ids
+
+
+@pytest.mark.parametrize("n", [4, 5], ids=["exact_multiple", "partial_last_page"])
+def test_forward_pages_cover_every_row_once_across_ties(app, n):
+    expected = _seed_events(app, n, ties=3)
+    pages, ids = _walk_forward(app, per_page=2)
+
+    assert [event_id for page in ids for event_id in page] == expected
+    # sin página vacía al final aunque n sea múltiplo de per_page
+    assert all(ids) and len(ids) == -(-n // 2)
+    assert pages[0].prev_cursor is None and pages[-1].next_cursor is None
+
+
+def test_backward_pages_mirror_the_forward_walk(app):
+    _seed_events(app, 5, ties=3)
+    pages, forward = _walk_forward(app, per_page=2)
+
+    backward = []
+    with app.app_context():
+        cursor = pages[-1].prev_cursor
+        while cursor:
+            page = _page(before=cursor)
+            backward.insert(0, [event.id for event in page.items])
+            cursor = page.prev_cursor
+        db.session.remove()
+
+    assert backward == forward[:-1]
+
+
+def test_tampered_cursor_falls_back_to_the_first_page(app):
+    expected = _seed_events(app, 3)
+    with app.app_context():
+        page = _page(after="no-es-un-cursor")
+        assert [event.id for event in page.items] == expected[:2]
+        assert page.prev_cursor is None
+        db.session.remove()
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from app.extensions import db
+from app.models import Event, Purchase
+from app.services.seats import rebuild_seat_ledger
+
+from conftest import checkout_form
+
+
+def _backdate(app, purchase_id: int) -> None:
+    # más viejo que PENDING_PURCHASE_TTL_MINUTES, sin que haya pasado el sweeper
+    ttl = app.config["PENDING_PURCHASE_TTL_MINUTES"]
+    with app.app_context():
+        db.session.execute(
+            update(Purchase)
+            .where(Purchase.id == purchase_id)
+            .values(created_at=datetime.now(timezone.utc) - timedelta(minutes=ttl + 1))
+        )
+        db.session.commit()
+        db.session.remove()
+
+
+def _checkout(app, event_id: int) -> int:
+    response = app.test_client().post(f"/checkout/event/{event_id}", data=checkout_form(2))
+    assert response.status_code == 302
+    return int(response.location.rstrip("/").rsplit("/", 1)[-1])
+
+
+def _state(app, purchase_id: int, event_id: int):
+    with app.app_context():
+        purchase = db.session.get(Purchase, purchase_id)
+        event = db.session.get(Event, event_id)
+        state = (purchase.status, event.seats_reserved, event.seats_paid)
+        assert rebuild_seat_ledger(apply=False) == []
+        db.session.rollback()
+        db.session.remove()
+    return state
+
+
+def test_webpay_start_expires_stale_pending_instead_of_paying(app, gateway, make_event):
+    event = make_event(capacity=5)
+    purchase_id = _checkout(app, event["id"])
+    _backdate(app, purchase_id)
+
+    response = app.test_client().get(f"/pay/webpay/start/{purchase_id}")
+
+    assert response.status_code == 302
+    assert gateway.calls["create"] == 0
+    assert _state(app, purchase_id, event["id"]) == ("expired", 0, 0)
+
+
+def test_webpay_return_does_not_commit_stale_pending(app, gateway, make_event):
+    event = make_event(capacity=5)
+    purchase_id = _checkout(app, event["id"])
+    client = app.test_client()
+    client.get(f"/pay/webpay/start/{purchase_id}")
+    with app.app_context():
+        token = db.session.get(Purchase, purchase_id).tbk_token
+        db.session.remove()
+    # el comprador vuelve de Webpay después del TTL: sus cupos ya pudieron venderse
+    _backdate(app, purchase_id)
+
+    response = client.get(f"/pay/webpay/return?token_ws={token}")
+
+    assert response.status_code == 302
+    assert gateway.calls["commit"] == 0
+    assert _state(app, purchase_id, event["id"]) == ("expired", 0, 0)
@@ -0,0 +1,24 @@
+import pytest
+import sqlalchemy as sa
+from flask import g
+
+from app.query_budget import QueryBudgetExceeded
+
+
+def test_request_over_its_budget_fails(app, make_event, monkeypatch):
+    make_event()
+    # el catálogo cabe en 2 sentencias; con presupuesto 1 el request debe fallar
+    monkeypatch.setattr(app.view_functions["public.home"], "query_budget", 1)
+
+    with pytest.raises(QueryBudgetExceeded, match=r"public\.home: 2 sentencias SQL \(presupuesto 1\)"):
+        app.test_client().get("/")
+
+
+def test_only_the_app_engines_are_counted(app, tmp_path):
+    other = sa.create_engine(f"sqlite:///{tmp_path / 'other.db'}")
+    with app.test_request_context("/"):
+        app.preprocess_request()
+        with other.connect() as conn:
+            conn.execute(sa.text("SELECT 1"))
+        assert g.sql_statements == 0
+    other.dispose()
@@ -0,0 +1,46 @@
+import json
+
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import Occurrence, OutboxMessage, Purchase
+from app.services.outbox import PURCHASE_CONFIRMATION
+from app.services.reconcile import reconcile_payments
+from app.services.seats import rebuild_seat_ledger
+
+
+def _token(app, purchase_id: int) -> str:
+    with app.app_context():
+        token = db.session.get(Purchase, purchase_id).tbk_token
+        db.session.remove()
+    return token
+
+
+def test_reconcile_pays_a_purchase_the_gateway_authorized(app, gateway, make_event, buy):
+    event = make_event(sessions=2)
+    # pagó en Webpay pero nunca volvió al sitio
+    returned_not = buy(event["id"], participants=2, pay=False)
+    gateway.commit(_token(app, returned_not))
+    # autorizada por otro monto: queda para revisión manual
+    wrong_amount = buy(event["id"], participants=1, pay=False)
+    gateway.seed(_token(app, wrong_amount), amount=1, status="AUTHORIZED")
+    # sigue en el formulario de Webpay
+    still_open = buy(event["id"], participants=1, pay=False)
+
+    with app.app_context():
+        report = reconcile_payments(min_age_minutes=0, gateway=gateway)
+
+        assert (report["scanned"], report["paid"], report["mismatched"], report["unchanged"]) == (3, 1, 1, 1)
+        statuses = dict(db.session.execute(select(Purchase.id, Purchase.status)).all())
+        assert statuses == {returned_not: "paid", wrong_amount: "pending", still_open: "pending"}
+
+        paid = db.session.get(Purchase, returned_not)
+        assert paid.paid_at is not None
+        assert json.loads(paid.commit_response)["status"] == "AUTHORIZED"
+        # PACKAGE: inscrita en todas las sesiones, con los cupos movidos de reserved a paid
+        assert [oc.seats_paid for oc in db.session.scalars(select(Occurrence))] == [2, 2]
+        assert rebuild_seat_ledger(apply=False) == []
+        assert db.session.scalars(
+            select(OutboxMessage.purchase_id).where(OutboxMessage.kind == PURCHASE_CONFIRMATION)
+        ).all() == [returned_not]
+        db.session.remove()
@@ -0,0 +1,59 @@
+from datetime import date, datetime, time
+
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import Occurrence
+from app.services.recurrence import expand_recurrence
+
+
+def test_biweekly_rule_skips_excluded_dates_without_consuming_the_count():
+    slots = expand_recurrence(
+        start_date=date(2030, 1, 7),  # lunes
+        weekdays=[0, 3],
+        start_time=time(19, 0),
+        end_time=time(21, 0),
+        interval_weeks=2,
+        count=4,
+        excluded={date(2030, 1, 10)},
+    )
+
+    assert [start.date() for start, _ in slots] == [
+        date(2030, 1, 7),
+        date(2030, 1, 21),
+        date(2030, 1, 24),
+        date(2030, 2, 4),
+    ]
+    assert slots[0] == (datetime(2030, 1, 7, 19, 0), datetime(2030, 1, 7, 21, 0))
+
+
+def test_recurrence_skips_existing_sessions_and_enrolls_package_buyers(app, admin_client, make_event, buy):
+    # sesiones existentes: 1, 2 y 3 de enero de 2030 a las 10:00
+    event = make_event(sessions=3)
+    buy(event["id"], participants=2)
+
+    response = admin_client.post(
+        f"/admin/events/{event['id']}/occurrences/recurrence",
+        data={
+            "frequency": "1",
+            "weekdays": ["1", "2"],  # martes y miércoles
+            "start_date": "2030-01-01",
+            "start_time": "10:00",
+            "end_time": "12:00",
+            "count": "4",
+            "confirm": "Crear sesiones",
+        },
+        follow_redirects=True,
+    )
+
+    page = response.get_data(as_text=True)
+    assert "2 sesiones creadas. 2 omitidas porque ya existían. 1 compras pagadas inscritas." in page
+    with app.app_context():
+        created = db.session.scalars(
+            select(Occurrence)
+            .where(Occurrence.event_id == event["id"], Occurrence.id.not_in(event["occurrence_ids"]))
+            .order_by(Occurrence.start_dt)
+        ).all()
+        assert [oc.start_dt.date() for oc in created] == [date(2030, 1, 8), date(2030, 1, 9)]
+        assert [oc.seats_paid for oc in created] == [2, 2]
+        db.session.remove()
@@ -0,0 +1,101 @@
+import pytest
+from flask import g
+from sqlalchemy import insert, select
+
+from app import create_app
+from app.extensions import db
+from app.models import Event
+from app.replica import REPLICA_BIND, STICKY_COOKIE
+
+from conftest import checkout_form
+
+
+def _create_app(tmp_path, replica: bool):
+    config = {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'primary.db'}",
+        "PAYMENT_GATEWAY": "fake",
+        "PUBLIC_CACHE_BACKEND": "null",
+    }
+    if replica:
+        config["SQLALCHEMY_REPLICA_URI"] = f"sqlite:///{tmp_path / 'replica.db'}"
+    return create_app(config)
+
+
+def _seed(engine, title: str) -> None:
+    # mismo id en ambas bases, distinto título: la página dice de dónde leyó
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Event).values(
+                id=1, title=title, pricing_mode="PACKAGE", price=1000, capacity_default=10,
+                location_name="Club", status="published",
+            )
+        )
+
+
+@pytest.fixture
+def routed_app(tmp_path):
+    app = _create_app(tmp_path, replica=True)
+    with app.app_context():
+        _seed(db.engine, "Torneo del primario")
+        _seed(db.engines[REPLICA_BIND], "Torneo de la réplica")
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_read_replica_views_read_from_the_replica(routed_app):
+    response = routed_app.test_client().get("/")
+
+    assert "Torneo de la réplica" in response.get_data(as_text=True)
+    assert STICKY_COOKIE not in response.headers.get("Set-Cookie", "")
+
+
+def test_writes_go_to_the_primary_and_pin_later_reads(routed_app):
+    client = routed_app.test_client()
+
+    response = client.post("/checkout/event/1", data=checkout_form(1))
+
+    assert response.status_code == 302
+    assert STICKY_COOKIE in response.headers["Set-Cookie"]
+    with routed_app.app_context():
+        assert db.session.get(Event, 1).seats_reserved == 1
+        replica_seats = db.session.execute(
+            select(Event.seats_reserved), bind_arguments={"bind": db.engines[REPLICA_BIND]}
+        ).scalar()
+        assert replica_seats == 0
+    # read-your-writes: con la cookie, la vista @read_replica lee del primario
+    assert "Torneo del primario" in client.get("/").get_data(as_text=True)
+
+
+def test_first_write_pins_the_rest_of_the_request_to_the_primary(routed_app):
+    with routed_app.test_request_context("/"):
+        g.db_replica = True
+        assert db.session.scalar(select(Event.title)) == "Torneo de la réplica"
+
+        db.session.add(
+            Event(title="Nuevo", pricing_mode="PACKAGE", price=0, location_name="Club", status="draft")
+        )
+        db.session.flush()
+
+        assert db.session.scalar(select(Event.title).where(Event.id == 1)) == "Torneo del primario"
+        assert g.db_wrote
+        db.session.rollback()
+
+
+def test_without_a_replica_everything_uses_the_primary(tmp_path):
+    app = _create_app(tmp_path, replica=False)
+    with app.app_context():
+        assert REPLICA_BIND not in db.engines
+        _seed(db.engine, "Torneo del primario")
+    client = app.test_client()
+
+    assert "Torneo del primario" in client.get("/").get_data(as_text=True)
+    response = client.post("/checkout/event/1", data=checkout_form(1))
+    assert response.status_code == 302
+    # sin réplica no hace falta fijar el primario
+    assert STICKY_COOKIE not in response.headers.get("Set-Cookie", "")
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,34 @@
+import pytest
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import SalesRollup
+from app.services import rollups
+from app.services.rollups import COUNTERS, rebuild_rollups
+
+
+def _rollup_rows():
+    return db.session.execute(
+        select(SalesRollup.event_id, SalesRollup.day, *(getattr(SalesRollup, name) for name in COUNTERS))
+        .order_by(SalesRollup.event_id, SalesRollup.day)
+    ).all()
+
+
+@pytest.mark.parametrize("upsert", [True, False], ids=["on_conflict", "portable"])
+def test_incremental_rollup_matches_rebuild(app, make_event, buy, monkeypatch, upsert):
+    if not upsert:
+        # motor sin ON CONFLICT: UPDATE incremental + INSERT en savepoint
+        monkeypatch.setattr(rollups, "_dialect_insert", lambda: None)
+    event = make_event(price=1500)
+    buy(event["id"], participants=2)
+    buy(event["id"], participants=1)
+    buy(event["id"], participants=1, pay=False)
+
+    with app.app_context():
+        incremental = _rollup_rows()
+        rebuild_rollups()
+        assert _rollup_rows() == incremental
+        db.session.rollback()
+
+    [row] = incremental
+    assert row[2:] == (3, 2, 0, 0, 4500, 3)
@@ -0,0 +1,68 @@
+import csv
+import io
+
+import pytest
+
+from app.blueprints.admin import routes as admin_routes
+from app.services.roster import ROSTER_HEADER
+
+
+def _csv_rows(response) -> list[list[str]]:
+    text = response.get_data(as_text=True)
+    assert text.startswith("\ufeff")  # BOM para Excel
+    return list(csv.reader(io.StringIO(text.lstrip("\ufeff"))))
+
+
+def test_event_roster_csv_lists_paid_participants_per_session(admin_client, make_event, buy):
+    event = make_event(sessions=2, pricing_mode="PER_OCCURRENCE")
+    first, second = event["occurrence_ids"]
+    paid = buy(event["id"], participants=2, occurrence_ids=[first])
+    pending = buy(event["id"], participants=1, occurrence_ids=[second], pay=False)
+
+    response = admin_client.get(f"/admin/events/{event['id']}/participants.csv")
+    assert response.headers["Content-Disposition"] == (
+        f'attachment; filename="evento-{event["id"]}-participantes.csv"'
+    )
+    header, *rows = _csv_rows(response)
+    assert tuple(header) == ROSTER_HEADER
+    assert [(r[1], r[2], r[3], r[7]) for r in rows] == [
+        (str(first), str(paid), "paid", "Participante 0"),
+        (str(first), str(paid), "paid", "Participante 1"),
+    ]
+
+    with_pending = _csv_rows(
+        admin_client.get(f"/admin/events/{event['id']}/participants.csv?include_pending=1")
+    )[1:]
+    assert [(r[1], r[2], r[3]) for r in with_pending][-1] == (str(second), str(pending), "pending")
+
+
+def test_occurrence_roster_only_lists_that_session(admin_client, make_event, buy):
+    event = make_event(sessions=2, pricing_mode="PER_OCCURRENCE")
+    first, second = event["occurrence_ids"]
+    buy(event["id"], participants=1, occurrence_ids=[first])
+    only_second = buy(event["id"], participants=1, occurrence_ids=[second])
+
+    rows = _csv_rows(admin_client.get(f"/admin/occurrences/{second}/participants.csv"))[1:]
+    assert [(r[1], r[2]) for r in rows] == [(str(second), str(only_second))]
+
+
+def test_event_roster_xlsx(admin_client, make_event, buy):
+    openpyxl = pytest.importorskip("openpyxl")
+    event = make_event(sessions=1)
+    purchase_id = buy(event["id"], participants=2)
+
+    response = admin_client.get(f"/admin/events/{event['id']}/participants.xlsx")
+    assert response.mimetype == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    sheet = openpyxl.load_workbook(io.BytesIO(response.data)).active
+    header, *rows = sheet.iter_rows(values_only=True)
+    assert header == ROSTER_HEADER
+    assert [(row[2], row[7], row[8]) for row in rows] == [
+        (purchase_id, "Participante 0", 10),
+        (purchase_id, "Participante 1", 10),
+    ]
+
+
+def test_xlsx_is_not_found_without_openpyxl(admin_client, make_event, monkeypatch):
+    event = make_event(sessions=1)
+    monkeypatch.setattr(admin_routes, "xlsx_available", lambda: False)
+    assert admin_client.get(f"/admin/events/{event['id']}/participants.xlsx").status_code == 404
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, update
+
+from app.extensions import db
+from app.models import Event, Occurrence, OutboxMessage, Purchase, WaitlistEntry
+from app.services.mailer import LogMailer
+from app.services.outbox import WAITLIST_OFFER, deliver_outbox
+from app.services.seats import rebuild_seat_ledger
+from app.services.waitlist import expire_waitlist_offers, join_waitlist
+
+from conftest import checkout_form
+
+
+@pytest.mark.parametrize("pricing_mode", ["PACKAGE", "PER_OCCURRENCE"])
+def test_lapsed_offer_stops_holding_seats_without_the_sweeper(app, make_event, pricing_mode):
+    event = make_event(sessions=1, capacity=2, pricing_mode=pricing_mode)
+    occurrence_id = event["occurrence_ids"][0] if pricing_mode == "PER_OCCURRENCE" else None
+    selected = event["occurrence_ids"] if occurrence_id else ()
+
+    with app.app_context():
+        # con cupo libre la oferta sale de inmediato y retiene los 2 cupos
+        entry = join_waitlist(event["id"], occurrence_id, "Ana", "ana@example.com", "+56900000000", 2)
+        db.session.commit()
+        assert entry.status == "offered"
+        entry_id = entry.id
+        db.session.remove()
+
+    client = app.test_client()
+    assert client.post(f"/checkout/event/{event['id']}", data=checkout_form(2, selected)).status_code == 409
+
+    with app.app_context():
+        db.session.execute(
+            update(WaitlistEntry)
+            .where(WaitlistEntry.id == entry_id)
+            .values(offer_expires_at=datetime.now(timezone.utc) - timedelta(minutes=1))
+        )
+        db.session.commit()
+        db.session.remove()
+
+    # EXPIRY_SWEEP_INTERVAL_SECONDS=0: nadie expiró la oferta, pero ya no retiene
+    assert client.post(f"/checkout/event/{event['id']}", data=checkout_form(2, selected)).status_code == 302
+
+    with app.app_context():
+        assert expire_waitlist_offers() == 1
+        assert db.session.get(WaitlistEntry, entry_id).status == "expired"
+        assert db.session.get(Event, event["id"]).seats_reserved == 2
+        if occurrence_id:
+            assert db.session.scalar(select(Occurrence.seats_reserved).where(Occurrence.id == occurrence_id)) == 2
+        assert rebuild_seat_ledger(apply=False) == []
+        db.session.rollback()
+        db.session.remove()
+
+
+def test_offer_is_emailed_through_the_outbox(app, make_event, buy):
+    event = make_event(sessions=1, capacity=2)
+    buy(event["id"], participants=2)
+
+    with app.app_context():
+        # sin cupo: queda esperando y no hay correo
+        first = join_waitlist(event["id"], None, "Carla", "carla@example.com", "+56900000000", 1)
+        db.session.commit()
+        first_id = first.id
+        assert first.status == "waiting"
+        assert db.session.scalar(select(OutboxMessage.id).where(OutboxMessage.kind == WAITLIST_OFFER)) is None
+
+        # se libera un cupo: la próxima promoción se lo ofrece a la primera de la cola
+        db.session.execute(update(Event).where(Event.id == event["id"]).values(capacity_default=3))
+        second = join_waitlist(event["id"], None, "Bea", "bea@example.com", "+56900000001", 1)
+        db.session.commit()
+        assert (db.session.get(WaitlistEntry, first_id).status, second.status) == ("offered", "waiting")
+        # la oferta y su correo quedan en la misma transacción
+        queued = db.session.execute(
+            select(OutboxMessage.kind, OutboxMessage.recipient, OutboxMessage.status, OutboxMessage.waitlist_entry_id)
+            .where(OutboxMessage.kind == WAITLIST_OFFER)
+        ).all()
+        assert [tuple(row) for row in queued] == [(WAITLIST_OFFER, "carla@example.com", "pending", first_id)]
+
+        mailer = LogMailer()
+        assert deliver_outbox(mailer)["failed"] == 0
+        [offer] = [message for message in mailer.sent if message["To"] == "carla@example.com"]
+        assert f"/checkout/waitlist/{db.session.get(WaitlistEntry, first_id).token}" in offer.get_content()
+        assert offer["Subject"].startswith("Se liberó un cupo")
+        db.session.remove()
+
+
+@pytest.mark.parametrize("path", ["rejected", "stale"])
+def test_payment_routes_offer_released_seats_within_their_budget(app, gateway, make_event, path):
+    event = make_event(sessions=1, capacity=2)
+    client = app.test_client()
+    response = client.post(f"/checkout/event/{event['id']}", data=checkout_form(2))
+    purchase_id = int(response.location.rstrip("/").rsplit("/", 1)[-1])
+
+    with app.app_context():
+        join_waitlist(event["id"], None, "Carla", "carla@example.com", "+56900000000", 2)
+        db.session.commit()
+        db.session.remove()
+
+    if path == "rejected":
+        client.get(f"/pay/webpay/start/{purchase_id}")
+        gateway.authorize = False
+        with app.app_context():
+            token = db.session.get(Purchase, purchase_id).tbk_token
+            db.session.remove()
+        # @query_budget se hace cumplir en testing: la oferta y su correo caben
+        assert client.get(f"/pay/webpay/return?token_ws={token}").status_code == 302
+    else:
+        ttl = app.config["PENDING_PURCHASE_TTL_MINUTES"]
+        with app.app_context():
+            db.session.execute(
+                update(Purchase)
+                .where(Purchase.id == purchase_id)
+                .values(created_at=datetime.now(timezone.utc) - timedelta(minutes=ttl + 1))
+            )
+            db.session.commit()
+            db.session.remove()
+        assert client.get(f"/pay/webpay/start/{purchase_id}").status_code == 302
+
+    with app.app_context():
+        entry = db.session.scalar(select(WaitlistEntry))
+        assert entry.status == "offered"
+        assert db.session.scalar(
+            select(OutboxMessage.recipient).where(OutboxMessage.waitlist_entry_id == entry.id)
+        ) == "carla@example.com"
+        assert rebuild_seat_ledger(apply=False) == []
+        db.session.rollback()
+        db.session.remove()
@@ -0,0 +1,83 @@
+import threading
+from collections import Counter
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+import pytest
+
+from app.services.webpay import GatewayError, WebpayGateway, check_gateway_config
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def unavailable_gateway():
+    """Servidor que responde 503 a todo (p.ej. un proxy caído) y cuenta los requests."""
+    hits = Counter()
+
+    def app(environ, start_response):
+        hits[environ["REQUEST_METHOD"]] += 1
+        start_response("503 Service Unavailable", [("Content-Type", "text/plain")])
+        return [b"unavailable"]
+
+    server = make_server("127.0.0.1", 0, app, handler_class=_QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    gateway = WebpayGateway("597055555532", "key", f"http://127.0.0.1:{server.server_port}", retries=2, backoff=0)
+    yield gateway, hits
+    gateway.close()
+    server.shutdown()
+
+
+@pytest.mark.parametrize(
+    "call, method",
+    [
+        (lambda gw: gw.create("AR-1", "1", 1000, "http://localhost/return"), "POST"),
+        (lambda gw: gw.commit("token"), "PUT"),
+        (lambda gw: gw.refund("token", 1000), "POST"),
+    ],
+)
+def test_writes_are_not_resent_on_5xx(unavailable_gateway, call, method):
+    gateway, hits = unavailable_gateway
+    with pytest.raises(GatewayError):
+        call(gateway)
+    # pudo haberse ejecutado en Transbank: un solo intento
+    assert hits[method] == 1
+
+
+def test_status_is_retried_on_5xx(unavailable_gateway):
+    gateway, hits = unavailable_gateway
+    with pytest.raises(GatewayError):
+        gateway.status("token")
+    assert hits["GET"] == 3
+
+
+def _production_config(**overrides):
+    return {
+        "PAYMENT_GATEWAY": "webpay",
+        "TESTING": False,
+        "WEBPAY_ENVIRONMENT": "production",
+        "WEBPAY_COMMERCE_CODE": None,
+        "WEBPAY_API_KEY": None,
+        **overrides,
+    }
+
+
+@pytest.mark.parametrize(
+    "overrides, missing",
+    [
+        ({}, "WEBPAY_COMMERCE_CODE, WEBPAY_API_KEY"),
+        ({"WEBPAY_COMMERCE_CODE": "597012345678"}, "WEBPAY_API_KEY"),
+    ],
+)
+def test_production_gateway_requires_credentials(overrides, missing):
+    with pytest.raises(RuntimeError, match=f"falta {missing}"):
+        check_gateway_config(_production_config(**overrides))
+
+
+def test_integration_and_testing_fall_back_to_public_credentials():
+    check_gateway_config(_production_config(WEBPAY_ENVIRONMENT="integration"))
+    check_gateway_config(_production_config(TESTING=True))
+    check_gateway_config(_production_config(PAYMENT_GATEWAY="fake"))
@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event as sa_event, func, select
+
+from app.extensions import db
+from app.models import Event, OutboxMessage, Purchase
+from app.services.seats import rebuild_seat_ledger
+
+DUPLICATES = 10
+
+
+def test_concurrent_returns_commit_once(app, gateway, make_event, buy):
+    event = make_event(capacity=10)
+    purchase_id = buy(event["id"], participants=2, pay=False)
+    with app.app_context():
+        token = db.session.get(Purchase, purchase_id).tbk_token
+        engine = db.engine
+        db.session.remove()
+
+    # transiciones de estado que realmente cambiaron una fila de purchases
+    transitions = []
+    lock = threading.Lock()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE purchases SET") and "status" in statement and cursor.rowcount > 0:
+            with lock:
+                transitions.append(statement)
+
+    # el commit tarda: todos los duplicados llegan mientras el primero espera al gateway
+    gateway.latency = 0.2
+    barrier = threading.Barrier(DUPLICATES)
+
+    def deliver(_):
+        client = app.test_client()
+        barrier.wait()
+        return client.get(f"/pay/webpay/return?token_ws={token}").status_code
+
+    sa_event.listen(engine, "after_cursor_execute", record)
+    try:
+        with ThreadPoolExecutor(max_workers=DUPLICATES) as pool:
+            statuses = list(pool.map(deliver, range(DUPLICATES)))
+    finally:
+        sa_event.remove(engine, "after_cursor_execute", record)
+
+    assert statuses == [302] * DUPLICATES
+    assert gateway.calls["commit"] == 1
+    # pending -> committing (la reclama un solo request) y committing -> paid
+    assert len(transitions) == 2
+
+    with app.app_context():
+        purchase = db.session.get(Purchase, purchase_id)
+        assert purchase.status == "paid"
+        assert purchase.commit_response is not None
+        assert db.session.get(Event, event["id"]).seats_paid == 2
+        assert db.session.scalar(
+            select(func.count(OutboxMessage.id)).where(OutboxMessage.purchase_id == purchase_id)
+        ) == 1
+        assert rebuild_seat_ledger(apply=False) == []
+        db.session.rollback()
+        db.session.remove()
+
+
+def test_repeated_return_uses_stored_outcome(app, gateway, make_event, buy):
+    event = make_event(capacity=10)
+    purchase_id = buy(event["id"])
+    with app.app_context():
+        token = db.session.get(Purchase, purchase_id).tbk_token
+        db.session.remove()
+
+    response = app.test_client().get(f"/pay/webpay/return?token_ws={token}")
+
+    assert response.status_code == 302
+    assert gateway.calls["commit"] == 1
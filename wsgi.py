@@ -1,3 +1,4 @@
 from app import create_app
 
+# Producción: FLASK_ENV=production gunicorn -c gunicorn.conf.py wsgi:app
 app = create_app()